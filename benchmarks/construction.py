@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+
+
+"""Measure the cost of building, cloning, and pickling large pipelines, like
+when a pipeline is generated per request or shipped to worker processes.
+
+    $ python benchmarks/construction.py [--repeat N]
+
+Requires an importable ``tinyflow``, like after ``pip install -e .``.
+"""
+
+
+import argparse
+import pickle
+import timeit
+
+from tinyflow import ops, Pipeline
+
+
+def build(count):
+    p = Pipeline()
+    for idx in range(count):
+        if idx % 3 == 0:
+            p |= ops.map(abs)
+        elif idx % 3 == 1:
+            p |= ops.filter(bool)
+        else:
+            p |= ops.methodcaller('conjugate')
+    return p
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    def best(func):
+        return min(timeit.repeat(func, number=1, repeat=args.repeat))
+
+    print("{:>6} {:>10} {:>10} {:>10} {:>10} {:>10}".format(
+        'ops', 'build', 'clone', 'dumps', 'loads', 'bytes'))
+    for count in (10, 100, 1000, 10000):
+        template = build(count)
+        data = pickle.dumps(template, protocol=pickle.HIGHEST_PROTOCOL)
+        row = "{:>6} {:>9.2f}ms {:>9.2f}ms {:>9.2f}ms {:>9.2f}ms {:>10}"
+        print(row.format(
+            count,
+            best(lambda: build(count)) * 1000,
+            best(template.clone) * 1000,
+            best(lambda: pickle.dumps(
+                template, protocol=pickle.HIGHEST_PROTOCOL)) * 1000,
+            best(lambda: pickle.loads(data)) * 1000,
+            len(data)))
+
+    # Pipelines must still work after a round trip
+    assert list(pickle.loads(pickle.dumps(build(3)))([-1, 0])) == [1]
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+
+
+"""Measure how long a fresh interpreter takes to import parts of
+``tinyflow``, which is paid by every worker process a pool starts.
+
+    $ python benchmarks/imports.py [--repeat N]
+
+Every statement runs in a new interpreter and the time of an empty
+interpreter is subtracted.  Requires an importable ``tinyflow``, like after
+``pip install -e .``.
+"""
+
+
+import argparse
+import subprocess
+import sys
+import timeit
+
+
+STATEMENTS = (
+    'import tinyflow',
+    'from tinyflow import source',
+    'from tinyflow import Pipeline',
+    'from tinyflow import ops',
+    'from tinyflow import ops; ops.count_distinct()([])',
+)
+
+
+def run(statement, repeat):
+    return min(timeit.repeat(
+        lambda: subprocess.check_call([sys.executable, '-c', statement]),
+        number=1, repeat=repeat))
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    baseline = run('pass', args.repeat)
+    print("{:<50} {:.1f}ms".format('interpreter', baseline * 1000))
+    for statement in STATEMENTS:
+        seconds = run(statement, args.repeat) - baseline
+        print("{:<50} {:.1f}ms".format(statement, seconds * 1000))
+
+
+if __name__ == '__main__':
+    main()
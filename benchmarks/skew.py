@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+
+
+"""Compare word counts across files of very different sizes when every
+file is a single task with splitting files into ranges of similar size
+with ``tinyflow.ops.split_lines()``.
+
+    $ python benchmarks/skew.py [--threads N] [--repeat N]
+
+Files are generated from ``LICENSE.txt``.  Requires an importable
+``tinyflow``, like after ``pip install -e .``.
+"""
+
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import operator as op
+import os
+import shutil
+import tempfile
+import timeit
+
+from tinyflow import MapPipeline, ops, Pipeline
+
+
+WORDCOUNT = MapPipeline() \
+    | ops.cat(blocksize=2 ** 16) \
+    | ops.tokenize(casefold=True) \
+    | ops.counter()
+
+
+def pipeline(*operations):
+    p = Pipeline()
+    for operation in operations:
+        p |= operation
+    return p \
+        | ops.map(WORDCOUNT, pool='thread') \
+        | ops.flatten() \
+        | ops.reduce_by_key(op.iadd, op.itemgetter(0), op.itemgetter(1))
+
+
+def generate(directory, copies=(2000, 50, 50, 50, 50, 50, 50, 50)):
+    here = os.path.dirname(os.path.abspath(__file__))
+    with open(os.path.join(here, os.pardir, 'LICENSE.txt')) as f:
+        text = f.read()
+    paths = []
+    for idx, count in enumerate(copies):
+        path = os.path.join(directory, '{}.txt'.format(idx))
+        with open(path, 'w') as f:
+            for _ in range(count):
+                f.write(text)
+        paths.append(path)
+    return paths
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        paths = generate(directory)
+        size = sum(map(os.path.getsize, paths))
+        print("{} files: {:.1f} MB".format(len(paths), size / 1e6))
+
+        pipelines = (
+            ('file per task', pipeline()),
+            ('split count', pipeline(ops.split_lines(args.threads))),
+            ('split size', pipeline(ops.split_lines(
+                size=size // (4 * args.threads), largest_first=True))))
+
+        with ThreadPoolExecutor(args.threads) as pool:
+            expected = dict(pipelines[0][1](paths, thread_pool=pool))
+            for name, p in pipelines:
+                assert dict(p(paths, thread_pool=pool)) == expected
+                seconds = min(timeit.repeat(
+                    lambda: dict(p(paths, thread_pool=pool)),
+                    number=1, repeat=args.repeat))
+                print("{:<20} {:.3f}s".format(name, seconds))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
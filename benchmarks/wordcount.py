@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+
+
+"""Compare word count pipelines built from individual string operations
+with ``tinyflow.ops.tokenize()`` reading blocks of text.
+
+    $ python benchmarks/wordcount.py [path] [--repeat N]
+
+Without a path a file is generated from ``LICENSE.txt``.  Requires an
+importable ``tinyflow``, like after ``pip install -e .``.
+"""
+
+
+import argparse
+import os
+import shutil
+import tempfile
+import timeit
+
+from tinyflow import ops, Pipeline
+
+
+CHAIN = Pipeline() \
+    | ops.cat() \
+    | ops.methodcaller('lower') \
+    | ops.methodcaller('split') \
+    | ops.filter() \
+    | ops.flatten() \
+    | ops.counter()
+
+TOKENIZE_LINES = Pipeline() \
+    | ops.cat() \
+    | ops.tokenize(casefold=True) \
+    | ops.counter()
+
+TOKENIZE_BLOCKS = Pipeline() \
+    | ops.cat(blocksize=2 ** 20) \
+    | ops.tokenize(casefold=True) \
+    | ops.counter()
+
+
+def generate(directory, copies=2000):
+    here = os.path.dirname(os.path.abspath(__file__))
+    with open(os.path.join(here, os.pardir, 'LICENSE.txt')) as f:
+        text = f.read()
+    path = os.path.join(directory, 'words.txt')
+    with open(path, 'w') as f:
+        for _ in range(copies):
+            f.write(text)
+    return path
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path', nargs='?')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        path = args.path or generate(directory)
+        print("{}: {:.1f} MB".format(path, os.path.getsize(path) / 1e6))
+
+        expected = dict(CHAIN([path]))
+        for name, pipeline in (
+                ('methodcaller chain', CHAIN),
+                ('tokenize lines', TOKENIZE_LINES),
+                ('tokenize blocks', TOKENIZE_BLOCKS)):
+            assert dict(pipeline([path])) == expected
+            seconds = min(timeit.repeat(
+                lambda: dict(pipeline([path])), number=1, repeat=args.repeat))
+            print("{:<20} {:.3f}s".format(name, seconds))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
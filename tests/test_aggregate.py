@@ -0,0 +1,39 @@
+"""Tests for ``tinyflow.aggregate``."""
+
+
+import pytest
+
+from tinyflow import aggregate as agg
+
+
+@pytest.mark.parametrize("aggregation,values,expected", [
+    (agg.count(), [3, 1, 2], 3),
+    (agg.sum(), [3, 1, 2], 6),
+    (agg.min(), [3, 1, 2], 1),
+    (agg.max(), [3, 1, 2], 3),
+    (agg.mean(), [3, 1, 2], 2.0),
+    (agg.quantile([0, 1]), [3, 1, 2], [1, 3]),
+    (agg.collect(), [3, 1, 2], [3, 1, 2]),
+    (agg.min(), [], None),
+    (agg.mean(), [], None),
+])
+def test_aggregations(aggregation, values, expected):
+
+    state = aggregation.initial()
+    for value in values:
+        state = aggregation.add(state, value)
+    assert aggregation.result(state) == expected
+
+    # Splitting the values and merging produces the same result
+    left = aggregation.initial()
+    right = aggregation.initial()
+    for idx, value in enumerate(values):
+        if idx % 2:
+            left = aggregation.add(left, value)
+        else:
+            right = aggregation.add(right, value)
+    merged = aggregation.merge(left, right)
+    result = aggregation.result(merged)
+    if isinstance(aggregation, agg.collect):
+        result, expected = sorted(result), sorted(expected)
+    assert result == expected
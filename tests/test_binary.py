@@ -0,0 +1,104 @@
+"""Tests for ``tinyflow.binary``."""
+
+
+from collections import namedtuple
+import io
+import os
+import pickle
+
+import pytest
+
+from tinyflow import binary, ops, Pipeline
+
+
+@pytest.mark.parametrize("records", [
+    [('word', 1), ('other', 2), (u'ünïcode', 3)],
+    [(1.5, True, None, b'raw'), (-2.0, False, None, b'')],
+    [1, 2, 3],
+    ['a', 'b'],
+    [u'lone \ud800 surrogate', u'\udfff'],
+    [(2 ** 70, 'big'), (1, 'small')],
+    [(1, 2), (3,), 'mixed', {'a': 1}],
+    [[1, 2], [3, 4]],
+    []])
+@pytest.mark.parametrize("compress", [True, False])
+def test_roundtrip(records, compress):
+    assert binary.loads(binary.dumps(records, compress=compress)) == records
+
+
+Pair = namedtuple('Pair', ['a', 'b'])
+
+
+def test_namedtuple(tmpdir):
+    records = [Pair(1, 'a'), Pair(2, 'b')]
+    decoded = binary.loads(binary.dumps(records, compress=True))
+    assert decoded == records
+    assert all(type(r) is Pair for r in decoded)
+
+    with binary.Spill(directory=str(tmpdir)) as spill:
+        spill.extend(records)
+        assert [type(r) for r in spill] == [Pair, Pair]
+
+    # Mixed types are pickled
+    decoded = binary.loads(binary.dumps([Pair(1, 2), (3, 4)]))
+    assert [type(r) for r in decoded] == [Pair, tuple]
+
+
+def test_namedtuple_not_pickleable():
+    Local = namedtuple('Local', ['a', 'b'])
+    decoded = binary.loads(binary.dumps([Local(1, 2)]))
+    assert decoded == [(1, 2)]
+    assert type(decoded[0]) is tuple
+
+
+def test_compact():
+    records = [('word{}'.format(i % 100), i) for i in range(10000)]
+    encoded = binary.dumps(records)
+    pickled = b''.join(pickle.dumps(r, pickle.HIGHEST_PROTOCOL)
+                       for r in records)
+    assert len(encoded) < len(pickled) / 2
+    assert len(binary.dumps(records, compress=True)) < len(encoded)
+
+
+def test_read_write():
+    records = [(i, str(i)) for i in range(100)]
+    f = io.BytesIO()
+    assert binary.write(f, records, batchsize=7) == 100
+    f.seek(0)
+    assert list(binary.read(f)) == records
+    assert binary.loads(f.getvalue()) == records
+
+
+@pytest.mark.parametrize("data", [b'TFRB', b'XXXX' + b'\x00' * 20])
+def test_read_bad_data(data):
+    with pytest.raises(ValueError):
+        list(binary.read(io.BytesIO(data)))
+
+
+def test_Spill(tmpdir):
+    with binary.Spill(directory=str(tmpdir), batchsize=3) as spill:
+        for i in range(10):
+            spill.append((i, 'x'))
+        spill.extend([(10, 'y'), (11, 'z')])
+        assert len(spill) == 12
+        assert os.path.exists(spill.path)
+        expected = [(i, 'x') for i in range(10)] + [(10, 'y'), (11, 'z')]
+        assert list(spill) == expected
+        assert list(spill) == expected
+    assert not os.path.exists(spill.path)
+
+
+def test_pack_unpack():
+    records = [('word', i) for i in range(10)]
+    p = Pipeline() | ops.pack(batchsize=3, compress=True)
+    frames = list(p(records))
+    assert len(frames) == 4
+    assert all(isinstance(f, bytes) for f in frames)
+    assert list(ops.unpack()(frames)) == records
+
+
+def test_read_binary(tmpdir):
+    path = str(tmpdir.join('data.tfb'))
+    with open(path, 'wb') as f:
+        binary.write(f, range(5))
+    assert list(ops.read_binary()([path, path])) == list(range(5)) * 2
@@ -0,0 +1,234 @@
+"""Tests for ``tinyflow.cache``."""
+
+
+from concurrent.futures import ProcessPoolExecutor
+import operator as op
+import os
+import pickle
+
+import pytest
+
+from tinyflow import cache, MapPipeline, ops, Pipeline
+
+
+def test_fingerprint_stable():
+    p1 = MapPipeline() | ops.map(lambda x: x * 2) | ops.take(2)
+    p2 = MapPipeline() | ops.map(lambda x: x * 2) | ops.take(2)
+    assert cache.fingerprint(p1) == cache.fingerprint(p2)
+
+
+@pytest.mark.parametrize('other', [
+    MapPipeline() | ops.map(lambda x: x * 3) | ops.take(2),
+    MapPipeline() | ops.map(lambda x: x * 2) | ops.take(3),
+    MapPipeline() | ops.map(lambda x: x * 2) | ops.drop(2),
+    MapPipeline() | ops.itemgetter(0)])
+def test_fingerprint_changes(other):
+    p = MapPipeline() | ops.map(lambda x: x * 2) | ops.take(2)
+    assert cache.fingerprint(p) != cache.fingerprint(other)
+
+
+class _Scale(object):
+
+    def __init__(self, factor):
+        self.factor = factor
+
+    def mul(self, x):
+        return x * self.factor
+
+
+_OFFSET = 1
+
+
+def _shift(x):
+    return x + _OFFSET
+
+
+def test_fingerprint_methods(tmpdir):
+
+    """Bound methods are described by their instance."""
+
+    assert cache.fingerprint(_Scale(2).mul) \
+        == cache.fingerprint(_Scale(2).mul)
+    assert cache.fingerprint(_Scale(2).mul) \
+        != cache.fingerprint(_Scale(10).mul)
+
+    directory = str(tmpdir)
+    assert list(ops.cache(_Scale(2).mul, directory)([1, 2, 3])) \
+        == [2, 4, 6]
+    assert list(ops.cache(_Scale(10).mul, directory)([1, 2, 3])) \
+        == [10, 20, 30]
+
+
+def test_fingerprint_globals(monkeypatch):
+
+    """Closures and referenced globals are part of the fingerprint."""
+
+    def closure(n):
+        return lambda x: x + n
+
+    assert cache.fingerprint(closure(1)) != cache.fingerprint(closure(2))
+
+    expected = cache.fingerprint(_shift)
+    monkeypatch.setitem(_shift.__globals__, '_OFFSET', 2)
+    assert cache.fingerprint(_shift) != expected
+
+
+def test_DiskCache(tmpdir):
+    store = cache.DiskCache(str(tmpdir))
+    assert store.get('abc') is None
+    store.set('abc', [1, 2])
+    assert 'abc' in store
+    assert store.get('abc') == [1, 2]
+    assert (store.hits, store.misses) == (1, 1)
+
+    # Index is rebuilt from disk
+    assert cache.DiskCache(str(tmpdir)).get('abc') == [1, 2]
+
+    store.clear()
+    assert len(store) == 0
+    assert store.size == 0
+
+
+def test_DiskCache_evict_lru(tmpdir):
+    store = cache.DiskCache(str(tmpdir), max_entries=2)
+    store.set('a1', 1)
+    store.set('b1', 2)
+    store.get('a1')
+    store.set('c1', 3)
+    assert len(store) == 2
+    assert 'b1' not in store
+    assert store.get('a1') == 1
+    assert store.get('c1') == 3
+
+
+def test_DiskCache_evict_size(tmpdir):
+    store = cache.DiskCache(str(tmpdir), max_bytes=1000)
+    for key in ('a1', 'b1', 'c1'):
+        store.set(key, b'x' * 400)
+    assert len(store) == 2
+    assert store.size <= 1000
+    assert 'a1' not in store
+
+
+def test_DiskCache_pickle(tmpdir):
+    store = cache.DiskCache(str(tmpdir))
+    store.set('a1', 1)
+    assert pickle.loads(pickle.dumps(store)).get('a1') == 1
+
+
+def test_CachedCall(tmpdir):
+
+    calls = []
+
+    def func(x):
+        calls.append(x)
+        return iter([x, x])
+
+    cached = cache.CachedCall(func, cache.DiskCache(str(tmpdir)))
+    assert cached(1) == [1, 1]
+    assert cached(1) == [1, 1]
+    assert cached(2) == [2, 2]
+    assert calls == [1, 2]
+
+
+def test_CachedCall_file_changed(tmpdir):
+
+    path = str(tmpdir.join('data.txt'))
+    with open(path, 'w') as f:
+        f.write('a\n')
+
+    wordcount = MapPipeline() | ops.cat() | ops.counter()
+    store = cache.DiskCache(str(tmpdir.mkdir('c')))
+    cached = cache.CachedCall(wordcount, store)
+    assert cached(path) == [('a\n', 1)]
+
+    with open(path, 'a') as f:
+        f.write('a\n')
+    os.utime(path, (0, 0))
+    assert cached(path) == [('a\n', 2)]
+    assert cached.store.hits == 0
+
+
+def test_cache_op(tmpdir):
+    o = ops.cache(op.neg, str(tmpdir))
+    assert list(o([1, 2, 1])) == [-1, -2, -1]
+    assert (o.store.hits, o.store.misses) == (1, 2)
+
+
+def test_LRUCache():
+    c = cache.LRUCache(2)
+    c.set('a', 1)
+    c.set('b', 2)
+    assert c.get('a') == 1
+    c.set('c', 3)
+    assert 'b' not in c
+    assert 'a' in c
+    assert len(c) == 2
+    assert c.get('b', 'missing') == 'missing'
+    assert (c.hits, c.misses) == (1, 1)
+    c.clear()
+    assert (len(c), c.hits, c.misses) == (0, 0, 0)
+
+
+def test_LRUCache_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache._compat, 'monotonic', lambda: now[0])
+    c = cache.LRUCache(ttl=10)
+    c.set('a', 1)
+    now[0] += 5
+    assert c.get('a') == 1
+    now[0] += 10
+    assert c.get('a') is None
+
+
+def test_LRUCache_exceptions():
+    with pytest.raises(ValueError):
+        cache.LRUCache(0)
+
+
+def test_DiskCache_lazy_index(tmpdir):
+
+    """Copies of a cache, like in a worker process, do not walk the
+    directory when writing without eviction.
+    """
+
+    store = cache.DiskCache(str(tmpdir), max_entries=2)
+    store.set('a1', 1)
+    copy = pickle.loads(pickle.dumps(store))
+    assert copy._index is None
+    assert copy.get('a1') == 1
+    copy.set('b1', 2, evict=False)
+    copy.set('c1', 3, evict=False)
+    assert copy._index is None
+    assert (copy.hits, copy.misses) == (1, 0)
+
+    # The original enforces limits
+    store.trim()
+    assert len(store) == 2
+    assert 'a1' not in store
+
+
+def test_DiskCache_copy_evicts(tmpdir):
+
+    """Copies, like in a cloned pipeline, enforce the limits."""
+
+    p = Pipeline() | ops.cache(op.neg, str(tmpdir), max_entries=2)
+    for template in (p.clone(), pickle.loads(pickle.dumps(p))):
+        assert list(template(range(10))) == [-i for i in range(10)]
+        assert len(cache.DiskCache(str(tmpdir))) == 2
+
+
+def test_cache_op_process_pool(tmpdir):
+    p = Pipeline() | ops.cache(op.neg, str(tmpdir), pool='process')
+    with ProcessPoolExecutor(2) as pool:
+        assert sorted(p([1, 2], process_pool=pool)) == [-2, -1]
+        assert sorted(p([1, 2, 3], process_pool=pool)) == [-3, -2, -1]
+    store = p.operations[0].store
+    assert (store.hits, store.misses) == (2, 3)
+    assert len(store) == 3
+
+
+def test_cache_op_not_fused(tmpdir):
+    p = Pipeline() | ops.cache(lambda x: (x, -x), str(tmpdir)) \
+        | ops.itemgetter(1)
+    assert list(p.optimize()([1, 2])) == [-1, -2]
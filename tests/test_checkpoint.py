@@ -0,0 +1,139 @@
+"""Tests for ``tinyflow.checkpoint``."""
+
+
+import operator as op
+import os
+
+import pytest
+
+from tinyflow import exceptions, ops, Pipeline
+from tinyflow.checkpoint import Checkpoint
+
+
+class Boom(Exception):
+    pass
+
+
+def explode_after(data, count):
+    for idx, item in enumerate(data):
+        if idx == count:
+            raise Boom()
+        yield item
+
+
+@pytest.mark.parametrize("operation,expected", [
+    (ops.counter(), {'a': 30, 'b': 15, 'c': 15}),
+    (ops.reduce_by_key(op.iadd, lambda x: x, lambda x: 1),
+        {'a': 30, 'b': 15, 'c': 15})])
+def test_resume(tmpdir, operation, expected):
+
+    data = ['a', 'b', 'a', 'c'] * 15
+    path = str(tmpdir.join('checkpoint'))
+    seen = []
+    p = Pipeline() | ops.filter(lambda x: seen.append(x) or True) | operation
+
+    with pytest.raises(Boom):
+        dict(p(explode_after(data, 33),
+               checkpoint=Checkpoint(path, every=10)))
+    assert os.path.exists(path)
+
+    del seen[:]
+    checkpoint = Checkpoint(path, every=10)
+    assert dict(p(data, checkpoint=checkpoint)) == expected
+
+    # Only the remaining input was processed
+    assert seen == data[30:]
+    assert checkpoint.offset == len(data)
+    assert not os.path.exists(path)
+
+
+@pytest.mark.parametrize("operation", [
+    ops.windowed_reduce(4, op.iadd),
+    ops.windowed_op(4, reversed)])
+def test_resume_window(tmpdir, operation):
+
+    data = list(range(50))
+    path = str(tmpdir.join('checkpoint'))
+    p = Pipeline() \
+        | operation \
+        | ops.reduce_by_key(op.iadd, lambda x: 'sum') \
+        | ops.itemgetter(1)
+
+    with pytest.raises(Boom):
+        list(p(explode_after(data, 23),
+               checkpoint=Checkpoint(path, every=7)))
+
+    assert list(p(data, checkpoint=Checkpoint(path, every=7))) == [sum(data)]
+
+
+def test_resume_sort(tmpdir):
+
+    data = [5, 3, 1, 4, 2, 0]
+    path = str(tmpdir.join('checkpoint'))
+    p = Pipeline() | ops.sort()
+
+    with pytest.raises(Boom):
+        list(p(explode_after(data, 5),
+               checkpoint=Checkpoint(path, every=2)))
+
+    assert list(p(data, checkpoint=Checkpoint(path, every=2))) == sorted(data)
+
+
+@pytest.mark.parametrize("sort", [True, False])
+def test_resume_group_by(tmpdir, sort):
+
+    """The group in progress survives a resume."""
+
+    from tinyflow import aggregate as agg
+
+    data = ['a'] * 5 + ['b'] * 3
+    path = str(tmpdir.join('checkpoint'))
+    p = Pipeline() | ops.group_by(lambda x: x, {'n': agg.count()}, sort)
+
+    with pytest.raises(Boom):
+        list(p(explode_after(data, 4),
+               checkpoint=Checkpoint(path, every=3)))
+
+    assert dict(p(data, checkpoint=Checkpoint(path, every=3))) \
+        == {'a': {'n': 5}, 'b': {'n': 3}}
+
+
+def test_checkpoint_mismatch(tmpdir):
+    path = str(tmpdir.join('checkpoint'))
+    Checkpoint(path).save(10, [None, None])
+    with pytest.raises(ValueError):
+        (Pipeline() | ops.counter())([], checkpoint=Checkpoint(path))
+
+
+def test_checkpoint_exceptions():
+    with pytest.raises(ValueError):
+        Checkpoint('path', every=None)
+
+
+@pytest.mark.parametrize("operation", [
+    ops.map(abs, pool='thread'),
+    ops.chunk(2),
+    ops.take(3),
+    ops.sample(k=2),
+    ops.read_jsonl(pool='thread'),
+    ops.read_csv(pool='process'),
+    Pipeline() | ops.chunk(2)])
+def test_not_checkpointable(tmpdir, operation):
+
+    """Operations holding items that are not part of their state cannot
+    be checkpointed.
+    """
+
+    p = Pipeline() | operation
+    checkpoint = Checkpoint(str(tmpdir.join('checkpoint')))
+    with pytest.raises(exceptions.NotCheckpointable):
+        p(range(10), checkpoint=checkpoint)
+    assert not os.path.exists(checkpoint.path)
+
+
+def test_checkpointable(tmpdir):
+    path = str(tmpdir.join('checkpoint'))
+    p = Pipeline() | ops.sample(rate=1.0) | ops.map(abs)
+    assert list(p([-1, 2], checkpoint=Checkpoint(path))) == [1, 2]
+    assert ops.read_jsonl().checkpointable
+    assert ops.read_csv().checkpointable
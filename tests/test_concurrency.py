@@ -0,0 +1,124 @@
+"""Tests for ``tinyflow.concurrency``."""
+
+
+from concurrent.futures import Future
+import functools
+import pickle
+
+import pytest
+
+from tinyflow.concurrency import AdaptiveLimit, RateLimit, TokenBucket
+
+
+def test_hill_climb():
+    limiter = AdaptiveLimit(minimum=1, maximum=16)
+    limiter._peak = 16
+
+    # Throughput keeps improving so the limit keeps growing
+    for throughput in (10, 20, 30):
+        limiter._peak = limiter.limit
+        limiter._adjust(throughput, 0)
+    assert limiter.limit == 4
+
+    # Throughput dropped, so back off
+    limiter._peak = limiter.limit
+    limiter._adjust(10, 0)
+    assert limiter.limit == 3
+
+
+def test_bounds():
+    limiter = AdaptiveLimit(minimum=2, maximum=3, initial=10)
+    assert limiter.limit == 3
+    for throughput in range(1, 10):
+        limiter._peak = limiter.limit
+        limiter._adjust(throughput, 0)
+        assert 2 <= limiter.limit <= 3
+
+    with pytest.raises(ValueError):
+        AdaptiveLimit(minimum=0)
+    with pytest.raises(ValueError):
+        AdaptiveLimit(minimum=4, maximum=2)
+
+
+def test_starved():
+
+    """The limit does not grow when the window was never full."""
+
+    limiter = AdaptiveLimit(minimum=1, maximum=16, initial=8)
+    limiter._peak = 2
+    limiter._adjust(100, 0)
+    assert limiter.limit == 8
+
+
+def test_latency():
+
+    """Tasks waiting for a saturated resource shrink the limit even when
+    throughput still grows.
+    """
+
+    limiter = AdaptiveLimit(minimum=1, maximum=16, initial=8)
+    limiter._peak = 8
+    limiter._adjust(100, 0, latency=0.1)
+    assert limiter.limit == 10
+    limiter._peak = 10
+    limiter._adjust(110, 0, latency=0.5)
+    assert limiter.limit == 8
+    assert limiter.latency == 0.5
+
+    limiter = AdaptiveLimit(minimum=1, maximum=16, initial=8, max_latency=None)
+    limiter._peak = 8
+    limiter._adjust(100, 0, latency=0.1)
+    limiter._peak = 10
+    limiter._adjust(110, 0, latency=0.5)
+    assert limiter.limit == 12
+
+
+def test_callbacks():
+    limiter = AdaptiveLimit(interval=0)
+    limiter.finished(limiter.started(), Future())
+    assert limiter.latency >= 0
+    assert limiter.throughput > 0
+
+    limiter = pickle.loads(pickle.dumps(limiter))
+    limiter.finished(limiter.started())
+
+
+def test_cancelled():
+
+    """Cancelled tasks leave the window but are not throughput."""
+
+    limiter = AdaptiveLimit(interval=60)
+    future = Future()
+    future.add_done_callback(
+        functools.partial(limiter.finished, limiter.started()))
+    assert limiter._in_flight == 1
+    future.cancel()
+    assert limiter._in_flight == 0
+    assert limiter._completed == 0
+
+
+def test_token_bucket():
+    bucket = TokenBucket(10, capacity=2)
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    # Empty, so the next token is 0.1 seconds away
+    assert 0.05 < bucket.reserve() <= 0.1
+    # Requests larger than the capacity go into debt rather than failing
+    assert 0.5 < bucket.reserve(5) <= 0.6
+
+    bucket = pickle.loads(pickle.dumps(bucket))
+    assert bucket.reserve() > 0
+
+    with pytest.raises(ValueError):
+        TokenBucket(0)
+
+
+def test_rate_limit():
+    limit = RateLimit(rate=1000, byte_rate=100, burst=0.1)
+    # 10 bytes of burst
+    assert limit.acquire(b'x' * 10) == 0
+    assert 0 < limit.acquire(b'x' * 2) <= 0.03
+    assert limit.waited > 0
+
+    with pytest.raises(ValueError):
+        RateLimit()
@@ -0,0 +1,147 @@
+"""Tests for ``tinyflow.index``."""
+
+
+import io
+import os
+
+import pytest
+
+from tinyflow import index, ops, Pipeline
+from tinyflow.index import LineIndex, LineRange
+
+
+@pytest.fixture(scope='function')
+def textfile(tmpdir):
+    path = str(tmpdir.join('lines.txt'))
+    with io.open(path, 'w', encoding='utf-8') as f:
+        for i in range(1000):
+            f.write(u'línea {}\n'.format(i))
+    return path
+
+
+@pytest.mark.parametrize("content,lines", [
+    (b'', 0),
+    (b'a', 1),
+    (b'a\n', 1),
+    (b'a\nb', 2),
+    (b'\n\n\n', 3)])
+def test_build_line_count(tmpdir, content, lines):
+    path = str(tmpdir.join('f.txt'))
+    with open(path, 'wb') as f:
+        f.write(content)
+    for stride in (1, 2, 1000):
+        assert len(LineIndex.build(path, stride=stride)) == lines
+
+
+@pytest.mark.parametrize("stride", [1, 7, 1000])
+def test_build_offsets(textfile, stride):
+    with open(textfile, 'rb') as f:
+        starts = [0]
+        for line in f:
+            starts.append(starts[-1] + len(line))
+    starts.pop()
+    idx = LineIndex.build(textfile, stride=stride, blocksize=100)
+    assert list(idx.offsets) == starts[::stride]
+    assert len(idx) == 1000
+
+
+@pytest.mark.parametrize("line", [0, 1, 6, 7, 500, 999, 1000])
+def test_seek(textfile, line):
+    idx = LineIndex.build(textfile, stride=7)
+    with io.open(textfile, encoding='utf-8') as f:
+        idx.seek(f, line)
+        actual = f.readline()
+    expected = u'línea {}\n'.format(line) if line < 1000 else u''
+    assert actual == expected
+
+
+def test_save_load(textfile):
+    idx = LineIndex.build(textfile, stride=3)
+    idx.save()
+    assert os.path.exists(LineIndex.sidecar(textfile))
+    loaded = LineIndex.load(textfile)
+    assert list(loaded.offsets) == list(idx.offsets)
+    assert (loaded.lines, loaded.stride) == (idx.lines, idx.stride)
+    assert loaded.is_current()
+
+
+def test_line_index_reuse(textfile, monkeypatch):
+    idx = index.line_index(textfile, stride=10)
+    assert index.line_index(textfile) is idx
+
+    # Loaded from the sidecar instead of being rebuilt
+    index._INDEXES.clear()
+    monkeypatch.setattr(LineIndex, 'build', None)
+    assert index.line_index(textfile).stride == 10
+
+
+def test_line_index_file_changed(textfile):
+    assert len(index.line_index(textfile)) == 1000
+    with open(textfile, 'a') as f:
+        f.write('more\n')
+    os.utime(textfile, (0, 0))
+    assert len(index.line_index(textfile)) == 1001
+
+
+def test_split(textfile):
+    ranges = LineIndex.build(textfile, stride=10).split(4)
+    assert len(ranges) == 4
+    assert ranges[0].start == 0
+    assert ranges[-1].stop == 1000
+    for a, b in zip(ranges[:-1], ranges[1:]):
+        assert a.stop == b.start
+
+
+def test_cat_line_range(textfile):
+    lines = list(ops.cat(encoding='utf-8')([
+        LineRange(textfile, 998, None),
+        LineRange(textfile, 10, 12)]))
+    assert lines == [u'línea {}\n'.format(i) for i in (998, 999, 10, 11)]
+
+
+def test_split_lines(textfile):
+    p = Pipeline() | ops.split_lines(3, stride=5) | ops.cat(encoding='utf-8')
+    with io.open(textfile, encoding='utf-8') as f:
+        assert list(p([textfile])) == list(f)
+
+
+def test_split_lines_blocks(textfile):
+    p = Pipeline() \
+        | ops.split_lines(3, stride=5) \
+        | ops.cat(encoding='utf-8', blocksize=100)
+    with io.open(textfile, encoding='utf-8') as f:
+        assert ''.join(p([textfile])) == f.read()
+
+
+def test_split_size(textfile):
+    line_index = LineIndex.build(textfile, stride=10)
+    ranges = line_index.split(size=line_index.size // 5)
+    assert 4 <= len(ranges) <= 6
+    assert sum(line_index.nbytes(r) for r in ranges) == line_index.size
+    assert ranges[-1].stop == 1000
+    with pytest.raises(ValueError):
+        line_index.split()
+    with pytest.raises(ValueError):
+        line_index.split(2, size=100)
+
+
+def test_split_lines_largest_first(tmpdir, textfile):
+
+    """Large files are split by size and the largest ranges come first."""
+
+    small = str(tmpdir.join('small.txt'))
+    with open(small, 'w') as f:
+        f.write('small\n')
+
+    p = Pipeline() | ops.split_lines(
+        size=os.path.getsize(textfile) // 4, stride=10, largest_first=True)
+    ranges = list(p([small, textfile]))
+    assert ranges[-1] == LineRange(small, 0, 1)
+    assert len(ranges) >= 4
+    sizes = [index.line_index(r.path).nbytes(r) for r in ranges]
+    assert sizes == sorted(sizes, reverse=True)
+
+    lines = Pipeline() | ops.cat(encoding='utf-8')
+    with io.open(textfile, encoding='utf-8') as f:
+        expected = sorted(f) + ['small\n']
+    assert sorted(lines(ranges)) == sorted(expected)
@@ -1,14 +1,17 @@
 """Tests for ``tinyflow.ops``."""
 
 
+from collections import Counter
 from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
-import inspect
+import itertools as it
+import json
 import operator as op
-import os
+import threading
+import time
 
 import pytest
 
-from tinyflow import _testing, exceptions, ops, Pipeline, tools
+from tinyflow import _testing, exceptions, MapPipeline, ops, Pipeline, tools
 
 
 def test_default_description():
@@ -249,6 +252,72 @@ def test_cat():
             assert e == a
 
 
+def test_cat_blocksize():
+    with open('LICENSE.txt') as f:
+        expected = f.read()
+    blocks = list(ops.cat(blocksize=100)(['LICENSE.txt']))
+    assert len(blocks) > 1
+    assert all(b.endswith('\n') for b in blocks)
+    assert ''.join(blocks) == expected
+
+
+def test_cat_blocksize_binary():
+
+    """Blocks are assembled from text, so binary openers are rejected."""
+
+    o = ops.cat(opener=open, mode='rb', blocksize=100)
+    with pytest.raises(TypeError):
+        list(o(['LICENSE.txt']))
+    with pytest.raises(TypeError):
+        list(o([('LICENSE.txt', 0, 5)]))
+
+
+def test_tokenize():
+    text = ['The cat and\nthe hat ', 'AND the bat']
+
+    p = Pipeline() | ops.tokenize()
+    assert list(p(text)) == [
+        'The', 'cat', 'and', 'the', 'hat', 'AND', 'the', 'bat']
+
+    p = Pipeline() | ops.tokenize(
+        casefold=True, stopwords=['the', 'and'], batch=True)
+    assert list(p(text)) == [['cat', 'hat'], ['bat']]
+
+    p = Pipeline() | ops.tokenize(r'(\w)at')
+    assert list(p(text)) == ['c', 'h', 'b']
+
+
+def test_tokenize_wordcount():
+
+    """Matches the word count built from individual operations."""
+
+    chain = Pipeline() \
+        | ops.cat() \
+        | ops.methodcaller('lower') \
+        | ops.methodcaller('split') \
+        | ops.filter() \
+        | ops.flatten() \
+        | ops.counter()
+    blocks = Pipeline() \
+        | ops.cat(blocksize=512) \
+        | ops.tokenize(casefold=True) \
+        | ops.counter()
+    assert dict(blocks(['LICENSE.txt'])) == dict(chain(['LICENSE.txt']))
+
+
+def test_tokenize_differences():
+
+    """Differences from the chain of operations described in the
+    docstring.
+    """
+
+    text = [u'Stra\xdfe end.']
+    p = Pipeline() | ops.methodcaller('lower') | ops.tokenize()
+    assert list(p(text)) == [u'stra\xdfe', u'end.']
+    p = Pipeline() | ops.tokenize(r'\w+', casefold=True)
+    assert list(p(text)) == [u'strasse', u'end']
+
+
 def test_module_all():
 
     """Make sure all the operations are registered in
@@ -264,6 +333,560 @@ def test_module_all():
 
     # Ensure all 'Operation()' subclasses are listed in '__all__'.
     for cls in ops.Operation.__subclasses__():
-        if os.path.join('tinyflow/tests') in inspect.getfile(cls):
+        # Like operations defined by other tests
+        if cls.__module__ != ops.__name__:
             continue
         assert cls.__name__ in ops.__all__
+
+
+@pytest.mark.parametrize("argtype,data", [
+    ('single', [1, 2, 1, 1, 3]),
+    ('*args', [(1,), (2,), (1,), (1,), (3,)]),
+    ('**kwargs', [{'a': 1}, {'a': 2}, {'a': 1}, {'a': 1}, {'a': 3}])])
+def test_map_memoize(argtype, data):
+
+    calls = []
+
+    def func(a):
+        calls.append(a)
+        return -a
+
+    o = ops.map(func, argtype=argtype, memoize=2)
+    assert list(o(data)) == [-1, -2, -1, -1, -3]
+    assert calls == [1, 2, 3]
+    assert (o.memo.hits, o.memo.misses) == (2, 3)
+
+
+def test_map_memoize_iterator():
+    o = ops.map(lambda x: iter([x, x]), memoize=True)
+    assert list(o([1, 1])) == [[1, 1], [1, 1]]
+
+
+@pytest.mark.parametrize("pool_class,pool_name", [
+    (ThreadPoolExecutor, 'thread'),
+    (ProcessPoolExecutor, 'process')])
+def test_map_memoize_pool(pool_class, pool_name):
+    data = [1, 2, 3] * 20
+    p = Pipeline() | ops.map(op.neg, pool=pool_name, memoize=10)
+    with pool_class(2) as pool:
+        actual = list(p(data, **{'{}_pool'.format(pool_name): pool}))
+    assert sorted(actual) == sorted(-i for i in data)
+    memo = p.operations[0].memo
+    assert len(memo) == 3
+    assert memo.hits + memo.misses == len(data)
+
+
+
+def test_chunk_typecode():
+    p = Pipeline() | ops.chunk(3, typecode='d') | ops.map(sum)
+    assert list(p(range(8))) == [3.0, 12.0, 13.0]
+
+    with pytest.raises(ValueError):
+        ops.chunk(3, typecode='d', dtype='float64')
+
+
+def test_drop_take_sequences():
+    p = Pipeline() | ops.drop(10 ** 17) | ops.take(3)
+    assert list(p(range(10 ** 18))) == [10 ** 17, 10 ** 17 + 1, 10 ** 17 + 2]
+
+    # Drop should not be consuming a list item by item
+    class Sequence(list):
+        def __iter__(self):
+            raise AssertionError("Iterated")
+    data = Sequence(range(10))
+    assert list(ops.drop(8)(data)) == [8, 9]
+    assert list(ops.take(2)(data)) == [0, 1]
+
+
+def test_drop_file(tmpdir):
+    path = str(tmpdir.join('lines.txt'))
+    with open(path, 'w') as f:
+        f.write('\n'.join(map(str, range(10))))
+    p = Pipeline() | ops.drop(7) | ops.map(int)
+    with open(path) as f:
+        assert list(p(f)) == [7, 8, 9]
+        assert not f.closed
+
+
+def _sessions(stream):
+    return [(key, len(list(group)))
+            for key, group in it.groupby(sorted(stream))]
+
+
+@pytest.mark.parametrize("pool,spill", [
+    (None, False),
+    (None, True),
+    ('thread', False),
+    ('process', True),
+])
+def test_partition_by(pool, spill):
+    data = ['a', 'b', 'a', 'c', 'b', 'a', 'd']
+    p = Pipeline() \
+        | ops.partition_by(
+            op.itemgetter(0), 3, Pipeline() | ops.counter(),
+            pool=pool, spill=spill)
+    with ThreadPoolExecutor(2) as tpool, ProcessPoolExecutor(2) as ppool:
+        actual = p(data, process_pool=ppool, thread_pool=tpool)
+        assert sorted(actual) == [('a', 3), ('b', 2), ('c', 1), ('d', 1)]
+
+
+def test_partition_by_reduce_by_key():
+
+    """Default arguments of operations can be shipped to a process."""
+
+    data = ['a', 'b', 'a', 'c', 'b', 'a', 'd']
+    reduce = Pipeline() | ops.reduce_by_key(op.iadd, op.itemgetter(0))
+    p = Pipeline() | ops.partition_by(
+        op.itemgetter(0), 2, reduce, pool='process')
+    with ProcessPoolExecutor(2) as pool:
+        actual = p(data, process_pool=pool)
+        assert sorted(actual) == [
+            ('a', 'aaa'), ('b', 'bb'), ('c', 'c'), ('d', 'd')]
+
+
+def test_partition_by_callable():
+
+    """Every key is processed by exactly one sub-pipeline call."""
+
+    p = Pipeline() | ops.partition_by(lambda x: x % 4, 2, _sessions)
+    assert sorted(p(range(20))) == [(i, 1) for i in range(20)]
+
+    def keys(stream):
+        return [sorted({x % 4 for x in stream})]
+
+    p = Pipeline() | ops.partition_by(lambda x: x % 4, 2, keys)
+    partitions = list(p(range(20)))
+    assert sorted(k for keys in partitions for k in keys) == [0, 1, 2, 3]
+
+    with pytest.raises(ValueError):
+        ops.partition_by(len, 0, _sessions)
+
+
+@pytest.mark.parametrize("kwargs", [
+    {},
+    {'max_build': 2, 'partitions': 3},
+    {'strategy': 'merge'},
+])
+@pytest.mark.parametrize("how", ['inner', 'left'])
+def test_join(kwargs, how):
+    users = [(1, 'a'), (2, 'b'), (2, 'bb'), (4, 'd')]
+    events = [(1, 'x'), (2, 'y'), (3, 'z'), (4, 'w'), (4, 'v')]
+
+    p = Pipeline() | ops.join(
+        users, op.itemgetter(0), how=how, **kwargs)
+    expected = [
+        ((1, 'x'), (1, 'a')),
+        ((2, 'y'), (2, 'b')),
+        ((2, 'y'), (2, 'bb')),
+        ((4, 'w'), (4, 'd')),
+        ((4, 'v'), (4, 'd'))]
+    if how == 'left':
+        expected.append(((3, 'z'), None))
+    assert sorted(p(events), key=repr) == sorted(expected, key=repr)
+
+
+def test_join_window():
+    left = [1, 2, 3, 4, 5, 6]
+    right = [6, 1, 2, 9, 9, 4]
+    p = Pipeline() | ops.join(
+        right, lambda x: x, strategy='window', window=2)
+    # Items are read in turn, so 6 from 'right' is no longer in the window
+    # by the time 6 arrives on the left, and 1 is matched before it is
+    # evicted.
+    assert list(p(left)) == [(1, 1), (2, 2)]
+
+
+def test_join_invalid():
+    with pytest.raises(ValueError):
+        ops.join([], len, how='outer')
+    with pytest.raises(ValueError):
+        ops.join([], len, strategy='nested')
+    with pytest.raises(ValueError):
+        ops.join([], len, how='left', strategy='window')
+
+
+@pytest.mark.parametrize("kwargs", [
+    {},
+    {'digest': True},
+    {'max_keys': 3, 'partitions': 2},
+    {'mode': 'bloom'},
+])
+def test_distinct(kwargs):
+    data = [5, 1, 5, 2, 1, 3, 4, 4, 6, 2, 7, 7]
+    p = Pipeline() | ops.distinct(**kwargs)
+    actual = list(p(data))
+    assert sorted(actual) == [1, 2, 3, 4, 5, 6, 7]
+    if 'max_keys' not in kwargs:
+        assert actual == [5, 1, 2, 3, 4, 6, 7]
+
+
+def test_distinct_keyfunc():
+    p = Pipeline() | ops.distinct(keyfunc=op.itemgetter(0))
+    assert list(p(['ab', 'ac', 'ba'])) == ['ab', 'ba']
+    with pytest.raises(ValueError):
+        ops.distinct(mode='fuzzy')
+
+
+def test_count_distinct():
+    p = Pipeline() | ops.count_distinct(keyfunc=lambda x: x % 1000)
+    count, = p(range(10000))
+    assert abs(count - 1000) < 30
+
+    p = Pipeline() | ops.count_distinct(precision=10, emit_sketch=True)
+    sketch, = p(range(10))
+    assert len(sketch) == 10
+
+
+@pytest.mark.parametrize("data", [range(1000), iter(range(1000))])
+def test_sample_reservoir(data):
+    p = Pipeline() | ops.sample(k=10, seed=1)
+    actual = list(p(data))
+    assert len(actual) == 10
+    assert actual == sorted(set(actual))
+    assert list(p(range(5))) == [0, 1, 2, 3, 4]
+
+
+def test_sample_reservoir_uniform():
+
+    """Every position should be sampled about equally often."""
+
+    counts = [0] * 10
+    for seed in range(2000):
+        for item in (Pipeline() | ops.sample(k=2, seed=seed))(iter(range(10))):
+            counts[item] += 1
+    assert min(counts) > 300 and max(counts) < 500
+
+
+@pytest.mark.parametrize("data", [range(10000), iter(range(10000))])
+def test_sample_bernoulli(data):
+    p = Pipeline() | ops.sample(rate=0.1, seed=3)
+    actual = list(p(data))
+    assert 850 < len(actual) < 1150
+    assert actual == sorted(set(actual))
+    assert list((Pipeline() | ops.sample(rate=0))(range(10))) == []
+    assert list((Pipeline() | ops.sample(rate=1))(range(3))) == [0, 1, 2]
+
+
+def test_sample_stratified():
+    data = [(i % 3, i) for i in range(300)]
+    p = Pipeline() | ops.sample(k=5, keyfunc=op.itemgetter(0), seed=7)
+    actual = list(p(data))
+    assert actual == sorted(actual, key=op.itemgetter(1))
+    assert sorted(Counter(k for k, _ in actual).items()) == [
+        (0, 5), (1, 5), (2, 5)]
+    assert actual == list(p(data))
+
+
+def test_sample_invalid():
+    with pytest.raises(ValueError):
+        ops.sample()
+    with pytest.raises(ValueError):
+        ops.sample(k=1, rate=0.1)
+    with pytest.raises(ValueError):
+        ops.sample(rate=0.1, keyfunc=len)
+    with pytest.raises(ValueError):
+        ops.sample(rate=2)
+
+
+@pytest.mark.parametrize("sort", [False, True])
+def test_group_by(sort):
+    from tinyflow import aggregate as agg
+
+    data = [('a', 1), ('b', 4), ('a', 3), ('b', 2), ('c', 5)]
+    if sort:
+        data.sort(key=op.itemgetter(0))
+    value = op.itemgetter(1)
+
+    p = Pipeline() | ops.group_by(op.itemgetter(0), {
+        'count': agg.count(),
+        'sum': agg.sum(value),
+        'max': agg.max(value),
+        'mean': agg.mean(value),
+        'median': agg.quantile(0.5, value),
+    }, sorted=sort)
+    actual = dict(p(data))
+    assert actual['a'] == {
+        'count': 2, 'sum': 4, 'max': 3, 'mean': 2.0, 'median': 1}
+    assert actual['c'] == {
+        'count': 1, 'sum': 5, 'max': 5, 'mean': 5.0, 'median': 5}
+
+    p = Pipeline() | ops.group_by(
+        op.itemgetter(0), [agg.collect(value)], sorted=sort)
+    assert sorted(p(data)) == [
+        ('a', ([1, 3],)), ('b', ([4, 2],)), ('c', ([5],))]
+
+
+def test_group_by_sorted_is_eager():
+    from tinyflow import aggregate as agg
+
+    def data():
+        yield 1
+        yield 1
+        yield 2
+        raise AssertionError("Read too far")
+
+    p = Pipeline() | ops.group_by(lambda x: x, [agg.count()], sorted=True)
+    assert next(p(data())) == (1, (2,))
+
+
+def test_quantiles():
+    p = Pipeline() | ops.quantiles([0, 0.5, 0.9], valfunc=abs)
+    actual = dict(p(range(-10000, 0)))
+    assert actual[0] == 1
+    assert abs(actual[0.5] - 5000) < 300
+    assert abs(actual[0.9] - 9000) < 300
+
+
+def test_quantiles_merge():
+
+    """Sketches produced by sub-pipelines on a pool can be merged."""
+
+    per_chunk = MapPipeline() \
+        | ops.flatten() \
+        | ops.quantiles(emit_sketch=True)
+    p = Pipeline() \
+        | ops.chunk(1000) \
+        | ops.map(per_chunk, pool='thread', flatten=True) \
+        | ops.quantiles([0.5], merge=True)
+    with ThreadPoolExecutor(2) as pool:
+        (_, median), = p(range(10000), thread_pool=pool)
+    assert abs(median - 5000) < 300
+
+
+def test_histogram():
+    p = Pipeline() | ops.histogram(4)
+    assert list(p(range(100))) == [
+        (0, 24.75, 25), (24.75, 49.5, 25), (49.5, 74.25, 25),
+        (74.25, 99, 25)]
+
+    p = Pipeline() | ops.histogram([0, 10, 100])
+    assert list(p(range(50))) == [(0, 10, 10), (10, 100, 40)]
+
+    assert list((Pipeline() | ops.histogram())([3, 3])) == [(3, 3, 2)]
+    assert list((Pipeline() | ops.histogram())([])) == []
+
+
+@pytest.fixture(scope='function')
+def jsonl_file(tmpdir):
+    path = str(tmpdir.join('data.jsonl'))
+    with open(path, 'w') as f:
+        for i in range(100):
+            f.write(json.dumps({'id': i, 'name': str(i), 'extra': [i]}))
+            f.write('\n')
+    return path
+
+
+@pytest.mark.parametrize("pool", [None, 'thread', 'process'])
+def test_read_jsonl(jsonl_file, pool):
+    p = Pipeline() | ops.read_jsonl(
+        fields=['id', 'name'], output='tuple', pool=pool, blocksize=64,
+        prefetch=2)
+    with ThreadPoolExecutor(2) as tpool, ProcessPoolExecutor(2) as ppool:
+        actual = list(p([jsonl_file], thread_pool=tpool, process_pool=ppool))
+    assert actual == [(i, str(i)) for i in range(100)]
+
+
+def test_read_jsonl_dicts(jsonl_file):
+    p = Pipeline() | ops.read_jsonl()
+    assert list(p([jsonl_file]))[1] == {'id': 1, 'name': '1', 'extra': [1]}
+
+    p = Pipeline() | ops.read_jsonl(fields=['id'], output='columns')
+    columns, = p([jsonl_file])
+    assert columns == {'id': list(range(100))}
+
+    with pytest.raises(ValueError):
+        ops.read_jsonl(output='tuple')
+    with pytest.raises(ValueError):
+        ops.read_jsonl(output='arrow')
+
+
+@pytest.mark.parametrize("pool", [None, 'process'])
+def test_read_csv(tmpdir, pool):
+    path = str(tmpdir.join('data.csv'))
+    with open(path, 'w') as f:
+        f.write('id,text,value\n')
+        for i in range(50):
+            f.write('{},"line\n{}",{}\n'.format(i, i, i * 2))
+
+    p = Pipeline() | ops.read_csv(
+        fields=['value', 'text'], pool=pool, blocksize=32)
+    with ProcessPoolExecutor(2) as ppool:
+        actual = list(p([path], process_pool=ppool))
+    assert actual == [
+        {'value': str(i * 2), 'text': 'line\n{}'.format(i)}
+        for i in range(50)]
+
+    p = Pipeline() | ops.read_csv(header=False, fields=[0], output='tuple')
+    assert list(p([path]))[:2] == [('id',), ('0',)]
+
+    with pytest.raises(ValueError):
+        list((Pipeline() | ops.read_csv(fields=['missing']))([path]))
+    with pytest.raises(ValueError):
+        ops.read_csv(header=False)
+
+
+def test_map_concurrency():
+
+    """A fixed window bounds the number of items in flight."""
+
+    lock = threading.Lock()
+    active = [0]
+    peak = [0]
+
+    def work(x):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.001)
+        with lock:
+            active[0] -= 1
+        return x * 2
+
+    p = Pipeline() | ops.map(work, pool='thread', concurrency=3)
+    with ThreadPoolExecutor(8) as pool:
+        actual = sorted(p(range(50), thread_pool=pool))
+    assert actual == list(range(0, 100, 2))
+    assert peak[0] <= 3
+
+    with pytest.raises(ValueError):
+        ops.map(abs, concurrency='fast')
+
+
+def test_map_adaptive_concurrency():
+
+    """I/O bound work grows the window."""
+
+    from tinyflow.concurrency import AdaptiveLimit
+
+    def work(x):
+        time.sleep(0.005)
+        return x
+
+    limiter = AdaptiveLimit(maximum=16, interval=0.02)
+    p = Pipeline() | ops.map(work, pool='thread', concurrency=limiter)
+    with ThreadPoolExecutor(16) as pool:
+        assert sorted(p(range(400), thread_pool=pool)) == list(range(400))
+    assert limiter.limit > 1
+
+    p = Pipeline() | ops.map(work, pool='thread', concurrency='adaptive')
+    with ThreadPoolExecutor(4) as pool:
+        assert sorted(p(range(10), thread_pool=pool)) == list(range(10))
+    assert p.operations[0].limiter.limit >= 1
+
+
+def test_map_retries():
+
+    """Failed items are retried and dead lettered without stopping the
+    stream.
+    """
+
+    attempts = Counter()
+
+    def flaky(x):
+        attempts[x] += 1
+        if x % 5 == 0 and attempts[x] < 3:
+            raise ValueError(x)
+        elif x == 7:
+            raise KeyError(x)
+        return x
+
+    dead = []
+    p = Pipeline() | ops.map(
+        flaky, pool='thread', retries=2, backoff=0.001,
+        dead_letter=dead.append)
+    with ThreadPoolExecutor(4) as pool:
+        actual = sorted(p(range(20), thread_pool=pool))
+    assert actual == [i for i in range(20) if i != 7]
+    assert attempts[5] == 3
+    assert attempts[7] == 3
+
+    letter, = dead
+    assert letter.item == 7
+    assert letter.attempts == 3
+    assert isinstance(letter.error, KeyError)
+
+    # Without a dead letter callback the last error is raised
+    p = Pipeline() | ops.map(flaky, pool='thread', retries=1, backoff=0)
+    with ThreadPoolExecutor(4) as pool:
+        with pytest.raises(KeyError):
+            list(p(range(20), thread_pool=pool))
+
+
+def test_map_timeout():
+
+    """A hung item does not hold up results behind it."""
+
+    release = threading.Event()
+
+    def work(x):
+        if x == 0:
+            release.wait(5)
+        return x
+
+    dead = []
+    p = Pipeline() | ops.map(
+        work, pool='thread', timeout=0.05, dead_letter=dead.append,
+        concurrency=2)
+    with ThreadPoolExecutor(3) as pool:
+        try:
+            stream = p(range(10), thread_pool=pool)
+            assert next(stream) == 1
+            assert sorted(stream) == list(range(2, 10))
+        finally:
+            release.set()
+    letter, = dead
+    assert letter.item == 0
+    assert letter.attempts == 1
+    assert 'did not finish' in str(letter.error)
+
+
+def test_map_timeout_queued():
+
+    """Time spent waiting for a worker does not count against the
+    timeout.
+    """
+
+    def work(x):
+        time.sleep(0.02)
+        return x
+
+    dead = []
+    p = Pipeline(threads=4) | ops.map(
+        work, pool='thread', timeout=0.1, dead_letter=dead.append)
+    with p:
+        assert sorted(p(range(40))) == list(range(40))
+    assert not dead
+
+    p = Pipeline() | ops.map(
+        work, pool='thread', timeout=0.1, dead_letter=dead.append,
+        concurrency=4)
+    with ThreadPoolExecutor(4) as pool:
+        assert sorted(p(range(40), thread_pool=pool)) == list(range(40))
+    assert not dead
+
+
+def test_map_retries_validate():
+    with pytest.raises(ValueError):
+        ops.map(abs, retries=2)
+    with pytest.raises(ValueError):
+        ops.map(abs, pool='thread', timeout=1, memoize=10)
+
+
+def test_throttle():
+    p = Pipeline() | ops.throttle(200, burst=0.005)
+    start = time.time()
+    assert list(p(range(11))) == list(range(11))
+    assert time.time() - start >= 0.045
+
+
+def test_map_rate_limit():
+    p = Pipeline() | ops.map(abs, pool='thread', rate_limit=200)
+    p.operations[0].rate_limit.items.tokens = 1
+    start = time.time()
+    with ThreadPoolExecutor(4) as pool:
+        assert sorted(p(range(11), thread_pool=pool)) == list(range(11))
+    assert time.time() - start >= 0.045
+    assert p.operations[0].rate_limit.waited > 0
+
+    with pytest.raises(ValueError):
+        ops.map(abs, rate_limit=10)
@@ -1,9 +1,13 @@
 """Tests for ``tinyflow.serial.pipeline``."""
 
 
+import pickle
+import subprocess
+import sys
+
 import pytest
 
-from tinyflow import Pipeline
+from tinyflow import ops, Pipeline, tools
 from tinyflow.exceptions import NotAnOperation
 
 
@@ -22,3 +26,82 @@ def test_Pipeline_subclass_close():
     with P() as p:
         assert not p.closed
     assert p.closed
+
+
+def test_lazy_import():
+
+    """Importing ``tinyflow`` does not load operations, and loading
+    operations does not load the modules only some of them need.
+    """
+
+    code = """
+import sys
+import tinyflow
+assert 'tinyflow.ops' not in sys.modules
+from tinyflow import ops, Pipeline
+assert 'tinyflow.pipeline' in sys.modules
+for name in ('multiprocessing', 'tinyflow.sketch', 'tinyflow.sink'):
+    assert name not in sys.modules, name
+list(ops.count_distinct()(['a']))
+assert 'tinyflow.sketch' in sys.modules
+assert 'ops' in dir(tinyflow)
+"""
+    subprocess.check_call([sys.executable, '-c', code])
+
+
+def test_operations_slots():
+    for operation in (ops.map(abs), ops.flatten(), ops.cache(abs, '.')):
+        assert not hasattr(operation, '__dict__')
+    operation = 'absolute' >> ops.map(abs)
+    assert tools.attributes(operation)['func'] is abs
+    assert tools.attributes(operation)['_description'] == 'absolute'
+
+
+def test_compose_many():
+    p = Pipeline()
+    for _ in range(1000):
+        p |= ops.map(abs)
+    assert isinstance(p.operations, tuple)
+    assert len(p.operations) == 1000
+    assert list(p([-1])) == [1]
+
+
+@pytest.mark.parametrize('protocol', range(pickle.HIGHEST_PROTOCOL + 1))
+def test_pickle(protocol):
+    p = Pipeline() \
+        | 'absolute' >> ops.map(abs) \
+        | ops.filter() \
+        | ops.sort(reverse=True)
+    loaded = pickle.loads(pickle.dumps(p, protocol=protocol))
+    assert [o.description for o in loaded.operations][0] == 'absolute'
+    assert all(o.pipeline is loaded for o in loaded.operations)
+    assert list(loaded([-2, 0, 1])) == [2, 1]
+
+
+def test_clone():
+    sub = Pipeline() | ops.map(abs)
+    template = Pipeline() | sub | ops.counter()
+    clone = template.clone()
+
+    assert len(clone.operations) == len(template.operations)
+    for original, copied in zip(template.operations, clone.operations):
+        assert type(original) is type(copied)
+        assert original is not copied
+        assert copied.pipeline is clone
+    # Functions are shared
+    assert clone.operations[0].operations[0].func is abs
+
+    clone |= ops.take(1)
+    assert len(template.operations) == 2
+    assert list(clone([-1, 1, 2])) == [(1, 2)]
+
+
+def test_clone_after_run():
+    template = Pipeline(threads=2) | ops.map(abs, pool='thread')
+    with template:
+        assert list(template([-1])) == [1]
+        clone = template.clone()
+        assert clone.operations[0].worker_pool is None
+        with clone:
+            assert list(clone([-2])) == [2]
+        pickle.loads(pickle.dumps(template))
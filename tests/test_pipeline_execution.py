@@ -2,7 +2,10 @@
 
 
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 import itertools as it
+import multiprocessing
+import time
 
 import pytest
 
@@ -80,3 +83,140 @@ def test_subpipeline():
     expected = tuple(map(lambda x: (x - 1) ** 2, data))
     actual = tuple(pipeline(data))
     assert expected == actual
+
+
+def test_take_cancels_pool_work():
+
+    calls = []
+
+    def slow(x):
+        calls.append(x)
+        time.sleep(0.01)
+        return x
+
+    p = Pipeline() \
+        | ops.map(slow, pool='thread') \
+        | ops.take(2)
+
+    with ThreadPoolExecutor(1) as pool:
+        assert len(list(p(range(100), thread_pool=pool))) == 2
+        assert not p.operations[0].queue
+    assert len(calls) < 100
+
+
+def test_caller_stream_left_open():
+
+    """Generators handed to a pipeline belong to the caller."""
+
+    gen = (i for i in range(10))
+    assert list((Pipeline() | ops.take(2))(gen)) == [0, 1]
+    assert list(gen) == list(range(2, 10))
+
+    gen = (i for i in range(10))
+    assert list((Pipeline() | ops.wrap(lambda s: s) | ops.take(2))(gen)) \
+        == [0, 1]
+    assert list(gen) == list(range(2, 10))
+
+
+def test_workers():
+    p = Pipeline(threads=3, processes=True)
+    assert p.workers('thread') == 3
+    assert p.workers('process') == multiprocessing.cpu_count()
+    assert Pipeline().workers('thread') is None
+
+    # Pools passed to the pipeline are not inspected
+    with ThreadPoolExecutor(2) as pool:
+        p([], thread_pool=pool)
+        assert p.workers('thread') is None
+
+
+def test_close_stops_pipeline(tmpdir):
+
+    path = str(tmpdir.join('data.txt'))
+    with open(path, 'w') as f:
+        f.write('line\n' * 10)
+
+    files = []
+
+    def opener(*args, **kwargs):
+        f = open(*args, **kwargs)
+        files.append(f)
+        return f
+
+    class P(Pipeline):
+        closed = 0
+
+        def close(self):
+            self.closed += 1
+
+    p = P() | ops.cat(opener=opener) | ops.map(lambda x: x, pool='thread')
+    with ThreadPoolExecutor(2) as pool:
+        stream = p([path], thread_pool=pool)
+        next(stream)
+        assert p.closed == 0
+        stream.close()
+        assert p.closed == 1
+        assert files[0].closed
+
+        assert list(p([], thread_pool=pool)) == []
+        assert p.closed == 2
+
+
+def test_subclass_close_on_exception():
+
+    class P(Pipeline):
+        closed = False
+
+        def close(self):
+            self.closed = True
+
+    p = P() | ops.map(lambda x: 1 / x)
+    with pytest.raises(ZeroDivisionError):
+        list(p([1, 0]))
+    assert p.closed
+
+
+def test_owned_thread_pool():
+
+    p = Pipeline(threads=2) | ops.map(lambda x: x * 2, pool='thread')
+    with p:
+        assert sorted(p(range(10))) == [i * 2 for i in range(10)]
+        pool = p.thread_pool
+        # Reused between runs
+        assert sorted(p(range(3))) == [0, 2, 4]
+        assert p.thread_pool is pool
+        assert p.warm() is p
+    assert '_pools' not in p.__dict__
+
+    # Pools passed to the pipeline take precedence
+    with ThreadPoolExecutor(1) as pool:
+        assert sorted(p(range(3), thread_pool=pool)) == [0, 2, 4]
+        assert p.thread_pool is pool
+
+
+def _set_initialized(value):
+    import os
+    os.environ['TINYFLOW_TEST_INITIALIZED'] = value
+
+
+def _get_initialized(_):
+    import os
+    return os.environ.get('TINYFLOW_TEST_INITIALIZED')
+
+
+def test_owned_process_pool():
+
+    p = Pipeline(
+        processes=2, initializer=_set_initialized, initargs=('yes',),
+        imports=['json'])
+    p |= ops.map(_get_initialized, pool='process')
+    with p:
+        assert list(p(range(3))) == ['yes'] * 3
+    assert '_pools' not in p.__dict__
+
+
+def test_owned_pool_not_configured():
+
+    p = Pipeline(threads=2) | ops.map(lambda x: x, pool='process')
+    with pytest.raises(exceptions.NoPool):
+        list(p(range(3)))
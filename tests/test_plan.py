@@ -0,0 +1,146 @@
+"""Tests for ``tinyflow.plan``."""
+
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from tinyflow import ops, Pipeline
+from tinyflow.plan import Plan
+
+
+def _types(operations):
+    return [type(o) for o in operations]
+
+
+def test_push_filter():
+
+    calls = []
+
+    def square(x):
+        calls.append(x)
+        return x ** 2
+
+    p = Pipeline() \
+        | ops.map(square) \
+        | ops.filter(lambda x: x % 2, independent=True)
+    optimized = p.optimize()
+
+    assert _types(optimized.operations) == [ops.filter, ops.map]
+    assert list(optimized(range(10))) == [1, 9, 25, 49, 81]
+    assert calls == [1, 3, 5, 7, 9]
+
+
+def test_filter_not_independent():
+    p = Pipeline() | ops.map(abs) | ops.filter()
+    assert _types(p.optimize().operations) == [ops.map, ops.filter]
+
+
+def test_fuse_projection():
+    data = [(1, 'a'), (2, 'b'), (3, 'c')]
+    p = Pipeline() \
+        | ops.map(lambda x: (x[0] * 2, x[1])) \
+        | ops.drop(1) \
+        | ops.itemgetter(0)
+    optimized = p.optimize()
+    assert _types(optimized.operations) == [ops.map, ops.drop]
+    assert list(optimized(data)) == list(p(data)) == [4, 6]
+
+
+def test_fuse_projection_process_pool():
+    data = [(1, 'a'), (2, 'b')]
+    p = Pipeline() \
+        | ops.map(tuple, pool='process') \
+        | ops.itemgetter(1)
+    optimized = p.optimize()
+    assert _types(optimized.operations) == [ops.map]
+    with ProcessPoolExecutor(2) as pool:
+        assert sorted(optimized(data, process_pool=pool)) == ['a', 'b']
+
+
+def test_fuse_projection_keeps_options():
+    p = Pipeline() \
+        | "pair" >> ops.map(tuple, pool='thread', concurrency=2) \
+        | ops.itemgetter(1)
+    fused, = p.optimize().operations
+    assert (fused.pool, fused.concurrency.limit) == ('thread', 2)
+    assert fused.description != 'pair'
+    assert p.operations[0].func is tuple
+
+
+def test_hoist_take():
+    p = Pipeline() \
+        | ops.methodcaller('upper') \
+        | ops.itemgetter(0) \
+        | ops.take(5) \
+        | ops.take(2)
+    optimized = p.optimize()
+    assert _types(optimized.operations) == [ops.take, ops.map]
+    assert optimized.operations[0].count == 2
+    assert list(optimized(['ab', 'cd', 'ef'])) == ['A', 'C']
+
+
+def test_take_barrier():
+    p = Pipeline() | ops.map(abs, flatten=True) | ops.take(2)
+    assert _types(p.optimize().operations) == [ops.map, ops.take]
+    p = Pipeline() | ops.filter() | ops.take(2)
+    assert _types(p.optimize().operations) == [ops.filter, ops.take]
+
+
+def _drop_odd(x):
+    if x % 2:
+        raise ValueError(x)
+    return x
+
+
+def test_take_pool_barrier():
+
+    """Pooled maps are unordered, so a limit stays below them."""
+
+    p = Pipeline() | ops.map(abs, pool='thread') | ops.take(2)
+    assert _types(p.optimize().operations) == [ops.map, ops.take]
+
+
+def test_optimize_leaves_original():
+    p = Pipeline() | ops.map(abs, pool='thread') | ops.take(2)
+    optimized = p.optimize()
+    with ThreadPoolExecutor(2) as pool:
+        assert sorted(optimized([-1, -2], thread_pool=pool)) == [1, 2]
+        assert sorted(p([-1, -2], thread_pool=pool)) == [1, 2]
+    assert all(o.pipeline is p for o in p.operations)
+
+
+def test_take_resilient_barrier():
+
+    """Maps that can drop items are not one-to-one."""
+
+    dead = []
+    p = Pipeline() \
+        | ops.map(_drop_odd, pool='thread', dead_letter=dead.append) \
+        | ops.take(3)
+    optimized = p.optimize()
+    assert _types(optimized.operations) == [ops.map, ops.take]
+    with ThreadPoolExecutor(1) as pool:
+        assert sorted(optimized(range(10), thread_pool=pool)) \
+            == sorted(p(range(10), thread_pool=pool)) == [0, 2, 4]
+
+
+def test_merge_drop():
+    p = Pipeline() | ops.drop(2) | ops.drop(3)
+    optimized = p.optimize()
+    assert _types(optimized.operations) == [ops.drop]
+    assert list(optimized(range(7))) == [5, 6]
+
+
+def test_inline_subpipeline():
+    sub = Pipeline() | ops.map(abs)
+    p = Pipeline() | sub | ops.take(1)
+    assert _types(p.optimize().operations) == [ops.take, ops.map]
+
+
+def test_explain():
+    p = Pipeline() | "abs" >> ops.map(abs) | ops.take(1)
+    text = p.explain()
+    assert 'Logical plan:\n  0: abs\n' in text
+    assert 'Optimized plan:\n  0: take(count=1)\n  1: abs' in text
+    assert 'hoisted above abs' in text
+
+    assert Plan([ops.flatten()]).explain().endswith('Rewrites:\n  none')
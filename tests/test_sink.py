@@ -0,0 +1,133 @@
+"""Tests for ``tinyflow.sink``."""
+
+
+import csv
+import io
+import json
+import os
+
+import pytest
+
+from tinyflow import binary, ops, Pipeline
+from tinyflow.sink import LineEncoder, Writer, Written
+
+
+@pytest.mark.parametrize('background', [False, True])
+def test_write_lines(tmpdir, background):
+    path = str(tmpdir.join('out.txt'))
+    p = Pipeline() | ops.write_lines(path, batchsize=3, background=background)
+    written = list(p(['a', 'b', 'c', 'd']))
+    assert written == [Written(path, 4, 8)]
+    with open(path) as f:
+        assert f.read() == 'a\nb\nc\nd\n'
+
+
+def test_rotate_and_partition(tmpdir):
+    path = str(tmpdir.join('{key}', '{part}.txt'))
+    words = ['a', 'bb', 'c', 'dd', 'e', 'f']
+    p = Pipeline() | ops.write_lines(path, keyfunc=len, max_records=2)
+    written = sorted(p(words))
+
+    assert [(os.path.relpath(w.path, str(tmpdir)), w.records)
+            for w in written] == [
+        (os.path.join('1', '0.txt'), 2),
+        (os.path.join('1', '1.txt'), 2),
+        (os.path.join('2', '0.txt'), 2)]
+    assert sum(w.bytes for w in written) == sum(len(w) + 1 for w in words)
+    with open(str(tmpdir.join('1', '1.txt'))) as f:
+        assert f.read() == 'e\nf\n'
+
+
+def test_max_bytes(tmpdir):
+    path = str(tmpdir.join('{part}.txt'))
+    writer = Writer(path, LineEncoder(), batchsize=1, max_bytes=4)
+    written = list(writer.write(['aa', 'bb', 'c']))
+    assert [w.records for w in written] == [2, 1]
+    assert [w.bytes for w in written] == [6, 2]
+
+
+def test_template_required(tmpdir):
+    with pytest.raises(ValueError):
+        Writer('out.txt', LineEncoder(), keyfunc=len)
+    with pytest.raises(ValueError):
+        Writer('out.txt', LineEncoder(), max_records=10)
+
+
+def test_write_csv(tmpdir):
+    path = str(tmpdir.join('out.csv'))
+    rows = [{'a': 1, 'b': 'x,y'}, {'a': 2, 'b': 'z'}]
+    p = Pipeline() | ops.write_csv(path, fieldnames=['a', 'b'])
+    written, = p(rows)
+    assert written.records == 2
+    with open(path) as f:
+        assert list(csv.DictReader(f)) == [
+            {'a': '1', 'b': 'x,y'}, {'a': '2', 'b': 'z'}]
+    assert written.bytes == os.path.getsize(path)
+
+
+def test_write_jsonl(tmpdir):
+    path = str(tmpdir.join('out.jsonl'))
+    records = [{'a': 1}, [1, 2], 'text']
+    list((Pipeline() | ops.write_jsonl(path))(records))
+    with open(path) as f:
+        assert [json.loads(line) for line in f] == records
+
+
+def test_write_binary(tmpdir):
+    path = str(tmpdir.join('out.tfb'))
+    records = [(i, str(i)) for i in range(10)]
+    list((Pipeline() | ops.write_binary(path, batchsize=4))(records))
+    with open(path, 'rb') as f:
+        assert list(binary.read(f)) == records
+
+
+def test_closed_early(tmpdir):
+
+    """Closing the output stream flushes and closes open files."""
+
+    path = str(tmpdir.join('{key}-{part}.txt'))
+    p = Pipeline() | ops.write_lines(path, keyfunc=len, max_records=2)
+    stream = p(['bb', 'a', 'a', 'c'])
+    assert next(stream).records == 2
+    stream.close()
+    with open(str(tmpdir.join('2-0.txt'))) as f:
+        assert f.read() == 'bb\n'
+
+
+def test_background_error(tmpdir):
+
+    def opener(path, mode):
+        raise IOError("Disk full")
+
+    writer = Writer(
+        str(tmpdir.join('out.txt')), LineEncoder(), batchsize=1,
+        background=True, opener=opener)
+    with pytest.raises(IOError):
+        list(writer.write(['a', 'b']))
+
+
+@pytest.mark.parametrize('background', [False, True])
+def test_error_closes_files(tmpdir, background):
+
+    """Every open file is closed after a write fails."""
+
+    opened = []
+
+    class Full(io.BytesIO):
+
+        def write(self, data):
+            if b'bad' in data:
+                raise IOError("Disk full")
+            return super(Full, self).write(data)
+
+    def opener(path, mode):
+        opened.append(Full())
+        return opened[-1]
+
+    writer = Writer(
+        str(tmpdir.join('{key}-{part}.txt')), LineEncoder(),
+        keyfunc=len, batchsize=1, background=background, opener=opener)
+    with pytest.raises(IOError):
+        list(writer.write(['ok', 'good', 'bad', 'fine']))
+    assert len(opened) == 3
+    assert all(f.closed for f in opened)
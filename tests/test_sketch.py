@@ -0,0 +1,102 @@
+"""Tests for ``tinyflow.sketch``."""
+
+
+import pickle
+
+import pytest
+
+from tinyflow.sketch import BloomFilter, hash64, HyperLogLog, KLL
+
+
+def test_hash64():
+    assert hash64('a') == hash64(b'a')
+    assert hash64(1) != hash64(2)
+    assert 0 <= hash64((1, 'a')) < 2 ** 64
+
+
+def test_bloom_filter():
+    bloom = BloomFilter(1000, error_rate=0.01)
+    for i in range(1000):
+        assert not bloom.add(i) or i in bloom
+    assert all(i in bloom for i in range(1000))
+    false_positives = sum(i in bloom for i in range(1000, 11000))
+    assert false_positives < 300
+    assert 950 < bloom.count <= 1000
+
+
+def test_bloom_filter_merge():
+    a = BloomFilter(100)
+    b = BloomFilter(100)
+    a.add('a')
+    b.add('b')
+    a.merge(b)
+    assert 'a' in a and 'b' in a
+
+    with pytest.raises(ValueError):
+        a.merge(BloomFilter(1000))
+    with pytest.raises(ValueError):
+        BloomFilter(100, error_rate=1.5)
+
+
+@pytest.mark.parametrize("count", [10, 1000, 50000])
+def test_hyperloglog(count):
+    sketch = HyperLogLog()
+    for i in range(count):
+        sketch.add(i)
+        sketch.add(i)
+    assert abs(len(sketch) - count) <= count * 0.03
+
+
+def test_hyperloglog_merge():
+    a = HyperLogLog(10)
+    b = HyperLogLog(10)
+    for i in range(5000):
+        (a if i % 2 else b).add(str(i))
+    a.merge(b)
+    a = pickle.loads(pickle.dumps(a))
+    assert abs(len(a) - 5000) < 5000 * 0.1
+
+    with pytest.raises(ValueError):
+        a.merge(HyperLogLog(12))
+    with pytest.raises(ValueError):
+        HyperLogLog(2)
+
+
+def test_kll():
+    sketch = KLL(k=100, seed=1)
+    sketch.update(range(100000))
+    assert len(sketch) == 100000
+    assert sum(map(len, sketch.compactors)) < 400
+    for q in (0, 0.1, 0.5, 0.99):
+        assert abs(sketch.quantile(q) - q * 100000) < 3000
+    low, high = sketch.cdf([25000, 75000])
+    assert abs(low - 0.25) < 0.03 and abs(high - 0.75) < 0.03
+
+
+def test_kll_merge():
+    a = KLL(k=100, seed=1)
+    b = KLL(k=100, seed=2)
+    a.update(range(0, 50000))
+    b.update(range(50000, 100000))
+    a.merge(pickle.loads(pickle.dumps(b)))
+    assert len(a) == 100000
+    assert abs(a.quantile(0.5) - 50000) < 3000
+
+
+def test_kll_empty():
+    sketch = KLL()
+    assert sketch.quantile(0.5) is None
+    assert sketch.cdf([1]) == [0.0]
+    sketch.add(3)
+    assert sketch.quantiles([0, 1]) == [3, 3]
+    with pytest.raises(ValueError):
+        sketch.quantile(2)
+
+
+def test_kll_seed():
+    a, b = KLL(k=20, seed=3), KLL(k=20, seed=3)
+    a.update(range(10000))
+    b.update(range(10000))
+    assert a.compactors == b.compactors
+    # Unseeded sketches do not share a sequence
+    assert KLL()._bits != KLL()._bits
@@ -0,0 +1,60 @@
+"""Tests for ``tinyflow.source``."""
+
+
+import io
+import json
+
+import pytest
+
+from tinyflow import source
+
+
+def test_read_blocks():
+    data = b'a\nbb\n"c\nd"\ne'
+    f = io.BytesIO(data)
+    blocks = list(source.read_blocks(f, blocksize=2))
+    assert blocks == [b'a\n', b'bb\n', b'"c\n', b'd"\n', b'e']
+
+    f = io.BytesIO(data)
+    blocks = list(source.read_blocks(f, blocksize=6, quotechar=b'"'))
+    assert blocks == [b'a\nbb\n"c\nd"\n', b'e']
+
+
+@pytest.mark.parametrize("output,expected", [
+    ('dict', [{'a': 1, 'c': None}, {'a': 2, 'c': 3}]),
+    ('tuple', [(1, None), (2, 3)]),
+    ('columns', [{'a': [1, 2], 'c': [None, 3]}]),
+])
+def test_parse_jsonl(output, expected):
+    block = b'{"a": 1, "b": 2}\n\n{"a": 2, "c": 3}\n'
+    assert source.parse_jsonl(block, ['a', 'c'], output) == expected
+
+
+def test_parse_jsonl_no_fields():
+    assert source.parse_jsonl(b'{"a": 1}\n') == [{'a': 1}]
+    with pytest.raises(ValueError):
+        source.parse_jsonl(b'{"a": 1}\n', output='tuple')
+
+
+def test_parse_jsonl_line_separators():
+
+    """Only newlines separate records."""
+
+    records = [{'a': u'x\u2028y\x85z\x0c'}, {'a': u'b'}]
+    block = u'\r\n'.join(
+        json.dumps(r, ensure_ascii=False) for r in records).encode('utf-8')
+    assert source.parse_jsonl(block) == records
+
+
+def test_parse_csv():
+    block = b'1,"x\ny",3\n4,5,6\n'
+    assert source.parse_csv(block, ['c', 'b'], [2, 1], 'tuple') == [
+        ('3', 'x\ny'), ('6', '5')]
+    assert source.parse_csv(block, ['a'], output='columns') == [
+        {'a': ['1', '4']}]
+
+
+def test_read_header():
+    f = io.BytesIO(b'a,"b\nc"\n1,2\n')
+    assert source.read_header(f) == ['a', 'b\nc']
+    assert f.read() == b'1,2\n'
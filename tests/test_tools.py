@@ -1,10 +1,15 @@
 """Tests for ``tinyflow.tools``."""
 
 
-from tinyflow.tools import slicer
+import array
+from collections import deque
+import io
 
 import pytest
 
+from tinyflow import tools
+from tinyflow.tools import limit, SequenceView, skip, skip_lines, slicer
+
 
 def test_slicer_even():
     it = slicer(range(100), 10)
@@ -26,4 +31,90 @@ def test_slicer_odd():
     assert next(it) == (2, 3)
     assert next(it) == (4, )
     with pytest.raises(StopIteration):
-        next(it)
\ No newline at end of file
+        next(it)
+
+
+def test_slicer_typecode():
+    chunks = list(slicer(range(5), 2, typecode='q'))
+    assert [c.tolist() for c in chunks] == [[0, 1], [2, 3], [4]]
+    assert all(isinstance(c, memoryview) and c.readonly for c in chunks)
+    assert chunks[0].format == 'q'
+
+    with pytest.raises(ValueError):
+        slicer(range(5), 2, typecode='q', dtype='int64')
+
+
+def test_slicer_dtype():
+    np = pytest.importorskip('numpy')
+    chunks = list(slicer(range(5), 2, dtype='float64'))
+    assert [c.tolist() for c in chunks] == [[0, 1], [2, 3], [4]]
+    assert chunks[0].dtype == np.float64
+    assert not chunks[0].flags.writeable
+
+
+def test_SequenceView():
+    data = list(range(10))
+    view = SequenceView(data)[2:][:5][::2]
+    assert isinstance(view, SequenceView)
+    assert list(view) == [2, 4, 6]
+    assert len(view) == 3
+    assert view[-1] == 6
+
+
+@pytest.mark.parametrize("data", [
+    list(range(10)), tuple(range(10)), range(10), array.array('l', range(10))])
+def test_skip_limit_sequences(data):
+    skipped = skip(data, 3)
+    assert tools.is_sequence(skipped)
+    assert list(skipped) == list(range(3, 10))
+    assert list(limit(skipped, 2)) == [3, 4]
+    assert list(skip(data, 20)) == []
+
+
+def test_skip_limit_deque():
+
+    """Indexing a deque is O(n), so it is iterated rather than viewed."""
+
+    data = deque(range(10))
+    assert not tools.is_sequence(data)
+    assert list(skip(data, 3)) == list(range(3, 10))
+    assert list(limit(data, 2)) == [0, 1]
+    assert not isinstance(skip(data, 3), SequenceView)
+
+
+def test_skip_range_is_constant_time():
+    assert skip(range(10 ** 18), 10 ** 18 - 1) == range(10 ** 18 - 1, 10 ** 18)
+
+
+def test_skip_iterator():
+    data = iter(range(10))
+    assert list(skip(data, 8)) == [8, 9]
+    assert list(limit(iter(range(10)), 2)) == [0, 1]
+
+
+@pytest.mark.parametrize("mode,kwargs", [
+    ('rb', {}),
+    ('r', {'encoding': 'utf-8'})])
+def test_skip_lines(tmpdir, mode, kwargs):
+    path = str(tmpdir.join('lines.txt'))
+    with io.open(path, 'w', encoding='utf-8') as f:
+        f.write(u''.join(u'léne {}\n'.format(i) for i in range(100)))
+
+    with io.open(path, mode, **kwargs) as f:
+        assert skip_lines(f, 97, blocksize=16) == 97
+        lines = list(skip(f, 1))
+    assert [l.strip() for l in lines] == [
+        l.encode('utf-8') if 'b' in mode else l
+        for l in (u'léne 98', u'léne 99')]
+
+    with io.open(path, mode, **kwargs) as f:
+        assert skip_lines(f, 200) == 100
+        assert not f.read()
+
+
+def test_LazyModule():
+    module = tools.LazyModule('json')
+    assert repr(module) == "LazyModule('json')"
+    assert module.dumps([1]) == '[1]'
+    with pytest.raises(AttributeError):
+        module.missing
@@ -1,12 +1,53 @@
-"""Experiments in data flow programming."""
+"""Experiments in data flow programming.
 
+Importing ``tinyflow`` is cheap.  ``Pipeline()``, ``MapPipeline()``, and
+submodules like ``tinyflow.ops`` are loaded when first accessed, so a
+worker process that only needs part of the library does not pay for the
+rest.
+"""
 
-from .pipeline import MapPipeline, Pipeline
+
+import importlib
+import sys
 
 
 __all__ = ['MapPipeline', 'Pipeline', 'ops']
 
 
+# Attribute -> module providing it
+_LAZY = {
+    'MapPipeline': 'pipeline',
+    'Pipeline': 'pipeline',
+}
+_SUBMODULES = frozenset((
+    'aggregate', 'binary', 'cache', 'checkpoint', 'concurrency',
+    'exceptions', 'index', 'ops', 'pipeline', 'plan', 'sink', 'sketch',
+    'source', 'tools'))
+
+
+if sys.version_info < (3, 7):  # pragma: no cover
+    # No module level '__getattr__()'
+    from .pipeline import MapPipeline, Pipeline
+    from . import ops
+
+else:
+
+    def __getattr__(name):
+        if name in _LAZY:
+            module = importlib.import_module('.' + _LAZY[name], __name__)
+            value = getattr(module, name)
+        elif name in _SUBMODULES:
+            value = importlib.import_module('.' + name, __name__)
+        else:
+            raise AttributeError(
+                "module {!r} has no attribute {!r}".format(__name__, name))
+        globals()[name] = value
+        return value
+
+    def __dir__():
+        return sorted(set(globals()) | set(_LAZY) | _SUBMODULES)
+
+
 __version__ = '0.1'
 __author__ = 'Kevin Wurster'
 __email__ = 'wursterk@gmail.com'
@@ -1,15 +1,141 @@
 """Python 2 support."""
 
 
+from array import array
+import io
 import itertools as it
+import os
 import sys
+import time
+
+
+def _typecode(codes, size):
+    for code in codes:
+        try:
+            if array(code).itemsize == size:
+                return code
+        except ValueError:
+            pass
+    return None
 
 
 if sys.version_info.major == 2:  # pragma: no cover
+    from collections import Iterator
+    import Queue as queue
+
+    def accumulate(iterable):
+        iterable = iter(iterable)
+        total = next(iterable)
+        yield total
+        for item in iterable:
+            total += item
+            yield total
+
+    def array_tobytes(values):
+        return values.tostring()
+
+    def array_frombytes(values, data):
+        values.fromstring(data)
+
+    def array_view(values):
+        # Arrays do not support the buffer protocol used by 'memoryview()'
+        return values
+
+    def slice_range(values, item):
+        # 'xrange()' cannot be sliced
+        start, stop, step = item.indices(len(values))
+        count = len(xrange(start, stop, step))
+        if not count:
+            return xrange(0)
+        stride = values[1] - values[0] if len(values) > 1 else 1
+        first = values[start]
+        return xrange(
+            first, first + count * stride * step, stride * step)
+
+    def _encode(value, encoding):
+        if isinstance(value, unicode):
+            return value.encode(encoding)
+        return value
+
+    def csv_reader(data, encoding='utf-8', dialect='excel'):
+        # The 'csv' module only handles byte strings
+        import csv
+        for row in csv.reader(io.BytesIO(data), dialect=dialect):
+            yield [v.decode(encoding) for v in row]
+
+    def csv_dumps(rows, fieldnames=None, encoding='utf-8', dialect='excel'):
+        import csv
+        buf = io.BytesIO()
+        if fieldnames is None:
+            csv.writer(buf, dialect=dialect).writerows(
+                [_encode(v, encoding) for v in r] for r in rows)
+        else:
+            csv.DictWriter(
+                buf, [_encode(f, encoding) for f in fieldnames],
+                dialect=dialect).writerows(
+                    {_encode(k, encoding): _encode(v, encoding)
+                     for k, v in r.items()} for r in rows)
+        return buf.getvalue()
+
     map = it.imap
     filter = it.ifilter
     filterfalse = it.ifilterfalse
+    string_types = basestring,
+    text_type = unicode
+    range = xrange
+    # Not atomic on Windows
+    replace = os.rename
+    monotonic = time.time
+    # 'q' and 'Q' are not available, but a C long may be 64 bits
+    int64 = _typecode('l', 8)
+    uint64 = _typecode('L', 8)
+    executor_initializer = False
+    # The UTF-8 codec already passes lone surrogates through
+    surrogates = 'strict'
 else:  # pragma: no cover
+    from collections.abc import Iterator
+    import queue
+
+    def array_tobytes(values):
+        return values.tobytes()
+
+    def array_frombytes(values, data):
+        values.frombytes(data)
+
+    def slice_range(values, item):
+        return values[item]
+
+    def array_view(values):
+        view = memoryview(values)
+        # 'memoryview.toreadonly()' is not available before Python 3.8
+        toreadonly = getattr(view, 'toreadonly', None)
+        return view if toreadonly is None else toreadonly()
+
+    def csv_reader(data, encoding='utf-8', dialect='excel'):
+        import csv
+        return csv.reader(
+            io.StringIO(data.decode(encoding), newline=''), dialect=dialect)
+
+    def csv_dumps(rows, fieldnames=None, encoding='utf-8', dialect='excel'):
+        import csv
+        buf = io.StringIO()
+        if fieldnames is None:
+            csv.writer(buf, dialect=dialect).writerows(rows)
+        else:
+            csv.DictWriter(buf, fieldnames, dialect=dialect).writerows(rows)
+        return buf.getvalue().encode(encoding)
+
+    accumulate = it.accumulate
     map = map
     filter = filter
     filterfalse = it.filterfalse
+    string_types = str,
+    text_type = str
+    range = range
+    replace = os.replace
+    monotonic = time.monotonic
+    int64 = _typecode('q', 8)
+    uint64 = _typecode('Q', 8)
+    # 'concurrent.futures' executors take an 'initializer' since 3.7
+    executor_initializer = sys.version_info >= (3, 7)
+    surrogates = 'surrogatepass'
@@ -0,0 +1,207 @@
+"""Aggregations for ``tinyflow.ops.group_by()``.
+
+An aggregation describes how to fold a stream of values into a small amount
+of state without holding the values themselves.  Multiple aggregations are
+computed in a single pass:
+
+    from tinyflow import aggregate as agg, ops, Pipeline
+
+
+    Pipeline() | ops.group_by(
+        operator.itemgetter('user'),
+        {
+            'requests': agg.count(),
+            'bytes': agg.sum(operator.itemgetter('bytes')),
+            'p99': agg.quantile(0.99, operator.itemgetter('latency')),
+        })
+
+Custom aggregations subclass ``Aggregation()`` and implement
+``initial()``, ``add()``, and optionally ``merge()`` and ``result()``.
+"""
+
+
+from . import tools
+from .sketch import KLL
+
+
+__all__ = [
+    'Aggregation', 'collect', 'count', 'max', 'mean', 'min', 'quantile',
+    'sum']
+
+
+class Aggregation(object):
+
+    """Base class for aggregations.
+
+    State is created by ``initial()``, updated with every value by
+    ``add()``, which returns the new state, and converted to the final
+    value by ``result()``.  ``merge()`` combines two states, so partial
+    aggregates computed by different workers can be combined.
+    """
+
+    def __init__(self, valfunc=None):
+
+        """
+        Parameters
+        ----------
+        valfunc : callable or None, optional
+            Extracts the value to aggregate from every item.  The item
+            itself by default.
+        """
+
+        self.valfunc = valfunc
+
+    def __repr__(self):
+        return '{}()'.format(type(self).__name__)
+
+    def initial(self):  # pragma: no cover
+        """Produce the state for a group with no values."""
+        raise NotImplementedError
+
+    def add(self, state, value):  # pragma: no cover
+        """Update ``state`` with a value and return the new state."""
+        raise NotImplementedError
+
+    def merge(self, state, other):  # pragma: no cover
+        """Combine two states and return the new state."""
+        raise NotImplementedError
+
+    def result(self, state):
+        """Convert state to the aggregated value."""
+        return state
+
+
+class count(Aggregation):
+
+    """Number of items in the group."""
+
+    def initial(self):
+        return 0
+
+    def add(self, state, value):
+        return state + 1
+
+    def merge(self, state, other):
+        return state + other
+
+
+class sum(Aggregation):
+
+    """Sum of values in the group."""
+
+    def initial(self):
+        return 0
+
+    def add(self, state, value):
+        return state + value
+
+    def merge(self, state, other):
+        return state + other
+
+
+class min(Aggregation):
+
+    """Smallest value in the group."""
+
+    def initial(self):
+        return tools.NULL
+
+    def add(self, state, value):
+        return value if state is tools.NULL or value < state else state
+
+    def merge(self, state, other):
+        return state if other is tools.NULL else self.add(state, other)
+
+    def result(self, state):
+        return None if state is tools.NULL else state
+
+
+class max(min):
+
+    """Largest value in the group."""
+
+    def add(self, state, value):
+        return value if state is tools.NULL or value > state else state
+
+
+class mean(Aggregation):
+
+    """Arithmetic mean of values in the group."""
+
+    def initial(self):
+        return [0, 0]
+
+    def add(self, state, value):
+        state[0] += value
+        state[1] += 1
+        return state
+
+    def merge(self, state, other):
+        state[0] += other[0]
+        state[1] += other[1]
+        return state
+
+    def result(self, state):
+        total, count = state
+        return total / float(count) if count else None
+
+
+class quantile(Aggregation):
+
+    """Approximate quantiles of values in the group computed with a
+    ``tinyflow.sketch.KLL()``, so memory use per group is bounded.
+    """
+
+    def __init__(self, q=0.5, valfunc=None, k=200):
+
+        """
+        Parameters
+        ----------
+        q : float or list, optional
+            Quantile, or a list of quantiles to produce a list of values.
+        valfunc : callable or None, optional
+            See ``Aggregation()``.
+        k : int, optional
+            Accuracy parameter for ``tinyflow.sketch.KLL()``.
+        """
+
+        super(quantile, self).__init__(valfunc)
+        self.q = q
+        self.k = k
+
+    def __repr__(self):
+        return '{}({!r})'.format(type(self).__name__, self.q)
+
+    def initial(self):
+        return KLL(self.k)
+
+    def add(self, state, value):
+        state.add(value)
+        return state
+
+    def merge(self, state, other):
+        state.merge(other)
+        return state
+
+    def result(self, state):
+        if isinstance(self.q, (list, tuple)):
+            return state.quantiles(self.q)
+        return state.quantile(self.q)
+
+
+class collect(Aggregation):
+
+    """Every value in the group as a list.  Unlike the other aggregations
+    memory use grows with the size of the group.
+    """
+
+    def initial(self):
+        return []
+
+    def add(self, state, value):
+        state.append(value)
+        return state
+
+    def merge(self, state, other):
+        state.extend(other)
+        return state
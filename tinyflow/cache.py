@@ -0,0 +1,554 @@
+"""Result caches for operations.
+
+An on-disk, content-addressed store for caching the output of expensive
+functions or sub-pipelines across runs:
+
+    from tinyflow import cache, ops, MapPipeline, Pipeline
+
+
+    wordcount = MapPipeline() \
+        | ops.cat() \
+        | ops.methodcaller('split') \
+        | ops.flatten() \
+        | ops.counter()
+
+    # Only files that changed since the last run are recounted.
+    pipeline = Pipeline() \
+        | ops.cache(wordcount, '.tinyflow-cache', max_bytes=2 ** 30) \
+        | ops.flatten()
+
+Keys are derived from the input item, a fingerprint of the cached function,
+and the size and modification time of the input when it is a path to a file
+on disk.
+
+``LRUCache()`` is a bounded in-memory cache used by
+``tinyflow.ops.map(memoize=...)``.
+"""
+
+
+from collections import OrderedDict
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import types
+
+from . import _compat, tools
+
+
+__all__ = ['CachedCall', 'DiskCache', 'LRUCache', 'fingerprint']
+
+
+def _global_names(code):
+
+    """Names ``code`` and any code nested inside of it may look up as
+    globals.
+    """
+
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names |= _global_names(const)
+    return names
+
+
+def _describe(obj, seen):
+
+    """Produce a stable text representation of ``obj`` for
+    ``fingerprint()``.  Object addresses are avoided wherever possible so
+    the representation does not change between processes.
+    """
+
+    # Avoid import cycles
+    from .ops import Operation
+    from .pipeline import Pipeline
+
+    if isinstance(obj, (type(None), bool, int, float, complex,
+                        _compat.string_types, bytes)):
+        return '{}:{!r}'.format(type(obj).__name__, obj)
+
+    elif isinstance(obj, type):
+        return 'type:{}.{}'.format(
+            obj.__module__, getattr(obj, '__qualname__', obj.__name__))
+
+    if id(obj) in seen:
+        return 'cycle'
+    seen = seen | {id(obj)}
+
+    if isinstance(obj, (tuple, list, frozenset, set)):
+        items = [_describe(o, seen) for o in obj]
+        if isinstance(obj, (set, frozenset)):
+            items.sort()
+        return '{}:({})'.format(type(obj).__name__, ','.join(items))
+
+    elif isinstance(obj, dict):
+        items = sorted(
+            '{}={}'.format(_describe(k, seen), _describe(v, seen))
+            for k, v in obj.items())
+        return 'dict:{{{}}}'.format(','.join(items))
+
+    elif isinstance(obj, types.CodeType):
+        return 'code:{}:{}:{}'.format(
+            hashlib.sha1(obj.co_code).hexdigest(),
+            _describe(obj.co_consts, seen),
+            _describe(obj.co_names, seen))
+
+    elif isinstance(obj, types.FunctionType):
+        closure = tuple(c.cell_contents for c in obj.__closure__ or ())
+        namespace = obj.__globals__
+        referenced = {
+            name: namespace[name] for name in _global_names(obj.__code__)
+            if name in namespace}
+        return 'function:{}.{}:{}:{}:{}:{}'.format(
+            obj.__module__,
+            getattr(obj, '__qualname__', obj.__name__),
+            _describe(obj.__code__, seen),
+            _describe(obj.__defaults__, seen),
+            _describe(closure, seen),
+            _describe(referenced, seen))
+
+    elif isinstance(obj, types.MethodType):
+        return 'method:{}:{}'.format(
+            _describe(obj.__func__, seen), _describe(obj.__self__, seen))
+
+    elif isinstance(obj, Pipeline):
+        return '{}:({})'.format(
+            _describe(type(obj), seen),
+            ','.join(_describe(o, seen) for o in obj.operations))
+
+    elif isinstance(obj, Operation):
+        # Private attributes hold things like the parent pipeline and the
+        # description, neither of which alter the output.
+        state = {
+            k: v for k, v in tools.attributes(obj).items()
+            if not k.startswith('_') and k not in ('queue', 'worker_pool')}
+        return '{}:{}'.format(
+            _describe(type(obj), seen), _describe(state, seen))
+
+    elif isinstance(obj, types.BuiltinFunctionType):
+        return 'builtin:{}.{}'.format(
+            getattr(obj, '__module__', None), obj.__name__)
+
+    elif hasattr(obj, 'func') and hasattr(obj, 'keywords'):
+        # functools.partial()
+        return 'partial:{}:{}:{}'.format(
+            _describe(obj.func, seen),
+            _describe(obj.args, seen),
+            _describe(obj.keywords, seen))
+
+    elif hasattr(obj, '__dict__') and not isinstance(obj, types.ModuleType):
+        return '{}:{}'.format(
+            _describe(type(obj), seen), _describe(vars(obj), seen))
+
+    else:
+        # Things like 'operator.itemgetter()' have a useful repr.
+        return repr(obj)
+
+
+def fingerprint(obj):
+
+    """Compute a stable hex digest describing an object.  Functions are
+    described by their name, bytecode, defaults, closure, and the globals
+    they reference, bound methods by their function and instance, and
+    operations and pipelines by their class and arguments, so editing a
+    pipeline produces a new fingerprint.
+
+    Parameters
+    ----------
+    obj : object
+        Function, operation, pipeline, or plain value.
+
+    Returns
+    -------
+    str
+    """
+
+    text = _describe(obj, frozenset())
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class DiskCache(object):
+
+    """A local on-disk key/value store with least recently used eviction.
+
+    Values are pickled into one file per key.  Access times are tracked
+    with the file's modification time, so recency survives across
+    processes and runs.
+
+    The in-memory index used for eviction is built from the files on disk
+    the first time it is needed, so unpickling a cache is cheap.  Copies
+    build their own index and enforce the limits like the original.  A
+    worker process can instead write with ``set(..., evict=False)``, which
+    only builds the index if it is already loaded, and leave eviction to a
+    ``trim()`` in the parent.  Hits and misses are only counted by the copy
+    that looked them up.
+
+    Attributes
+    ----------
+    directory : str
+        Location of the cached data.
+    max_bytes : int or None
+        Evict entries until the total size is below this value.
+    max_entries : int or None
+        Evict entries until there are no more than this many.
+    hits : int
+        Number of successful lookups.
+    misses : int
+        Number of failed lookups.
+    """
+
+    def __init__(self, directory, max_bytes=None, max_entries=None):
+
+        """
+        Parameters
+        ----------
+        directory : str
+            Store cached data in this directory.  Created if it does not
+            exist.
+        max_bytes : int or None, optional
+            Maximum size of the cache on disk.
+        max_entries : int or None, optional
+            Maximum number of entries.
+        """
+
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._index = None
+        self._size = 0
+
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+    def _load(self):
+
+        """Build the in-memory index from the files on disk, least recently
+        used first.
+        """
+
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.startswith('.'):
+                    continue
+                stat = os.stat(os.path.join(root, name))
+                entries.append((stat.st_mtime, name, stat.st_size))
+        entries.sort()
+
+        self._index = OrderedDict((n, s) for _, n, s in entries)
+        self._size = sum(self._index.values())
+
+    @property
+    def index(self):
+
+        """Size of every entry by key, least recently used first.  Built
+        from the files on disk on first access.
+        """
+
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._load()
+        return self._index
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    @property
+    def size(self):
+        """Total size of the cached data in bytes."""
+        self.index
+        return self._size
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        state.update(_index=None, _size=0, hits=0, misses=0)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None, count=True):
+
+        """Get the value for a key, or ``default`` if it is not cached.
+        Set ``count=False`` to leave ``hits`` and ``misses`` alone.
+        """
+
+        try:
+            with open(self._path(key), 'rb') as f:
+                value = pickle.load(f)
+        except (IOError, OSError, EOFError, pickle.UnpicklingError):
+            with self._lock:
+                self.misses += count
+                if self._index is not None:
+                    self._size -= self._index.pop(key, 0)
+            return default
+
+        with self._lock:
+            self.hits += count
+            if self._index is not None and key in self._index:
+                self._index[key] = self._index.pop(key)
+        try:
+            os.utime(self._path(key), None)
+        except OSError:  # pragma: no cover
+            pass
+
+        return value
+
+    def set(self, key, value, evict=True):
+
+        """Cache a value and evict old entries if the cache is full.  The
+        value is written to a temporary file and moved into place so readers
+        never see a partial entry.  With ``evict=False`` the index is not
+        built just to record the entry and nothing is evicted.
+        """
+
+        path = self._path(key)
+        dirname = os.path.dirname(path)
+        if not os.path.isdir(dirname):
+            try:
+                os.makedirs(dirname)
+            except OSError:  # pragma: no cover
+                # Another thread or process beat us to it
+                if not os.path.isdir(dirname):
+                    raise
+
+        fd, tmp = tempfile.mkstemp(dir=dirname, prefix='.')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
+            size = f.tell()
+        _compat.replace(tmp, path)
+
+        if not evict and self._index is None:
+            return
+        index = self.index
+        with self._lock:
+            self._size -= index.pop(key, 0)
+            index[key] = size
+            self._size += size
+            if evict:
+                self._evict()
+
+    def trim(self):
+
+        """Rebuild the index from the files on disk, which picks up entries
+        written by copies of this cache, and evict entries until the cache
+        is within its limits.
+        """
+
+        with self._lock:
+            self._load()
+            self._evict()
+
+    def _evict(self):
+
+        """Remove least recently used entries until the cache is within its
+        limits.  Caller must hold the lock.
+        """
+
+        max_bytes = self.max_bytes
+        max_entries = self.max_entries
+        index = self._index
+        while index and (
+                (max_bytes is not None and self._size > max_bytes)
+                or (max_entries is not None and len(index) > max_entries)):
+            key, size = index.popitem(last=False)
+            self._size -= size
+            try:
+                os.remove(self._path(key))
+            except OSError:  # pragma: no cover
+                pass
+
+    def clear(self):
+
+        """Remove all entries."""
+
+        index = self.index
+        with self._lock:
+            for key in list(index):
+                try:
+                    os.remove(self._path(key))
+                except OSError:  # pragma: no cover
+                    pass
+            index.clear()
+            self._size = 0
+
+
+class CachedCall(object):
+
+    """Wrap a function so its results are looked up in a ``DiskCache()``
+    before being computed.  Results that are iterators, like the output of
+    a ``tinyflow.MapPipeline()``, are materialized into a list before they
+    are cached.
+
+    Can be handed to ``tinyflow.ops.map()``, including with a pool:
+
+        cached = CachedCall(wordcount, DiskCache('.tinyflow-cache'))
+        Pipeline() | ops.map(cached, pool='thread')
+
+    In a process pool every task receives its own copy of ``store``, so
+    set ``evict=False`` and call ``store.trim()`` after the run.
+    """
+
+    def __init__(self, func, store, version=None, report_hits=False,
+                 evict=True):
+
+        """
+        Parameters
+        ----------
+        func : callable
+            Function or pipeline taking a single argument.
+        store : DiskCache
+            Cache results here.
+        version : str or None, optional
+            Mixed into every key.  Change to invalidate all entries produced
+            by this function.
+        report_hits : bool, optional
+            Return ``(hit, value)`` rather than ``value`` and leave the
+            store's ``hits`` and ``misses`` alone, so they can be counted by
+            the caller when this runs in another process.
+        evict : bool, optional
+            Evict old entries from ``store`` when writing.  See
+            ``DiskCache.set()``.
+        """
+
+        self.func = func
+        self.store = store
+        self.version = version
+        self.report_hits = report_hits
+        self.evict = evict
+        self.fingerprint = fingerprint((func, version))
+
+    def key(self, item):
+
+        """Compute the cache key for an input item."""
+
+        parts = [self.fingerprint, _describe(item, frozenset())]
+        if isinstance(item, _compat.string_types):
+            try:
+                stat = os.stat(item)
+            except (OSError, ValueError):
+                pass
+            else:
+                parts.append('{}:{}'.format(stat.st_size, stat.st_mtime))
+        return hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()
+
+    def __call__(self, item):
+        key = self.key(item)
+        value = self.store.get(key, tools.NULL, count=not self.report_hits)
+        hit = value is not tools.NULL
+        if not hit:
+            value = self.func(item)
+            if isinstance(value, _compat.Iterator):
+                value = list(value)
+            self.store.set(key, value, evict=self.evict)
+        if self.report_hits:
+            return hit, value
+        return value
+
+
+class LRUCache(object):
+
+    """A bounded, thread-safe, in-memory cache with least recently used
+    eviction and an optional time to live.
+
+    Attributes
+    ----------
+    maxsize : int
+        Maximum number of entries.
+    ttl : float or None
+        Entries older than this many seconds are treated as missing.
+    hits : int
+        Number of successful lookups.
+    misses : int
+        Number of failed lookups.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None):
+
+        """
+        Parameters
+        ----------
+        maxsize : int, optional
+            Maximum number of entries.
+        ttl : float or None, optional
+            Expire entries after this many seconds.
+        """
+
+        if maxsize < 1:
+            raise ValueError("'maxsize' must be at least 1.")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return self.get(key, tools.NULL, count=False) is not tools.NULL
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None, count=True):
+
+        """Get the value for a key, or ``default`` if it is not cached or
+        has expired.  Set ``count=False`` to leave ``hits`` and ``misses``
+        alone.
+        """
+
+        with self._lock:
+            entry = self._data.pop(key, tools.NULL)
+            if entry is not tools.NULL and (
+                    self.ttl is None
+                    or _compat.monotonic() - entry[0] <= self.ttl):
+                self._data[key] = entry
+                if count:
+                    self.hits += 1
+                return entry[1]
+            if count:
+                self.misses += 1
+            return default
+
+    def set(self, key, value):
+
+        """Cache a value, evicting the least recently used entry if the
+        cache is full.
+        """
+
+        with self._lock:
+            data = self._data
+            data.pop(key, None)
+            data[key] = (_compat.monotonic(), value)
+            while len(data) > self.maxsize:
+                data.popitem(last=False)
+
+    def clear(self):
+
+        """Remove all entries and reset ``hits`` and ``misses``."""
+
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
@@ -0,0 +1,203 @@
+"""Checkpoints for resuming interrupted pipelines.
+
+A checkpoint periodically records how many input items a pipeline has
+consumed along with the state of its stateful operations, like the
+partially reduced values held by ``tinyflow.ops.reduce_by_key()``.  If the
+pipeline dies, calling it again with the same checkpoint and the same input
+restores that state and skips the input that was already processed:
+
+    from tinyflow import ops, Pipeline
+    from tinyflow.checkpoint import Checkpoint
+
+
+    pipeline = Pipeline() \
+        | ops.cat() \
+        | ops.methodcaller('split') \
+        | ops.flatten() \
+        | ops.counter()
+
+    checkpoint = Checkpoint('wordcount.checkpoint', every=1000)
+    for word, count in pipeline(infiles, checkpoint=checkpoint):
+        pass
+
+Offsets refer to items in the stream handed to the pipeline, so in the
+example above a resumed run skips entire files.  The checkpoint is removed
+once the pipeline's output has been fully consumed.
+
+Operations report their state through ``Operation.get_state()`` and
+``Operation.set_state()``.  Operations holding items that are not part of
+their state, like the in-flight items of a pooled ``tinyflow.ops.map()``
+or a partial ``tinyflow.ops.chunk()``, set ``checkpointable`` to ``False``,
+and running a pipeline containing one with a checkpoint raises
+``tinyflow.exceptions.NotCheckpointable`` rather than losing items on
+resume.  Items emitted by the pipeline between the last checkpoint and a
+failure are emitted again on resume.
+"""
+
+
+import os
+import pickle
+import tempfile
+
+from . import _compat, tools
+
+
+__all__ = ['Checkpoint']
+
+
+class Checkpoint(object):
+
+    """Persist pipeline progress to a file.
+
+    Attributes
+    ----------
+    path : str
+        Checkpoint file.
+    every : int or None
+        Save after this many input items.
+    interval : float or None
+        Save when at least this many seconds have elapsed since the last
+        save.
+    offset : int
+        Number of input items consumed by the most recent run, including
+        any items skipped on resume.
+    """
+
+    def __init__(self, path, every=10000, interval=None):
+
+        """
+        Parameters
+        ----------
+        path : str
+            Write the checkpoint to this file.
+        every : int or None, optional
+            Save after this many input items.
+        interval : float or None, optional
+            Save when this many seconds have elapsed since the last save.
+            Checked after every input item, so combining with ``every`` is
+            recommended for slow streams.
+        """
+
+        if every is None and interval is None:
+            raise ValueError("Need one of 'every' or 'interval'.")
+
+        self.path = path
+        self.every = every
+        self.interval = interval
+        self.offset = 0
+
+    def load(self):
+
+        """Read the checkpoint file.
+
+        Returns
+        -------
+        dict or None
+            With ``offset`` and ``states`` keys, or ``None`` if there is no
+            checkpoint.
+        """
+
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, 'rb') as f:
+            return pickle.load(f)
+
+    def save(self, offset, states):
+
+        """Atomically write a checkpoint.
+
+        Parameters
+        ----------
+        offset : int
+            Number of input items that have been fully processed.
+        states : list
+            One entry per pipeline operation from ``get_state()``.
+        """
+
+        dirname = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(dir=dirname, prefix='.tinyflow-')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(
+                {'offset': offset, 'states': states}, f,
+                pickle.HIGHEST_PROTOCOL)
+        _compat.replace(tmp, self.path)
+
+    def clear(self):
+
+        """Remove the checkpoint file."""
+
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def resume(self, pipeline, data):
+
+        """Restore operation state from the checkpoint file, if it exists,
+        and wrap the input stream so that progress is periodically saved.
+        State is restored immediately so that operations see it when they
+        are called.
+
+        Parameters
+        ----------
+        pipeline : tinyflow.Pipeline
+            Pipeline being executed.
+        data : iter
+            Input stream.
+
+        Returns
+        -------
+        iter
+        """
+
+        operations = pipeline.operations
+        saved = self.load()
+        offset = 0
+        if saved is not None:
+            if len(saved['states']) != len(operations):
+                raise ValueError(
+                    "Checkpoint {} was written by a pipeline with {} "
+                    "operations, not {}.".format(
+                        self.path, len(saved['states']), len(operations)))
+            offset = saved['offset']
+            pipeline.set_state(saved['states'])
+
+        return self._track(pipeline, data, offset)
+
+    def _track(self, pipeline, data, offset):
+
+        # Skip input that has already been processed
+        data = iter(tools.skip(data, offset))
+
+        every = self.every
+        interval = self.interval
+        monotonic = _compat.monotonic
+        last = monotonic()
+
+        for offset, item in enumerate(data, offset + 1):
+            self.offset = offset
+
+            # When control returns here the item has been processed by every
+            # downstream operation that consumes its input item-by-item.
+            yield item
+
+            if (every and offset % every == 0) or (
+                    interval is not None and monotonic() - last >= interval):
+                self.save(offset, pipeline.get_state())
+                last = monotonic()
+
+    def complete(self, stream):
+
+        """Remove the checkpoint once ``stream`` has been exhausted.
+
+        Parameters
+        ----------
+        stream : iter
+            Pipeline output.
+
+        Yields
+        ------
+        object
+        """
+
+        for item in stream:
+            yield item
+        self.clear()
@@ -0,0 +1,355 @@
+"""Controlling how much work is handed to a pool at once.
+
+``tinyflow.ops.map()`` keeps a window of tasks in flight in its pool.  An
+``AdaptiveLimit()`` adjusts the size of that window while the pipeline runs
+by measuring throughput: it keeps growing or shrinking the window while
+throughput improves and changes direction when throughput drops.  This
+suits workloads where the best number of concurrent tasks is not known up
+front, like a mix of network calls and parsing:
+
+    from tinyflow.concurrency import AdaptiveLimit
+
+
+    Pipeline() | ops.map(fetch, pool='thread', concurrency='adaptive')
+
+The window can only be as large as the pool, so the pool should have at
+least ``maximum`` workers.
+
+Items that ``tinyflow.ops.map()`` could not process after every retry can
+be sent elsewhere as a ``DeadLetter()`` instead of stopping the stream.
+
+A ``RateLimit()`` caps the rate at which items are handed to a pool, or
+passed downstream by ``tinyflow.ops.throttle()``, in items and bytes per
+second, which keeps a pipeline from overwhelming a service it calls:
+
+    Pipeline() | ops.map(fetch, pool='thread', rate_limit=50)
+"""
+
+
+from collections import namedtuple
+import os
+import threading
+import time
+
+from . import _compat
+
+
+__all__ = ['AdaptiveLimit', 'DeadLetter', 'RateLimit', 'TokenBucket']
+
+
+class DeadLetter(namedtuple('DeadLetter', ['item', 'error', 'attempts'])):
+
+    """An ``item`` that failed ``attempts`` times.  ``error`` is the
+    exception from the last attempt.
+    """
+
+    # Assigning to '__doc__' instead does not work on Python 2
+    __slots__ = ()
+
+
+class AdaptiveLimit(object):
+
+    """Hill climbing limit on the number of tasks in flight.
+
+    The controller is updated as tasks finish.  Every ``interval`` seconds
+    it compares throughput with the previous interval and steps the limit
+    by roughly a quarter in the current direction, reversing direction if
+    throughput dropped.  It does not grow when the window was never full,
+    which means the upstream stream could not keep up.  It shrinks when CPU
+    use is above ``max_cpu``, or when the latency of tasks grew beyond
+    ``max_latency`` times the lowest latency seen, which means tasks are
+    waiting for a saturated resource, like a free worker, rather than
+    running.
+
+    Attributes
+    ----------
+    limit : int
+        Current number of tasks allowed in flight.
+    latency : float or None
+        Average seconds between submitting a task and its completion during
+        the last interval.
+    throughput : float or None
+        Tasks completed per second during the last interval.
+    """
+
+    def __init__(
+            self, minimum=1, maximum=64, initial=None, interval=0.5,
+            max_cpu=None, max_latency=2.0):
+
+        """
+        Parameters
+        ----------
+        minimum : int, optional
+            Smallest limit.
+        maximum : int, optional
+            Largest limit.
+        initial : int or None, optional
+            Starting limit.  Defaults to ``minimum``.
+        interval : float, optional
+            Seconds between adjustments.
+        max_cpu : float or None, optional
+            Stop growing when this process uses more than this fraction of
+            the available CPUs, like 0.9.  Only reflects work done in this
+            process, like in a thread pool.
+        max_latency : float or None, optional
+            Shrink when the average latency of an interval is more than
+            this many times the lowest average seen.  Latency includes time
+            spent queued in the pool.
+        """
+
+        if not 1 <= minimum <= maximum:
+            raise ValueError("Need 1 <= minimum <= maximum.")
+
+        self.minimum = minimum
+        self.maximum = maximum
+        self.interval = interval
+        self.max_cpu = max_cpu
+        self.max_latency = max_latency
+        self.limit = max(minimum, min(maximum, initial or minimum))
+        self.latency = None
+        self.throughput = None
+
+        self._lock = threading.Lock()
+        self._direction = 1
+        self._in_flight = 0
+        self._fastest = None
+        self._reset(_compat.monotonic())
+
+    def __repr__(self):
+        return '{}(minimum={}, maximum={}, limit={})'.format(
+            type(self).__name__, self.minimum, self.maximum, self.limit)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _reset(self, now):
+        self._start = now
+        self._completed = 0
+        self._waited = 0.0
+        self._peak = self._in_flight
+        times = os.times()
+        self._cpu = times[0] + times[1]
+
+    def _cpu_fraction(self, now):
+        times = os.times()
+        used = times[0] + times[1] - self._cpu
+        elapsed = now - self._start
+        if not elapsed:
+            return 0.0
+        import multiprocessing
+        return used / (elapsed * multiprocessing.cpu_count())
+
+    def started(self):
+
+        """Record that a task was submitted.
+
+        Returns
+        -------
+        float
+            Pass to ``finished()``.
+        """
+
+        with self._lock:
+            self._in_flight += 1
+            self._peak = max(self._peak, self._in_flight)
+        return _compat.monotonic()
+
+    def finished(self, started, future=None):
+
+        """Record that a task finished.  Can be used as a future's done
+        callback with ``functools.partial()``.  A cancelled future leaves
+        the window without counting towards throughput or latency.
+
+        Parameters
+        ----------
+        started : float
+            From ``started()``.
+        future : concurrent.futures.Future or None, optional
+            The task's future.
+        """
+
+        now = _compat.monotonic()
+        with self._lock:
+            self._in_flight -= 1
+            if future is not None and future.cancelled():
+                return
+            self._completed += 1
+            self._waited += now - started
+            elapsed = now - self._start
+            if elapsed >= self.interval:
+                self._adjust(
+                    self._completed / elapsed, now,
+                    self._waited / self._completed)
+
+    def _adjust(self, throughput, now, latency=None):
+
+        """Move the limit given the throughput and average latency of the
+        interval that just ended.
+        """
+
+        queued = False
+        if latency is not None:
+            fastest = self._fastest
+            if fastest is None or latency < fastest:
+                fastest = self._fastest = latency
+            queued = self.max_latency is not None \
+                and latency > fastest * self.max_latency
+            self.latency = latency
+
+        previous = self.throughput
+        if previous is not None:
+            if throughput < previous * 0.95:
+                self._direction = -self._direction
+            elif throughput <= previous * 1.05:
+                # No meaningful change.  Prefer fewer tasks.
+                self._direction = -1
+
+        if self._direction > 0:
+            starved = self._peak < self.limit
+            busy = self.max_cpu is not None \
+                and self._cpu_fraction(now) > self.max_cpu
+            if busy or queued:
+                self._direction = -1
+            elif starved:
+                self._direction = 0
+
+        step = max(1, self.limit // 4) * self._direction
+        self.limit = max(self.minimum, min(self.maximum, self.limit + step))
+        if self._direction == 0:
+            self._direction = 1
+        elif self.limit in (self.minimum, self.maximum):
+            # Probe the other way next time
+            self._direction = -self._direction
+
+        self.throughput = throughput
+        self._reset(now)
+
+
+class TokenBucket(object):
+
+    """Token bucket refilled at ``rate`` tokens per second and holding at
+    most ``capacity`` tokens.  Tokens can be reserved before they are
+    available, which puts the bucket in debt, so a request larger than the
+    capacity waits in proportion to its size instead of waiting forever.
+    Safe to share between threads.
+    """
+
+    def __init__(self, rate, capacity=None):
+
+        """
+        Parameters
+        ----------
+        rate : float
+            Tokens added per second.
+        capacity : float or None, optional
+            Largest burst.  Defaults to one second of tokens.
+        """
+
+        if rate <= 0:
+            raise ValueError("'rate' must be positive.")
+
+        self.rate = float(rate)
+        self.capacity = float(rate if capacity is None else capacity)
+        self.tokens = self.capacity
+        self._updated = _compat.monotonic()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '{}(rate={}, capacity={})'.format(
+            type(self).__name__, self.rate, self.capacity)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens=1):
+
+        """Take tokens without waiting.
+
+        Returns
+        -------
+        float
+            Seconds until the reserved tokens are available.
+        """
+
+        with self._lock:
+            now = _compat.monotonic()
+            self.tokens = min(
+                self.capacity,
+                self.tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self.tokens -= tokens
+            return max(0.0, -self.tokens / self.rate)
+
+
+class RateLimit(object):
+
+    """Limit items and bytes per second with a ``TokenBucket()`` for each.
+
+    Attributes
+    ----------
+    waited : float
+        Total seconds spent waiting in ``acquire()``.
+    """
+
+    def __init__(self, rate=None, byte_rate=None, burst=1.0, sizefunc=len):
+
+        """
+        Parameters
+        ----------
+        rate : float or None, optional
+            Items per second.
+        byte_rate : float or None, optional
+            Bytes per second, measured by ``sizefunc``.
+        burst : float, optional
+            Seconds of unused capacity that can be spent at once.
+        sizefunc : callable, optional
+            Size of an item in bytes for ``byte_rate``.
+        """
+
+        if rate is None and byte_rate is None:
+            raise ValueError("Need 'rate', 'byte_rate', or both.")
+
+        self.sizefunc = sizefunc
+        self.items = None if rate is None \
+            else TokenBucket(rate, max(1, rate * burst))
+        self.bytes = None if byte_rate is None \
+            else TokenBucket(byte_rate, byte_rate * burst)
+        self.waited = 0.0
+
+    def __repr__(self):
+        return '{}(rate={}, byte_rate={})'.format(
+            type(self).__name__,
+            None if self.items is None else self.items.rate,
+            None if self.bytes is None else self.bytes.rate)
+
+    def acquire(self, item):
+
+        """Wait until ``item`` may proceed.
+
+        Returns
+        -------
+        float
+            Seconds waited.
+        """
+
+        delay = 0.0
+        if self.items is not None:
+            delay = self.items.reserve(1)
+        if self.bytes is not None:
+            delay = max(delay, self.bytes.reserve(self.sizefunc(item)))
+        if delay:
+            time.sleep(delay)
+            self.waited += delay
+        return delay
@@ -42,3 +42,11 @@ class NoPool(TinyFlowException):
     """Raised when a thread or process pool is requested but was not passed
     to ``tinyflow.Pipeline()``.
     """
+
+
+class NotCheckpointable(TinyFlowException):
+
+    """Raised when a pipeline is run with a
+    ``tinyflow.checkpoint.Checkpoint()`` but contains an operation whose
+    buffered items would be lost when resuming.
+    """
@@ -0,0 +1,357 @@
+"""Line offset indexes for random access into text files.
+
+An index records the byte offset where every Nth line of a file starts.  It
+is built once with a streaming pass over the file, stored compactly in a
+sidecar file next to the original, and reused until the file's size or
+modification time changes.  ``tinyflow.ops.cat()`` uses an index to read
+``LineRange()`` items, which makes it possible to resume mid-file or to
+split large files across workers:
+
+    from tinyflow import ops, MapPipeline, Pipeline
+
+
+    wordcount = MapPipeline() \
+        | ops.cat() \
+        | ops.methodcaller('split') \
+        | ops.flatten() \
+        | ops.counter()
+
+    pipeline = Pipeline() \
+        | ops.split_lines(8) \
+        | ops.map(wordcount, pool='thread') \
+        | ops.flatten() \
+        | ops.reduce_by_key(op.iadd, op.itemgetter(0), op.itemgetter(1))
+
+Lines are delimited by ``b'\\n'``, so files must use an encoding where a
+newline is always that byte, like UTF-8.
+"""
+
+
+from array import array
+from bisect import bisect_right
+from collections import namedtuple
+import os
+import struct
+import sys
+
+from . import _compat
+from .cache import LRUCache
+
+
+__all__ = ['LineIndex', 'LineRange', 'line_index']
+
+
+class LineRange(namedtuple('LineRange', ['path', 'start', 'stop'])):
+
+    """Lines ``start`` up to but not including ``stop`` of the file at
+    ``path``.  A ``stop`` of ``None`` means the end of the file.
+    """
+
+    # Assigning to '__doc__' instead does not work on Python 2
+    __slots__ = ()
+
+
+# Magic, version, stride, lines, size, mtime
+_HEADER = struct.Struct('<4sBQQQd')
+_MAGIC = b'TFLI'
+_VERSION = 1
+
+# Recently used indexes, keyed by path and file stats
+_INDEXES = LRUCache(64)
+
+
+class LineIndex(object):
+
+    """Byte offsets for the start of every ``stride``'th line in a file.
+
+    Attributes
+    ----------
+    path : str
+        Indexed file.
+    offsets : array.array
+        Offset of line ``i * stride`` is ``offsets[i]``.
+    stride : int
+        Number of lines between recorded offsets.
+    lines : int
+        Number of lines in the file.
+    size : int
+        Size of the file when it was indexed.
+    mtime : float
+        Modification time of the file when it was indexed.
+    """
+
+    def __init__(self, path, offsets, stride, lines, size, mtime):
+        self.path = path
+        self.offsets = offsets
+        self.stride = stride
+        self.lines = lines
+        self.size = size
+        self.mtime = mtime
+
+    def __len__(self):
+        return self.lines
+
+    def __repr__(self):
+        return '{}({!r}, stride={}, lines={})'.format(
+            type(self).__name__, self.path, self.stride, self.lines)
+
+    @classmethod
+    def build(cls, path, stride=1000, blocksize=2 ** 20):
+
+        """Index a file with a single streaming pass.
+
+        Parameters
+        ----------
+        path : str
+            File to index.
+        stride : int, optional
+            Record the offset of every Nth line.  Smaller values produce a
+            larger index but less reading when seeking.
+        blocksize : int, optional
+            Read this many bytes at a time.
+
+        Returns
+        -------
+        LineIndex
+        """
+
+        if stride < 1:
+            raise ValueError("'stride' must be at least 1.")
+
+        stat = os.stat(path)
+        offsets = array(_compat.uint64, [0])
+
+        # Newlines seen so far, which is also the number of the line
+        # starting after the most recent newline.
+        line = 0
+        target = stride
+        position = 0
+        last = b''
+
+        with open(path, 'rb') as f:
+            while True:
+                block = f.read(blocksize)
+                if not block:
+                    break
+                remaining = block.count(b'\n')
+                pos = 0
+                while line + remaining >= target:
+                    need = target - line
+                    # Jump over small sub-blocks at C speed before finding
+                    # individual newlines.
+                    while True:
+                        count = block.count(b'\n', pos, pos + 4096)
+                        if count >= need:
+                            break
+                        need -= count
+                        line += count
+                        remaining -= count
+                        pos += 4096
+                    for _ in _compat.range(need):
+                        pos = block.index(b'\n', pos) + 1
+                    line += need
+                    remaining -= need
+                    offsets.append(position + pos)
+                    target += stride
+                line += remaining
+                position += len(block)
+                last = block[-1:]
+
+        # A trailing newline does not start another line
+        if offsets[-1] == position and position:
+            offsets.pop()
+        lines = line + (1 if last and last != b'\n' else 0)
+
+        return cls(path, offsets, stride, lines, stat.st_size, stat.st_mtime)
+
+    @staticmethod
+    def sidecar(path):
+        """Path to the index file for ``path``."""
+        return path + '.tfidx'
+
+    def save(self, index_path=None):
+
+        """Write the index to disk.
+
+        Parameters
+        ----------
+        index_path : str or None, optional
+            Defaults to ``LineIndex.sidecar()``.
+        """
+
+        offsets = self.offsets
+        if sys.byteorder == 'big':  # pragma: no cover
+            offsets = array(_compat.uint64, offsets)
+            offsets.byteswap()
+
+        with open(index_path or self.sidecar(self.path), 'wb') as f:
+            f.write(_HEADER.pack(
+                _MAGIC, _VERSION, self.stride, self.lines, self.size,
+                self.mtime))
+            f.write(_compat.array_tobytes(offsets))
+
+    @classmethod
+    def load(cls, path, index_path=None):
+
+        """Read an index from disk.
+
+        Parameters
+        ----------
+        path : str
+            Indexed file.
+        index_path : str or None, optional
+            Defaults to ``LineIndex.sidecar()``.
+
+        Returns
+        -------
+        LineIndex
+        """
+
+        with open(index_path or cls.sidecar(path), 'rb') as f:
+            magic, version, stride, lines, size, mtime = _HEADER.unpack(
+                f.read(_HEADER.size))
+            if magic != _MAGIC or version != _VERSION:
+                raise ValueError("Not a line index: {}".format(path))
+            offsets = array(_compat.uint64)
+            _compat.array_frombytes(offsets, f.read())
+
+        if sys.byteorder == 'big':  # pragma: no cover
+            offsets.byteswap()
+
+        return cls(path, offsets, stride, lines, size, mtime)
+
+    def is_current(self):
+
+        """Determine if the file has changed since it was indexed."""
+
+        stat = os.stat(self.path)
+        return stat.st_size == self.size and stat.st_mtime == self.mtime
+
+    def seek(self, f, line):
+
+        """Position an open file at the start of a line.
+
+        Parameters
+        ----------
+        f : file
+            File object opened on ``path`` that supports seeking to a byte
+            offset, which includes text files with UTF-8 encoding.
+        line : int
+            Zero based line number.
+        """
+
+        block, skip = divmod(min(line, self.lines), self.stride)
+        if block >= len(self.offsets):
+            # Past the last line of a file ending with a newline
+            f.seek(self.size)
+            return
+        f.seek(self.offsets[block])
+        for _ in _compat.range(skip):
+            f.readline()
+
+    def nbytes(self, line_range):
+
+        """Size of a range of lines in bytes.  Exact when the boundaries
+        fall on indexed lines, like the ranges produced by ``split()``,
+        and otherwise rounded down to the nearest indexed line.
+
+        Parameters
+        ----------
+        line_range : LineRange
+
+        Returns
+        -------
+        int
+        """
+
+        def offset(line):
+            if line is None or line >= self.lines:
+                return self.size
+            return self.offsets[line // self.stride]
+
+        return offset(line_range.stop) - offset(line_range.start)
+
+    def split(self, count=None, size=None):
+
+        """Split the file into ranges of lines containing roughly the same
+        number of bytes.  Boundaries fall on indexed lines, so there may be
+        fewer ranges than requested.
+
+        Parameters
+        ----------
+        count : int or None, optional
+            Desired number of ranges.
+        size : int or None, optional
+            Desired number of bytes per range instead of ``count``.
+
+        Returns
+        -------
+        list
+            Of ``LineRange()``'s.
+        """
+
+        if (count is None) == (size is None):
+            raise ValueError("Need exactly one of 'count' or 'size'.")
+        elif size is not None:
+            count = max(1, -(-self.size // size))
+
+        offsets = self.offsets
+        bounds = [0]
+        for i in _compat.range(1, count):
+            idx = bisect_right(offsets, self.size * i // count) - 1
+            line = min(idx * self.stride, self.lines)
+            if line > bounds[-1]:
+                bounds.append(line)
+        bounds.append(self.lines)
+
+        return [
+            LineRange(self.path, start, stop)
+            for start, stop in zip(bounds[:-1], bounds[1:])
+            if stop > start]
+
+
+def line_index(path, stride=None, save=True):
+
+    """Get the index for a file, building it if needed.  Indexes are reused
+    from memory or from the sidecar file as long as the file has not
+    changed.
+
+    Parameters
+    ----------
+    path : str
+        File to index.
+    stride : int or None, optional
+        See ``LineIndex.build()``.  Existing indexes with a different stride
+        are rebuilt.  ``None`` accepts any existing index and builds new
+        indexes with a stride of 1000.
+    save : bool, optional
+        Write newly built indexes to the sidecar file.  Failures, like a
+        read only directory, are ignored.
+
+    Returns
+    -------
+    LineIndex
+    """
+
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime)
+
+    index = _INDEXES.get(key)
+    if index is None:
+        try:
+            index = LineIndex.load(path)
+        except (IOError, OSError, ValueError, struct.error):
+            index = None
+        if index is not None and not index.is_current():
+            index = None
+
+    if index is None or stride not in (None, index.stride):
+        index = LineIndex.build(path, stride=stride or 1000)
+        if save:
+            try:
+                index.save()
+            except (IOError, OSError):
+                pass
+
+    _INDEXES.set(key, index)
+    return index
@@ -5,25 +5,56 @@ import abc
 import codecs
 from collections import Counter, deque
 import copy
+import functools
 from functools import reduce
+import heapq
 import itertools as it
+import math
 import operator as op
+import random
+import re
 
 from . import _compat, tools
 from .exceptions import NoPipeline
 
 
+# Only some operations need these, so they are imported on first use
+_binary = tools.LazyModule('tinyflow.binary')
+_cache = tools.LazyModule('tinyflow.cache')
+_concurrency = tools.LazyModule('tinyflow.concurrency')
+_index = tools.LazyModule('tinyflow.index')
+_sink = tools.LazyModule('tinyflow.sink')
+_sketch = tools.LazyModule('tinyflow.sketch')
+_source = tools.LazyModule('tinyflow.source')
+
+
 __all__ = [
     'Operation', 'map', 'wrap', 'sort', 'filter',
     'flatten', 'take', 'drop', 'windowed_op',
     'windowed_reduce', 'counter', 'reduce_by_key',
-    'chunk', 'cat', 'methodcaller', 'itemgetter']
+    'chunk', 'cat', 'methodcaller', 'itemgetter', 'cache', 'split_lines',
+    'pack', 'unpack', 'read_binary', 'write_lines', 'write_csv',
+    'write_jsonl', 'write_binary', 'partition_by', 'join', 'distinct',
+    'count_distinct', 'sample', 'group_by', 'quantiles', 'histogram',
+    'tokenize', 'read_jsonl', 'read_csv', 'throttle']
 
 
 class Operation(object):
 
     """Base class for developing pipeline steps."""
 
+    __slots__ = ('_description', '_pipeline', '_restored_state')
+
+    # Operations that can take advantage of receiving a sequence, like a
+    # 'list()' or 'range()', or a file object rather than an opaque
+    # iterator set this to 'True'.  They must still accept any iterable.
+    accepts_sequences = False
+
+    # Operations that hold items from the stream that are not captured by
+    # 'get_state()', like a partial batch, set this to 'False'.  Such items
+    # would be lost when resuming from a 'tinyflow.checkpoint.Checkpoint()'.
+    checkpointable = True
+
     @property
     def description(self):
 
@@ -59,6 +90,44 @@ class Operation(object):
     def pipeline(self, pipeline):
         self._pipeline = pipeline
 
+    def get_state(self):
+
+        """Operations that hold data in memory while processing a stream,
+        like ``reduce_by_key()``, override to return a picklable snapshot
+        of that data, which is used by ``tinyflow.checkpoint``.  Called
+        while the stream is being processed.
+
+        Returns
+        -------
+        object
+            ``None`` if the operation has no state.
+        """
+
+        return None
+
+    def set_state(self, state):
+
+        """Restore state captured by ``get_state()``.  Called before
+        ``__call__()``, which picks it up with ``_pop_state()``.
+
+        Parameters
+        ----------
+        state : object
+            From ``get_state()``.
+        """
+
+        self._restored_state = state
+
+    def _pop_state(self):
+
+        """Get the state passed to ``set_state()``, if any, and remove it
+        so a later call does not see it again.
+        """
+
+        state = getattr(self, '_restored_state', None)
+        self._restored_state = None
+        return state
+
     @abc.abstractmethod
     def __call__(self, stream):  # pragma: no cover
 
@@ -84,12 +153,28 @@ class Operation(object):
         self.description = other
         return self
 
+    # Operations use '__slots__', which only older pickle protocols can't
+    # handle on their own.
+    def __getstate__(self):
+        return tools.attributes(self)
+
+    def __setstate__(self, state):
+        for key, value in state.items():
+            setattr(self, key, value)
+
 
 class map(Operation):
 
     """Map a function across the stream of data."""
 
-    def __init__(self, func, argtype='single', flatten=False, pool=None):
+    __slots__ = (
+        'argtype', 'backoff', 'concurrency', 'dead_letter', 'flatten', 'func',
+        'limiter', 'memo', 'pool', 'queue', 'rate_limit', 'retries', 'timeout',
+        'worker_pool')
+
+    def __init__(self, func, argtype='single', flatten=False, pool=None,
+                 memoize=None, concurrency=None, timeout=None, retries=0,
+                 backoff=0.1, dead_letter=None, rate_limit=None):
 
         """
         Parameters
@@ -108,12 +193,62 @@ class map(Operation):
             Use 'thread' for thread pool or 'process' for process pool.
             The corresponding pool must be passed to ``Pipeline.__call__()``
             at the time of computation.
+        memoize : int or tinyflow.cache.LRUCache or None, optional
+            Cache results by input item in a ``tinyflow.cache.LRUCache()``
+            holding this many results, or pass a cache directly to control
+            the time to live or share it between operations.  Items must be
+            hashable, and results that are iterators are materialized into a
+            list.  Cached results are shared, so they should not be mutated
+            downstream.  The cache is available as ``map.memo`` and its
+            ``hits`` and ``misses`` attributes are useful for tuning the
+            size.
+        concurrency : int or str or AdaptiveLimit or None, optional
+            Maximum number of items in flight in the pool.  By default
+            every item is submitted as soon as it arrives, which reads the
+            entire stream if the pool falls behind.  Use 'adaptive' to let a
+            ``tinyflow.concurrency.AdaptiveLimit()`` find the window with
+            the best throughput, or pass one directly to set its bounds.
+            The current limit is available as ``map.limiter.limit``.
+        timeout : float or None, optional
+            Seconds an item may spend in the pool before it counts as a
+            failure.  Work that already started cannot be interrupted, so
+            a hung task keeps its worker busy, but its item is retried or
+            dead lettered and the stream moves on.  Time spent waiting for
+            a worker is not counted when the pipeline owns the pool, since
+            items are only submitted when a worker is free.  For a pool
+            passed to ``Pipeline.__call__()`` set ``concurrency`` to at most
+            its number of workers for the same behavior.
+        retries : int, optional
+            Submit a failed item again up to this many times.
+        backoff : float, optional
+            Seconds to wait before the first retry.  Doubles for every
+            following retry.  Other items keep flowing while waiting.
+        dead_letter : callable or None, optional
+            Called with a ``tinyflow.concurrency.DeadLetter()`` for items
+            that failed every attempt, like ``list.append``, instead of
+            raising the exception and stopping the stream.
+        rate_limit : float or RateLimit or None, optional
+            Submit at most this many items per second to the pool, or pass
+            a ``tinyflow.concurrency.RateLimit()`` to also limit bytes per
+            second.  Retries count against the limit.  Items wait for a
+            free slot in the window set by ``concurrency`` and then for the
+            rate limit, so an adaptive window does not grow when the rate
+            is the bottleneck.
         """
 
         self.func = func
         self.flatten = flatten
         self.queue = deque()
 
+        if memoize is None or memoize is False:
+            self.memo = None
+        elif memoize is True:
+            self.memo = _cache.LRUCache()
+        elif isinstance(memoize, int):
+            self.memo = _cache.LRUCache(memoize)
+        else:
+            self.memo = memoize
+
         # Validate by calling '_compute_no_pool()' with an empty iterable,
         # which steps through the various valid values for 'argtype' without
         # actually doing any work.
@@ -123,6 +258,61 @@ class map(Operation):
         self.pool = pool
         self.worker_pool = None
 
+        if concurrency is None or concurrency == 'adaptive':
+            self.concurrency = concurrency
+        elif isinstance(concurrency, int):
+            self.concurrency = _concurrency.AdaptiveLimit(
+                concurrency, concurrency)
+        elif isinstance(concurrency, _compat.string_types):
+            raise ValueError("Invalid concurrency: {}".format(concurrency))
+        else:
+            self.concurrency = concurrency
+        self.limiter = None
+
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.dead_letter = dead_letter
+
+        if rate_limit is None or isinstance(
+                rate_limit, _concurrency.RateLimit):
+            self.rate_limit = rate_limit
+        else:
+            self.rate_limit = _concurrency.RateLimit(rate_limit)
+        if self.rate_limit is not None and pool is None:
+            raise ValueError(
+                "'rate_limit' requires a pool.  See 'throttle()'.")
+
+        if self.resilient and pool is None:
+            raise ValueError(
+                "'timeout', 'retries', and 'dead_letter' require a pool.")
+        elif self.resilient and self.memo is not None:
+            raise ValueError(
+                "'timeout', 'retries', and 'dead_letter' cannot be combined "
+                "with 'memoize'.")
+
+    @property
+    def checkpointable(self):
+        # Items in flight in a pool are not part of the state
+        return self.pool is None
+
+    @property
+    def resilient(self):
+
+        """``True`` if failed items are retried, timed out, or dead
+        lettered.
+        """
+
+        return self.timeout is not None or self.retries > 0 \
+            or self.dead_letter is not None
+
+    def __getstate__(self):
+        # Leave out state from the last run, like the pool, which cannot be
+        # copied or pickled.
+        state = super(map, self).__getstate__()
+        state.update(queue=deque(), worker_pool=None, limiter=None)
+        return state
+
     def flush_queue(self, count=None):
 
         # Dots aren't free
@@ -141,6 +331,17 @@ class map(Operation):
             if count is not None and i > count:
                 break
 
+    def cancel(self):
+
+        """Cancel any work submitted to the pool that has not started and
+        discard the queue.  Work that is already running is allowed to
+        finish.
+        """
+
+        queue = self.queue
+        while queue:
+            queue.popleft().cancel()
+
     def _compute_no_pool(self, stream):
         if self.argtype == 'single':
             return _compat.map(self.func, stream)
@@ -154,33 +355,261 @@ class map(Operation):
         else:
             raise ValueError("Invalid argtype: {}".format(self.argtype))
 
+    def _memo_key(self, item):
+
+        """Produce a hashable key for an item based on ``argtype``."""
+
+        if self.argtype == 'single':
+            return item
+        elif self.argtype == '*args':
+            return tuple(item)
+        elif self.argtype == '**kwargs':
+            return frozenset(item.items())
+        else:
+            return tuple(item[0]), frozenset(item[1].items())
+
+    def _compute_memoized(self, stream):
+
+        # Dots aren't free
+        memo = self.memo
+        get = memo.get
+        keyfunc = self._memo_key
+        compute = self._compute_no_pool
+
+        for item in stream:
+            key = keyfunc(item)
+            value = get(key, tools.NULL)
+            if value is tools.NULL:
+                value = _materialize(next(compute([item])))
+                memo.set(key, value)
+            yield value
+
+    def _memo_done(self, pending, key, future):
+
+        """Future callback storing results in the memo."""
+
+        pending.pop(key, None)
+        if not future.cancelled() and future.exception() is None:
+            self.memo.set(key, future.result())
+
+    def _submit(self, pool, func, item):
+        if self.rate_limit is not None:
+            self.rate_limit.acquire(item)
+        if self.argtype == 'single':
+            return pool.submit(func, item)
+        elif self.argtype == '*args':
+            return pool.submit(func, *item)
+        elif self.argtype == '**kwargs':
+            return pool.submit(func, **item)
+        elif self.argtype == '*args**kwargs':
+            return pool.submit(func, *item[0], **item[1])
+        else:
+            raise ValueError("Invalid argtype: {}".format(self.argtype))
+
+    def _start_limiter(self):
+        if self.concurrency == 'adaptive':
+            self.limiter = _concurrency.AdaptiveLimit()
+        else:
+            self.limiter = self.concurrency
+        return self.limiter
+
     def _compute_with_pool(self, stream):
         queue = self.queue
         pool = self.worker_pool
-        for idx, item in enumerate(stream, 1):
-            if self.argtype == 'single':
-                future = pool.submit(
-                    self.func, item)
-            elif self.argtype == '*args':
-                future = pool.submit(
-                    self.func, *item)
-            elif self.argtype == '**kwargs':
-                future = pool.submit(
-                    self.func, **item)
-            elif self.argtype == '*args**kwargs':
-                future = pool.submit(
-                    self.func, *item[0], **item[1])
-            else:
-                raise ValueError("Invalid argtype: {}".format(self.argtype))
+        memo = self.memo
 
-            queue.append(future)
+        limiter = self._start_limiter()
+        if limiter is not None:
+            from concurrent.futures import FIRST_COMPLETED, wait
 
-            if idx % 10 == 0:
-                for out in self.flush_queue(len(queue)):
-                    yield out
+        if memo is None:
+            func = self.func
+        else:
+            from concurrent.futures import Future
+            # Iterators must be materialized before they are cached, and
+            # must also be materialized in the worker so the consumer does
+            # not receive an exhausted iterator.
+            func = functools.partial(_call_materialize, self.func)
+            # Results that are still being computed
+            pending = {}
+
+        # Pending work is cancelled if the consumer stops early, like when
+        # a downstream 'take()' has all the items it needs.
+        try:
+            for idx, item in enumerate(stream, 1):
+
+                future = None
+                if memo is not None:
+                    key = self._memo_key(item)
+                    value = memo.get(key, tools.NULL)
+                    if value is not tools.NULL:
+                        future = Future()
+                        future.set_result(value)
+                    else:
+                        # Share the in-flight computation for duplicate keys
+                        future = pending.get(key)
+
+                submitted = future is None
+                if submitted:
+                    future = self._submit(pool, func, item)
+
+                if memo is not None and submitted:
+                    pending[key] = future
+                    future.add_done_callback(
+                        functools.partial(self._memo_done, pending, key))
+
+                if limiter is not None and submitted:
+                    future.add_done_callback(functools.partial(
+                        limiter.finished, limiter.started()))
+
+                queue.append(future)
+
+                if limiter is not None:
+                    # Wait for a slot when the window is full
+                    while len(queue) >= limiter.limit:
+                        wait(queue, return_when=FIRST_COMPLETED)
+                        for out in self.flush_queue(len(queue)):
+                            yield out
+                elif idx % 10 == 0:
+                    for out in self.flush_queue(len(queue)):
+                        yield out
+
+            for item in self.flush_queue():
+                yield item
+        finally:
+            self.cancel()
+
+    def _compute_resilient(self, stream):
+
+        """Like ``_compute_with_pool()`` but failed and timed out items
+        are retried or dead lettered.  Futures report completion through
+        a queue, so waiting does not scan every pending item, and results
+        are produced as soon as they are ready.
+
+        With a ``timeout`` no more items are submitted than the pool has
+        workers, so an item starts running when it is submitted and time
+        spent waiting in the pool's queue does not count against it.
+        Timed out items that are still running occupy their worker until
+        they return.
+        """
 
-        for item in self.flush_queue():
-            yield item
+        from concurrent.futures import TimeoutError
+
+        # Dots aren't free
+        pool = self.worker_pool
+        func = self.func
+        timeout = self.timeout
+        monotonic = _compat.monotonic
+        heappush = heapq.heappush
+        heappop = heapq.heappop
+
+        limiter = self._start_limiter()
+        finished = _compat.queue.Queue()
+        # Future -> (item, attempt)
+        running = {}
+        # Futures that timed out but are still holding a worker
+        hung = []
+        workers = None
+        if timeout is not None:
+            workers = self.pipeline.workers(self.pool)
+
+        def has_room():
+            window = workers
+            if limiter is not None:
+                window = limiter.limit if window is None \
+                    else min(window, limiter.limit)
+            if window is None:
+                return True
+            hung[:] = [f for f in hung if not f.done()]
+            return len(running) + len(hung) < window
+        # Heaps of (time, tiebreak, ...)
+        deadlines = []
+        delayed = []
+        tiebreak = it.count()
+
+        def start(item, attempt):
+            future = self._submit(pool, func, item)
+            if limiter is not None:
+                future.add_done_callback(functools.partial(
+                    limiter.finished, limiter.started()))
+            running[future] = (item, attempt)
+            if timeout is not None:
+                heappush(
+                    deadlines, (monotonic() + timeout, next(tiebreak), future))
+            future.add_done_callback(finished.put)
+
+        def failed(item, attempt, error):
+            if attempt <= self.retries:
+                ready = monotonic() + self.backoff * 2 ** (attempt - 1)
+                heappush(delayed, (ready, next(tiebreak), item, attempt + 1))
+            elif self.dead_letter is not None:
+                self.dead_letter(_concurrency.DeadLetter(item, error, attempt))
+            else:
+                raise error
+
+        stream = iter(stream)
+        exhausted = False
+        try:
+            while True:
+
+                now = monotonic()
+                while deadlines and deadlines[0][0] <= now:
+                    _, _, future = heappop(deadlines)
+                    if future in running and not future.done():
+                        item, attempt = running.pop(future)
+                        if not future.cancel():
+                            hung.append(future)
+                        failed(item, attempt, TimeoutError(
+                            "Item did not finish within {} seconds: "
+                            "{!r}".format(timeout, item)))
+                while delayed and delayed[0][0] <= now and has_room():
+                    _, _, item, attempt = heappop(delayed)
+                    start(item, attempt)
+
+                # Keep submitting without blocking until the input runs out
+                # or the window is full
+                block = True
+                room = has_room()
+                if not exhausted and room:
+                    item = next(stream, tools.NULL)
+                    if item is tools.NULL:
+                        exhausted = True
+                    else:
+                        start(item, 1)
+                        block = False
+
+                if exhausted and not running and not delayed:
+                    return
+
+                wake = None
+                if block:
+                    # Retries that are due wait for a free worker
+                    heads = [h[0][0] for h in (deadlines, delayed) if h and (
+                        h is deadlines or room)]
+                    if heads:
+                        wake = max(0, min(heads) - monotonic())
+
+                try:
+                    future = finished.get(block, wake)
+                except _compat.queue.Empty:
+                    continue
+
+                while True:
+                    if future in running:
+                        item, attempt = running.pop(future)
+                        if not future.cancelled():
+                            error = future.exception()
+                            if error is None:
+                                yield future.result()
+                            else:
+                                failed(item, attempt, error)
+                    try:
+                        future = finished.get_nowait()
+                    except _compat.queue.Empty:
+                        break
+        finally:
+            for future in running:
+                future.cancel()
 
     def __call__(self, stream):
 
@@ -195,17 +624,51 @@ class map(Operation):
             raise ValueError("Invalid pool: {}".format(self.pool))
 
         # Run computation
-        if self.worker_pool:
+        if self.worker_pool and self.resilient:
+            results = self._compute_resilient(stream)
+        elif self.worker_pool:
             results = self._compute_with_pool(stream)
+        elif self.memo is not None:
+            results = self._compute_memoized(stream)
         else:
             results = self._compute_no_pool(stream)
 
-        if self.flatten:
+        if self.flatten and self.worker_pool:
+            # Keep the ability to close the pooled computation
+            results = tools.closing(it.chain.from_iterable(results), results)
+        elif self.flatten:
             results = it.chain.from_iterable(results)
 
         return results
 
 
+def _materialize(value):
+
+    """Convert iterators to a list so they can be cached and reused."""
+
+    if isinstance(value, _compat.Iterator):
+        value = list(value)
+    return value
+
+
+def _call_materialize(func, *args, **kwargs):
+
+    """Call a function and materialize its output.  Lives at the module
+    level so it can be shipped to a process pool.
+    """
+
+    return _materialize(func(*args, **kwargs))
+
+
+def _identity(value):
+
+    """Return ``value``.  Unlike a ``lambda`` this can be pickled, like
+    when an operation is shipped to a process pool.
+    """
+
+    return value
+
+
 class wrap(Operation):
 
     """Wrap the data stream in an arbitrary operaton.
@@ -219,6 +682,8 @@ class wrap(Operation):
         Pipeline() | ops.flatten()
     """
 
+    __slots__ = ('func',)
+
     def __init__(self, func):
 
         """
@@ -238,6 +703,8 @@ class sort(Operation):
 
     """Sort the stream of data.  Just a wrapper around ``sorted()``."""
 
+    __slots__ = ('_items', 'key', 'reverse')
+
     def __init__(self, key=None, reverse=False):
 
         """
@@ -252,15 +719,25 @@ class sort(Operation):
         self.key = key
         self.reverse = reverse
 
+    def get_state(self):
+        return getattr(self, '_items', None)
+
     def __call__(self, stream):
-        return sorted(stream, key=self.key, reverse=self.reverse)
+        # Extend in place so a checkpoint can see partial input
+        items = self._items = self._pop_state() or []
+        items.extend(stream)
+        self._items = None
+        items.sort(key=self.key, reverse=self.reverse)
+        return items
 
 
 class filter(Operation):
 
     """Filter the data stream.  Keeps elements that evaluate as ``True``."""
 
-    def __init__(self, func=None, filterfalse=False):
+    __slots__ = ('filterfalse', 'func', 'independent')
+
+    def __init__(self, func=None, filterfalse=False, independent=False):
 
         """
         Parameters
@@ -269,10 +746,17 @@ class filter(Operation):
             See ``filter()``'s documentation.
         filterfalse : bool, optional
             Use ``itertools.filterfalse()`` instead of ``filter()``.
+        independent : bool, optional
+            Declare that ``func`` produces the same answer for an item
+            before and after it passes through upstream ``map()`` and
+            ``methodcaller()`` operations, which allows
+            ``tinyflow.Pipeline.optimize()`` to filter items before they are
+            mapped.
         """
 
         self.func = func
         self.filterfalse = filterfalse
+        self.independent = independent
 
     def __call__(self, stream):
         if self.filterfalse:
@@ -285,13 +769,21 @@ class flatten(Operation):
 
     """Flatten an iterable.  Like ``itertools.chain.from_iterable()``."""
 
+    __slots__ = ()
+
     def __call__(self, stream):
         return it.chain.from_iterable(stream)
 
 
 class take(Operation):
 
-    """Take N items from the stream."""
+    """Take N items from the stream.  Sequences like ``list()`` and
+    ``range()`` are sliced rather than iterated.
+    """
+
+    __slots__ = ('count',)
+
+    checkpointable = False
 
     def __init__(self, count):
 
@@ -304,13 +796,24 @@ class take(Operation):
 
         self.count = count
 
+    accepts_sequences = True
+
     def __call__(self, stream):
+        if tools.is_sequence(stream):
+            return tools.limit(stream, self.count)
         return it.islice(stream, self.count)
 
 
 class drop(Operation):
 
-    """Drop N items from the stream."""
+    """Drop N items from the stream.  Sequences like ``list()`` and
+    ``range()`` are sliced and seekable files are advanced by counting
+    newlines in large blocks.  See ``tinyflow.tools.skip()``.
+    """
+
+    __slots__ = ('count',)
+
+    checkpointable = False
 
     def __init__(self, count):
 
@@ -323,11 +826,186 @@ class drop(Operation):
 
         self.count = count
 
+    accepts_sequences = True
+
     def __call__(self, stream):
-        stream = iter(stream)
-        for _ in range(self.count):
-            next(stream)
-        return stream
+        return tools.skip(stream, self.count)
+
+
+class sample(Operation):
+
+    """Randomly sample items from the stream in a single pass.
+
+    Methods:
+
+        reservoir: Given ``k``, emit a uniform sample of ``k`` items once
+            the stream is exhausted, holding only ``k`` items in memory.
+            Uses Algorithm L, which skips over items between replacements
+            without drawing a random number for each one.
+        stratified: Given ``k`` and ``keyfunc``, emit a uniform sample of
+            up to ``k`` items for every key.
+        bernoulli: Given ``rate``, emit every item with that probability
+            as it arrives.  Skips between sampled items are drawn from a
+            geometric distribution.
+
+    Samples are emitted in stream order.  Sequences, like ``list()`` and
+    ``range()``, are indexed rather than iterated.  Use ``seed`` for
+    reproducible samples.
+    """
+
+    __slots__ = ('k', 'keyfunc', 'rate', 'seed')
+
+    accepts_sequences = True
+
+    @property
+    def checkpointable(self):
+        # The reservoir is not part of the state
+        return self.k is None
+
+    def __init__(self, k=None, rate=None, keyfunc=None, seed=None):
+
+        """
+        Parameters
+        ----------
+        k : int or None, optional
+            Sample size, or sample size per key with ``keyfunc``.
+        rate : float or None, optional
+            Probability of sampling every item.
+        keyfunc : callable or None, optional
+            Stratify by the key produced by this function.
+        seed : object, optional
+            Seed for ``random.Random()``.  Every call uses a new generator
+            with this seed.
+        """
+
+        if (k is None) == (rate is None):
+            raise ValueError("Need exactly one of 'k' or 'rate'.")
+        elif keyfunc is not None and k is None:
+            raise ValueError("Stratified sampling requires 'k'.")
+        elif k is not None and k < 0:
+            raise ValueError("'k' must be positive.")
+        elif rate is not None and not 0 <= rate <= 1:
+            raise ValueError("'rate' must be between 0 and 1.")
+
+        self.k = k
+        self.rate = rate
+        self.keyfunc = keyfunc
+        self.seed = seed
+
+    @staticmethod
+    def _skip(rng, p):
+
+        """Number of items to skip before the next success of a trial with
+        probability ``p``.
+        """
+
+        # 'random()' can produce 0.0
+        return int(math.log(1.0 - rng.random()) / math.log(1.0 - p))
+
+    def _bernoulli(self, stream, rng):
+
+        rate = self.rate
+        if rate == 0:
+            return
+        elif rate == 1:
+            for item in stream:
+                yield item
+            return
+
+        skip = self._skip
+        if tools.is_sequence(stream):
+            idx = skip(rng, rate)
+            size = len(stream)
+            while idx < size:
+                yield stream[idx]
+                idx += skip(rng, rate) + 1
+        else:
+            stream = iter(stream)
+            while True:
+                item = next(
+                    it.islice(stream, skip(rng, rate), None), tools.NULL)
+                if item is tools.NULL:
+                    return
+                yield item
+
+    def _reservoir(self, stream, rng):
+
+        k = self.k
+        if k == 0:
+            return
+
+        if tools.is_sequence(stream):
+            size = len(stream)
+            indexes = sorted(rng.sample(_compat.range(size), min(k, size)))
+            for idx in indexes:
+                yield stream[idx]
+            return
+
+        # Track positions so the sample can be emitted in stream order
+        stream = enumerate(stream)
+        reservoir = list(it.islice(stream, k))
+        if len(reservoir) == k:
+            w = math.exp(math.log(1.0 - rng.random()) / k)
+            while True:
+                skip = self._skip(rng, w)
+                item = next(it.islice(stream, skip, None), tools.NULL)
+                if item is tools.NULL:
+                    break
+                reservoir[rng.randrange(k)] = item
+                w *= math.exp(math.log(1.0 - rng.random()) / k)
+
+        reservoir.sort(key=op.itemgetter(0))
+        for _, item in reservoir:
+            yield item
+
+    def _stratified(self, stream, rng):
+
+        k = self.k
+        if k == 0:
+            return
+
+        keyfunc = self.keyfunc
+        log = math.log
+        exp = math.exp
+        skip = self._skip
+
+        # key -> [reservoir, items seen, position of next replacement, w]
+        strata = {}
+
+        for idx, item in enumerate(stream):
+            key = keyfunc(item)
+            stratum = strata.get(key)
+            if stratum is None:
+                stratum = strata[key] = [[], 0, None, None]
+            reservoir, seen, replace, w = stratum
+            stratum[1] = seen + 1
+
+            if len(reservoir) < k:
+                reservoir.append((idx, item))
+                if len(reservoir) == k:
+                    w = exp(log(1.0 - rng.random()) / k)
+                    stratum[2] = seen + 1 + skip(rng, w)
+                    stratum[3] = w
+            elif seen == replace:
+                reservoir[rng.randrange(k)] = (idx, item)
+                w *= exp(log(1.0 - rng.random()) / k)
+                stratum[2] = seen + 1 + skip(rng, w)
+                stratum[3] = w
+
+        merged = []
+        for reservoir, _, _, _ in strata.values():
+            merged.extend(reservoir)
+        merged.sort(key=op.itemgetter(0))
+        for _, item in merged:
+            yield item
+
+    def __call__(self, stream):
+        rng = random.Random(self.seed)
+        if self.rate is not None:
+            return self._bernoulli(stream, rng)
+        elif self.keyfunc is not None:
+            return self._stratified(stream, rng)
+        return self._reservoir(stream, rng)
 
 
 class windowed_op(Operation):
@@ -337,6 +1015,8 @@ class windowed_op(Operation):
     back into the stream.
     """
 
+    __slots__ = ('_window', 'count', 'operation')
+
     def __init__(self, count, operation):
 
         """
@@ -351,16 +1031,41 @@ class windowed_op(Operation):
         self.count = count
         self.operation = operation
 
+    def get_state(self):
+        return getattr(self, '_window', None)
+
     def __call__(self, stream):
-        windows = tools.slicer(stream, self.count)
-        results = _compat.map(self.operation, windows)
-        return it.chain.from_iterable(results)
+
+        # Items are collected into an explicit buffer rather than with
+        # 'tools.slicer()' so a checkpoint can see a partial window.
+        window = self._window = self._pop_state() or []
+        append = window.append
+        count = self.count
+        operation = self.operation
+
+        for item in stream:
+            append(item)
+            if len(window) >= count:
+                values = tuple(window)
+                del window[:]
+                for value in operation(values):
+                    yield value
+
+        if window:
+            values = tuple(window)
+            del window[:]
+            for value in operation(values):
+                yield value
+
+        self._window = None
 
 
 class windowed_reduce(Operation):
 
     """Group N items together into a window and reduce to a single value."""
 
+    __slots__ = ('_window', 'count', 'reducer')
+
     def __init__(self, count, reducer):
 
         """
@@ -375,15 +1080,38 @@ class windowed_reduce(Operation):
         self.count = count
         self.reducer = reducer
 
+    def get_state(self):
+        return getattr(self, '_window', None)
+
     def __call__(self, stream):
-        for window in tools.slicer(stream, self.count):
-            yield reduce(self.reducer, window)
+
+        # See 'windowed_op()' for why this doesn't use 'tools.slicer()'.
+        window = self._window = self._pop_state() or []
+        append = window.append
+        count = self.count
+        reducer = self.reducer
+
+        for item in stream:
+            append(item)
+            if len(window) >= count:
+                value = reduce(reducer, window)
+                del window[:]
+                yield value
+
+        if window:
+            value = reduce(reducer, window)
+            del window[:]
+            yield value
+
+        self._window = None
 
 
 class counter(Operation):
 
     """Count items and optionally produce only the N most common."""
 
+    __slots__ = ('_frequency', 'most_common')
+
     def __init__(self, most_common=None):
 
         """
@@ -395,8 +1123,14 @@ class counter(Operation):
 
         self.most_common = most_common
 
+    def get_state(self):
+        return getattr(self, '_frequency', None)
+
     def __call__(self, stream):
-        frequency = Counter(stream)
+        # Update in place so a checkpoint can see partial counts
+        frequency = self._frequency = self._pop_state() or Counter()
+        frequency.update(stream)
+        self._frequency = None
         if self.most_common:
             results = frequency.most_common(self.most_common)
         else:
@@ -422,8 +1156,12 @@ class reduce_by_key(Operation):
     Values are emitted as a sequence of ``(key, val)`` tuples.
     """
 
+    __slots__ = (
+        '_partitioned', 'copier', 'copy_initial', 'initial', 'keyfunc',
+        'reducer', 'valfunc')
+
     def __init__(
-            self, reducer, keyfunc, valfunc=lambda x: x, initial=tools.NULL,
+            self, reducer, keyfunc, valfunc=_identity, initial=tools.NULL,
             copy_initial=False, deepcopy_initial=False):
 
         """
@@ -464,10 +1202,13 @@ class reduce_by_key(Operation):
         elif deepcopy_initial:
             self.copier = copy.deepcopy
         else:
-            self.copier = lambda x: x
+            self.copier = _identity
+
+    def get_state(self):
+        return getattr(self, '_partitioned', None)
 
     def __call__(self, stream):
-        partitioned = {}
+        partitioned = self._partitioned = self._pop_state() or {}
 
         # Add keys to the stream and extract values
         stream = ((self.keyfunc(i), self.valfunc(i)) for i in stream)
@@ -493,101 +1234,1684 @@ class reduce_by_key(Operation):
             else:  # pragma: no cover
                 raise ValueError("This shouldn't happen.")
 
+        self._partitioned = None
+
         while partitioned:
             yield partitioned.popitem()
 
 
-class chunk(Operation):
+class group_by(Operation):
+
+    """Compute one or more aggregations for every key in a single pass and
+    emit ``(key, results)`` tuples.  Aggregations are described in
+    ``tinyflow.aggregate``.  Only aggregation state is held for every group,
+    not the items themselves:
+
+        from tinyflow import aggregate as agg
+
+        ops.group_by(
+            operator.itemgetter('user'),
+            {
+                'count': agg.count(),
+                'median': agg.quantile(0.5, operator.itemgetter('latency')),
+            })
 
-    """Group elements in the stream into tuples, each with at most N items."""
+    Results are a dictionary if ``aggregations`` is a dictionary and a
+    tuple otherwise.  By default groups are emitted once the stream is
+    exhausted.  With ``sorted=True`` all items with the same key must be
+    adjacent, like when the stream is sorted by key, and each group is
+    emitted and released as soon as the key changes.
+    """
+
+    __slots__ = (
+        '_aggregations', '_groups', '_names', 'aggregations', 'keyfunc',
+        'sorted')
 
-    def __init__(self, size):
+    def __init__(self, keyfunc, aggregations, sorted=False):
 
         """
         Parameters
         ----------
-        size : int
-            Maximum number of items to group together.
+        keyfunc : callable
+            Produces the key for every item.
+        aggregations : dict or list
+            Instances of ``tinyflow.aggregate.Aggregation()``.
+        sorted : bool, optional
+            Input is grouped by key.
         """
-        self.size = size
 
-    def __call__(self, stream):
+        self.keyfunc = keyfunc
+        self.aggregations = aggregations
+        self.sorted = sorted
 
-        stream = iter(stream)
+        if isinstance(aggregations, dict):
+            self._names = list(aggregations.keys())
+            self._aggregations = [aggregations[n] for n in self._names]
+        else:
+            self._names = None
+            self._aggregations = list(aggregations)
+
+    def get_state(self):
+        return getattr(self, '_groups', None)
+
+    def _initial(self):
+        return [a.initial() for a in self._aggregations]
+
+    def _result(self, key, states):
+        results = [a.result(s) for a, s in zip(self._aggregations, states)]
+        if self._names is None:
+            return key, tuple(results)
+        return key, dict(zip(self._names, results))
+
+    def __call__(self, stream):
 
         # Dots aren't free.
-        size = self.size
-        while True:
-            v = tuple(it.islice(stream, size))
-            if v:
-                yield v
-            else:
-                return
+        keyfunc = self.keyfunc
+        initial = self._initial
+        adders = [
+            (idx, a.add, a.valfunc)
+            for idx, a in enumerate(self._aggregations)]
+
+        if self.sorted:
+            # The group in progress is held as '[key, states]' rather than
+            # with 'itertools.groupby()' so a checkpoint can see it.  An
+            # item starting a new group is added before the previous group
+            # is emitted, so the state never omits an item that was read.
+            group = self._groups = self._pop_state() or []
+            for item in stream:
+                key = keyfunc(item)
+                done = None
+                if not group or group[0] != key:
+                    done = tuple(group)
+                    group[:] = [key, initial()]
+                states = group[1]
+                for idx, add, valfunc in adders:
+                    states[idx] = add(
+                        states[idx],
+                        item if valfunc is None else valfunc(item))
+                if done:
+                    yield self._result(*done)
+            self._groups = None
+            if group:
+                yield self._result(*group)
+            return
+
+        groups = self._groups = self._pop_state() or {}
+        for item in stream:
+            key = keyfunc(item)
+            states = groups.get(key)
+            if states is None:
+                states = groups[key] = initial()
+            for idx, add, valfunc in adders:
+                states[idx] = add(
+                    states[idx], item if valfunc is None else valfunc(item))
+
+        self._groups = None
+        while groups:
+            yield self._result(*groups.popitem())
+
+
+def _kll(stream, valfunc, k, merge):
+
+    """Build a ``tinyflow.sketch.KLL()`` from values in a stream, or from
+    sketches if ``merge`` is set.
+    """
 
+    sketch = _sketch.KLL(k)
+    if valfunc is not None:
+        stream = _compat.map(valfunc, stream)
+    if merge:
+        for other in stream:
+            sketch.merge(other)
+    else:
+        for value in stream:
+            sketch.add(value)
+    return sketch
 
-class cat(Operation):
 
-    """Emit lines from a text file.  By default file must exist on disk, but
-    a custom ``opener`` could be used to read data from anywhere.
+class quantiles(Operation):
+
+    """Estimate quantiles of the values in the stream with a
+    ``tinyflow.sketch.KLL()`` and emit ``(quantile, value)`` tuples once the
+    stream is exhausted.  Memory use is bounded by ``k``.
+
+    Sketches are mergeable, so work can be spread across a pool by emitting
+    a sketch for every part of the input and merging them:
+
+        per_file = MapPipeline() \
+            | ops.cat() \
+            | ops.map(parse_latency) \
+            | ops.quantiles(emit_sketch=True)
+
+        Pipeline() \
+            | ops.map(per_file, pool='thread', flatten=True) \
+            | ops.quantiles([0.5, 0.9, 0.99], merge=True)
     """
 
-    def __init__(self, opener=codecs.open, **kwargs):
+    __slots__ = ('emit_sketch', 'k', 'merge', 'qs', 'valfunc')
+
+    checkpointable = False
+
+    def __init__(
+            self, qs=(0.5,), valfunc=None, k=200, merge=False,
+            emit_sketch=False):
 
         """
         Parameters
         ----------
-        opener : func, optional
-            Function to use for opening each file.
-        kwargs : **kwargs, optional
-            Additional keyword arguments for ``opener(**kwargs)``.
+        qs : iter, optional
+            Quantiles between 0 and 1.
+        valfunc : callable or None, optional
+            Extracts the value from every item.
+        k : int, optional
+            Accuracy parameter.  See ``tinyflow.sketch.KLL()``.
+        merge : bool, optional
+            Items are sketches to merge rather than values.
+        emit_sketch : bool, optional
+            Emit the sketch itself.
         """
 
-        self.opener = opener
-        self.kwargs = kwargs
+        self.qs = tuple(qs)
+        self.valfunc = valfunc
+        self.k = k
+        self.merge = merge
+        self.emit_sketch = emit_sketch
 
     def __call__(self, stream):
-        # Dots aren't free.
-        opener = self.opener
-        kwargs = self.kwargs
-        for url in stream:
-            with opener(url, **kwargs) as f:
-                for line in f:
-                    yield line
+        sketch = _kll(stream, self.valfunc, self.k, self.merge)
+        if self.emit_sketch:
+            yield sketch
+            return
+        for q, value in zip(self.qs, sketch.quantiles(self.qs)):
+            yield q, value
+
+
+class histogram(Operation):
+
+    """Estimate a histogram of the values in the stream with a
+    ``tinyflow.sketch.KLL()`` and emit ``(low, high, count)`` tuples once
+    the stream is exhausted.  Every bin includes ``low`` and excludes
+    ``high`` except for the last, which includes both.  Counts are
+    estimates with the same accuracy as ``quantiles()``, and sketches can be
+    merged in the same way.
+    """
 
+    __slots__ = ('bins', 'emit_sketch', 'k', 'merge', 'valfunc')
 
-class methodcaller(Operation):
+    checkpointable = False
 
-    """Maps ``operator.methodcaller()`` across the stream.  Analogous to:
+    def __init__(
+            self, bins=10, valfunc=None, k=200, merge=False,
+            emit_sketch=False):
 
-        tinyflow.ops.map(operator.methodcaller(<name>, *args, **kwargs))
-    """
+        """
+        Parameters
+        ----------
+        bins : int or list, optional
+            Number of equal width bins between the smallest and largest
+            values, or a sorted list of bin edges.
+        valfunc : callable or None, optional
+            Extracts the value from every item.
+        k : int, optional
+            Accuracy parameter.  See ``tinyflow.sketch.KLL()``.
+        merge : bool, optional
+            Items are sketches to merge rather than values.
+        emit_sketch : bool, optional
+            Emit the sketch itself.
+        """
 
-    def __init__(self, name, *args, **kwargs):
+        self.bins = bins
+        self.valfunc = valfunc
+        self.k = k
+        self.merge = merge
+        self.emit_sketch = emit_sketch
 
-        """See ``operator.methodcaller()``."""
+    def __call__(self, stream):
 
-        self.name = name
-        self.args = args
-        self.kwargs = kwargs
+        sketch = _kll(stream, self.valfunc, self.k, self.merge)
+        if self.emit_sketch:
+            yield sketch
+            return
+        elif not sketch.count:
+            return
+
+        if isinstance(self.bins, int):
+            low, high = sketch.min, sketch.max
+            if low == high:
+                yield low, high, sketch.count
+                return
+            width = (high - low) / float(self.bins)
+            edges = [low + i * width for i in _compat.range(self.bins)]
+            edges.append(high)
+        else:
+            edges = list(self.bins)
 
-    def __call__(self, stream):
-        return _compat.map(
-            op.methodcaller(self.name, *self.args, **self.kwargs), stream)
+        fractions = sketch.cdf(edges)
+        if edges[-1] >= sketch.max:
+            fractions[-1] = 1.0
+        counts = [int(round(f * sketch.count)) for f in fractions]
 
+        for idx in _compat.range(len(edges) - 1):
+            yield edges[idx], edges[idx + 1], counts[idx + 1] - counts[idx]
 
-class itemgetter(Operation):
 
-    """Wraps ``operator.itemgetter()``.  Analogous to:
+class partition_by(Operation):
 
-        tinyflow.ops.map(operator.itemgetter(<item>))
+    """Hash partition the stream by key and process every partition with
+    a sub-pipeline, possibly in a pool.  All items with the same key are
+    processed by the same sub-pipeline call, so per-key work like
+    sessionization or reducing can run in parallel:
+
+        count_words = Pipeline() \
+            | ops.reduce_by_key(operator.iadd, lambda x: x, lambda x: 1)
+
+        Pipeline() \
+            | ops.partition_by(lambda x: x, 8, count_words, pool='process')
+
+    The entire stream is partitioned before any partition is processed.
+    Outputs are emitted one partition at a time in partition order.
     """
 
-    def __init__(self, item, *items):
+    __slots__ = ('directory', 'keyfunc', 'n', 'pool', 'spill', 'sub_pipeline')
 
-        """See ``operator.itemgetter()``."""
+    checkpointable = False
 
-        self.item = item
-        self.items = items
+    def __init__(
+            self, keyfunc, n, pipeline, pool=None, spill=False,
+            directory=None):
+
+        """
+        Parameters
+        ----------
+        keyfunc : callable
+            Produces a hashable key for every item.
+        n : int
+            Number of partitions.
+        pipeline : tinyflow.Pipeline or callable
+            Called once per non-empty partition with an iterable of its
+            items and returns an iterable of outputs.  Must be picklable
+            when using a process pool.
+        pool : str or None, optional
+            Use 'thread' for thread pool or 'process' for process pool.
+            The corresponding pool must be passed to ``Pipeline.__call__()``
+            at the time of computation.  Outputs are materialized in the
+            worker.
+        spill : bool, optional
+            Hold partitions in ``tinyflow.binary.Spill()`` files rather
+            than in memory.  Process pool workers read their partition
+            directly from the file.
+        directory : str or None, optional
+            Where to create spill files.
+        """
+
+        if n < 1:
+            raise ValueError("'n' must be at least 1.")
+
+        self.keyfunc = keyfunc
+        self.n = n
+        self.sub_pipeline = pipeline
+        self.pool = pool
+        self.spill = spill
+        self.directory = directory
+
+    def _partition(self, stream):
+
+        """Split the stream into ``n`` buckets."""
+
+        keyfunc = self.keyfunc
+        n = self.n
+
+        if self.spill:
+            buckets = [
+                _binary.Spill(directory=self.directory)
+                for _ in _compat.range(n)]
+        else:
+            buckets = [[] for _ in _compat.range(n)]
+        appenders = [b.append for b in buckets]
+
+        try:
+            for item in stream:
+                appenders[hash(keyfunc(item)) % n](item)
+        except BaseException:
+            if self.spill:
+                for bucket in buckets:
+                    bucket.close()
+            raise
+
+        return buckets
 
     def __call__(self, stream):
-        return _compat.map(op.itemgetter(self.item, *self.items), stream)
+
+        if self.pool is None:
+            worker_pool = None
+        elif self.pool == 'thread':
+            worker_pool = self.pipeline.thread_pool
+        elif self.pool == 'process':
+            worker_pool = self.pipeline.process_pool
+        else:
+            raise ValueError("Invalid pool: {}".format(self.pool))
+
+        buckets = self._partition(stream)
+        futures = []
+        try:
+            if worker_pool is None:
+                for bucket in buckets:
+                    if len(bucket):
+                        for item in self.sub_pipeline(iter(bucket)):
+                            yield item
+                return
+
+            for bucket in buckets:
+                if not len(bucket):
+                    continue
+                elif self.spill:
+                    bucket.flush()
+                    futures.append(worker_pool.submit(
+                        _run_partition, self.sub_pipeline, path=bucket.path))
+                else:
+                    futures.append(worker_pool.submit(
+                        _run_partition, self.sub_pipeline, bucket))
+
+            # Release partitions held in memory as soon as they are shipped
+            if not self.spill:
+                del buckets[:]
+
+            for future in futures:
+                for item in future.result():
+                    yield item
+
+        finally:
+            for future in futures:
+                future.cancel()
+            if self.spill:
+                for bucket in buckets:
+                    bucket.close()
+
+
+def _run_partition(pipeline, items=None, path=None):
+
+    """Process a single partition for ``partition_by()`` in a worker.
+    Partitions are read from ``path`` if given.
+    """
+
+    if path is not None:
+        with open(path, 'rb') as f:
+            return list(pipeline(_binary.read(f)))
+    return list(pipeline(iter(items)))
+
+
+class join(Operation):
+
+    """Join items in the stream with items from another iterable by key and
+    emit ``(item, other)`` tuples.  For example, to enrich a stream of
+    orders with customer records:
+
+        Pipeline() \
+            | ops.join(
+                customers,
+                keyfunc=operator.itemgetter('customer_id'),
+                right_keyfunc=operator.itemgetter('id'))
+
+    Strategies:
+
+        hash: Read ``right`` into an index held in memory and probe it with
+            every item in the stream.  If ``right`` has more than
+            ``max_build`` items both sides are instead hash partitioned
+            into temporary files and each pair of partitions is joined in
+            memory, which changes the output order.
+        merge: Both the stream and ``right`` are sorted by key.  Only the
+            items from ``right`` with the current key are held in memory.
+        window: ``right`` is another stream.  Items are read from both
+            streams in turn and an item matches items from the other
+            stream that are among the most recent ``window`` items read
+            from that stream.  Only supports inner joins.
+    """
+
+    __slots__ = (
+        'directory', 'how', 'keyfunc', 'max_build', 'partitions', 'right',
+        'right_keyfunc', 'strategy', 'window')
+
+    checkpointable = False
+
+    def __init__(
+            self, right, keyfunc, right_keyfunc=None, how='inner',
+            strategy='hash', max_build=None, partitions=16,
+            directory=None, window=1000):
+
+        """
+        Parameters
+        ----------
+        right : iter
+            Items to join against.  Consumed every time the operation is
+            called, so pass a sequence if the pipeline runs more than once.
+        keyfunc : callable
+            Produces the join key for items in the stream.
+        right_keyfunc : callable or None, optional
+            Produces the join key for items in ``right``.  Defaults to
+            ``keyfunc``.
+        how : str, optional
+            Use 'inner' to only emit items with a match, or 'left' to also
+            emit ``(item, None)`` for items without a match.
+        strategy : str, optional
+            One of 'hash', 'merge', or 'window'.
+        max_build : int or None, optional
+            Maximum number of items from ``right`` to hold in memory for
+            a hash join before spilling to disk.
+        partitions : int, optional
+            Number of partitions to use when a hash join spills.
+        directory : str or None, optional
+            Where to create spill files.
+        window : int, optional
+            Number of recent items from each stream to hold for a window
+            join.
+        """
+
+        if how not in ('inner', 'left'):
+            raise ValueError("Invalid how: {}".format(how))
+        elif strategy not in ('hash', 'merge', 'window'):
+            raise ValueError("Invalid strategy: {}".format(strategy))
+        elif strategy == 'window' and how != 'inner':
+            raise ValueError("Window joins only support 'how=inner'.")
+
+        self.right = right
+        self.keyfunc = keyfunc
+        self.right_keyfunc = right_keyfunc or keyfunc
+        self.how = how
+        self.strategy = strategy
+        self.max_build = max_build
+        self.partitions = partitions
+        self.directory = directory
+        self.window = window
+
+    def _probe(self, stream, index):
+
+        # Dots aren't free.
+        keyfunc = self.keyfunc
+        get = index.get
+        left = self.how == 'left'
+
+        for item in stream:
+            matches = get(keyfunc(item))
+            if matches:
+                for match in matches:
+                    yield item, match
+            elif left:
+                yield item, None
+
+    def _hash_join(self, stream):
+
+        right = iter(self.right)
+        right_keyfunc = self.right_keyfunc
+        max_build = self.max_build
+
+        index = {}
+        size = 0
+        for item in right:
+            index.setdefault(right_keyfunc(item), []).append(item)
+            size += 1
+            if max_build is not None and size > max_build:
+                break
+        else:
+            for pair in self._probe(stream, index):
+                yield pair
+            return
+
+        # Too big for memory.  Partition both sides to disk.
+        n = self.partitions
+        left_spills = []
+        right_spills = []
+        try:
+            for _ in _compat.range(n):
+                left_spills.append(_binary.Spill(directory=self.directory))
+                right_spills.append(_binary.Spill(directory=self.directory))
+
+            for key, items in index.items():
+                right_spills[hash(key) % n].extend(items)
+            index = None
+            for item in right:
+                right_spills[hash(right_keyfunc(item)) % n].append(item)
+
+            keyfunc = self.keyfunc
+            for item in stream:
+                left_spills[hash(keyfunc(item)) % n].append(item)
+
+            for left_spill, right_spill in zip(left_spills, right_spills):
+                if not len(left_spill):
+                    continue
+                index = {}
+                for item in right_spill:
+                    index.setdefault(right_keyfunc(item), []).append(item)
+                for pair in self._probe(left_spill, index):
+                    yield pair
+
+        finally:
+            for spill in left_spills + right_spills:
+                spill.close()
+
+    def _merge_join(self, stream):
+
+        # Dots aren't free.
+        keyfunc = self.keyfunc
+        right_keyfunc = self.right_keyfunc
+        left = self.how == 'left'
+
+        right = iter(self.right)
+        nxt = next(right, tools.NULL)
+        group_key = tools.NULL
+        group = []
+
+        for item in stream:
+            key = keyfunc(item)
+            if group_key is tools.NULL or key != group_key:
+                while nxt is not tools.NULL and right_keyfunc(nxt) < key:
+                    nxt = next(right, tools.NULL)
+                group = []
+                while nxt is not tools.NULL and right_keyfunc(nxt) == key:
+                    group.append(nxt)
+                    nxt = next(right, tools.NULL)
+                group_key = key
+
+            if group:
+                for match in group:
+                    yield item, match
+            elif left:
+                yield item, None
+
+    def _window_join(self, stream):
+
+        window = self.window
+        keyfuncs = self.keyfunc, self.right_keyfunc
+        # Recent items and an index by key for each side
+        recent = deque(), deque()
+        indexes = {}, {}
+
+        streams = [(0, iter(stream)), (1, iter(self.right))]
+        while streams:
+            for entry in list(streams):
+                side, items = entry
+                item = next(items, tools.NULL)
+                if item is tools.NULL:
+                    streams.remove(entry)
+                    continue
+
+                key = keyfuncs[side](item)
+                for match in indexes[1 - side].get(key, ()):
+                    yield (item, match) if side == 0 else (match, item)
+
+                recent[side].append((key, item))
+                indexes[side].setdefault(key, deque()).append(item)
+                if len(recent[side]) > window:
+                    old, _ = recent[side].popleft()
+                    matches = indexes[side][old]
+                    matches.popleft()
+                    if not matches:
+                        del indexes[side][old]
+
+    def __call__(self, stream):
+        if self.strategy == 'hash':
+            return self._hash_join(stream)
+        elif self.strategy == 'merge':
+            return self._merge_join(stream)
+        else:
+            return self._window_join(stream)
+
+
+class distinct(Operation):
+
+    """Emit the first item for every key and drop the rest.
+
+    Modes:
+
+        exact: Remember every key in a ``set()``.  With ``max_keys``, once
+            the set is full the remainder of the stream and the keys seen
+            so far are hash partitioned into temporary files and each
+            partition is deduplicated separately.  Items from the
+            remainder of the stream are then emitted in partition order.
+        bloom: Remember keys in a ``tinyflow.sketch.BloomFilter()`` sized
+            for ``capacity`` keys.  Memory use is fixed, but roughly
+            ``error_rate`` of the unique items are dropped as duplicates.
+
+    See ``count_distinct()`` for counting rather than deduplicating.
+    """
+
+    __slots__ = (
+        'capacity', 'digest', 'directory', 'error_rate', 'keyfunc', 'max_keys',
+        'mode', 'partitions')
+
+    checkpointable = False
+
+    def __init__(
+            self, keyfunc=None, mode='exact', digest=False, max_keys=None,
+            partitions=16, directory=None, capacity=10 ** 6,
+            error_rate=0.001):
+
+        """
+        Parameters
+        ----------
+        keyfunc : callable or None, optional
+            Produces the key for an item.  The item itself by default.
+        mode : str, optional
+            Either 'exact' or 'bloom'.
+        digest : bool, optional
+            In exact mode, remember a 64 bit ``tinyflow.sketch.hash64()``
+            of every key rather than the key itself, which is much smaller
+            for long keys.  The chance of a collision dropping an item is
+            negligible below billions of keys.
+        max_keys : int or None, optional
+            In exact mode, the most keys to hold in memory before spilling
+            to disk.
+        partitions : int, optional
+            Number of partitions to use when spilling.
+        directory : str or None, optional
+            Where to create spill files.
+        capacity : int, optional
+            Expected number of distinct keys in bloom mode.
+        error_rate : float, optional
+            Acceptable rate of unique items dropped in bloom mode.
+        """
+
+        if mode not in ('exact', 'bloom'):
+            raise ValueError("Invalid mode: {}".format(mode))
+
+        self.keyfunc = keyfunc
+        self.mode = mode
+        self.digest = digest
+        self.max_keys = max_keys
+        self.partitions = partitions
+        self.directory = directory
+        self.capacity = capacity
+        self.error_rate = error_rate
+
+    def _keys(self, stream):
+
+        """Produce ``(key, item)`` pairs."""
+
+        keyfunc = self.keyfunc
+        digest = self.digest and self.mode == 'exact'
+        hash64 = _sketch.hash64
+
+        for item in stream:
+            key = item if keyfunc is None else keyfunc(item)
+            yield (hash64(key) if digest else key), item
+
+    def _bloom(self, stream):
+        add = _sketch.BloomFilter(self.capacity, self.error_rate).add
+        for key, item in self._keys(stream):
+            if not add(key):
+                yield item
+
+    def _exact(self, stream):
+
+        max_keys = self.max_keys
+        seen = set()
+        add = seen.add
+
+        pairs = self._keys(stream)
+        for key, item in pairs:
+            if key in seen:
+                continue
+            elif max_keys is not None and len(seen) >= max_keys:
+                pairs = it.chain([(key, item)], pairs)
+                break
+            add(key)
+            yield item
+        else:
+            return
+
+        # Out of memory.  Partition the remaining items and known keys.
+        n = self.partitions
+        key_spills = []
+        item_spills = []
+        try:
+            for _ in _compat.range(n):
+                key_spills.append(_binary.Spill(directory=self.directory))
+                item_spills.append(_binary.Spill(directory=self.directory))
+
+            for key in seen:
+                key_spills[hash(key) % n].append(key)
+            seen = None
+            for key, item in pairs:
+                item_spills[hash(key) % n].append((key, item))
+
+            for key_spill, item_spill in zip(key_spills, item_spills):
+                seen = set(key_spill)
+                key_spill.close()
+                for key, item in item_spill:
+                    if key not in seen:
+                        seen.add(key)
+                        yield item
+                item_spill.close()
+
+        finally:
+            for spill in key_spills + item_spills:
+                spill.close()
+
+    def __call__(self, stream):
+        if self.mode == 'bloom':
+            return self._bloom(stream)
+        return self._exact(stream)
+
+
+class count_distinct(Operation):
+
+    """Estimate the number of distinct keys in the stream with a
+    ``tinyflow.sketch.HyperLogLog()`` and emit the count once the stream
+    is exhausted.  Memory use is fixed at ``2 ** precision`` bytes.
+    """
+
+    __slots__ = ('emit_sketch', 'keyfunc', 'precision')
+
+    checkpointable = False
+
+    def __init__(self, keyfunc=None, precision=14, emit_sketch=False):
+
+        """
+        Parameters
+        ----------
+        keyfunc : callable or None, optional
+            Produces the key for an item.  The item itself by default.
+        precision : int, optional
+            See ``tinyflow.sketch.HyperLogLog()``.
+        emit_sketch : bool, optional
+            Emit the sketch itself rather than the count, so sketches
+            from multiple pipelines can be merged.
+        """
+
+        self.keyfunc = keyfunc
+        self.precision = precision
+        self.emit_sketch = emit_sketch
+
+    def __call__(self, stream):
+        sketch = _sketch.HyperLogLog(self.precision)
+        if self.keyfunc is not None:
+            stream = _compat.map(self.keyfunc, stream)
+        for key in stream:
+            sketch.add(key)
+        yield sketch if self.emit_sketch else len(sketch)
+
+
+class chunk(Operation):
+
+    """Group elements in the stream into tuples, each with at most N items.
+
+    Numeric streams can instead be collected into buffers, which avoids
+    allocating a tuple and holding a reference to every item:
+
+        Pipeline() | ops.chunk(10000, typecode='d') | ops.map(sum)
+
+    Each chunk is then a read-only ``memoryview()`` of an ``array.array()``,
+    or with ``dtype`` a read-only NumPy array.
+    """
+
+    __slots__ = ('dtype', 'size', 'typecode')
+
+    checkpointable = False
+
+    def __init__(self, size, typecode=None, dtype=None):
+
+        """
+        Parameters
+        ----------
+        size : int
+            Maximum number of items to group together.
+        typecode : str or None, optional
+            Collect items into an ``array.array()`` with this type code.
+            See ``tinyflow.tools.slicer()``.
+        dtype : str or numpy.dtype or None, optional
+            Collect items into a NumPy array with this dtype.
+        """
+
+        if typecode is not None and dtype is not None:
+            raise ValueError("Cannot use both 'typecode' and 'dtype'.")
+
+        self.size = size
+        self.typecode = typecode
+        self.dtype = dtype
+
+    def __call__(self, stream):
+        return tools.slicer(
+            stream, self.size, typecode=self.typecode, dtype=self.dtype)
+
+
+class cat(Operation):
+
+    """Emit lines from a text file.  By default file must exist on disk, but
+    a custom ``opener`` could be used to read data from anywhere.
+
+    Items can also be ``tinyflow.index.LineRange()``'s, in which case only
+    the requested lines are read.  The file is positioned with a
+    ``tinyflow.index.LineIndex()``, which is built on first use and stored
+    next to the file.
+
+    With ``blocksize`` large blocks of text containing many complete lines
+    are emitted instead of individual lines, which is much faster when
+    the next operation can handle blocks, like ``tokenize()``.
+    """
+
+    __slots__ = ('blocksize', 'kwargs', 'opener')
+
+    def __init__(self, opener=codecs.open, blocksize=None, **kwargs):
+
+        """
+        Parameters
+        ----------
+        opener : func, optional
+            Function to use for opening each file.
+        blocksize : int or None, optional
+            Emit blocks of roughly this many characters.  Blocks always end
+            at the end of a line.  Requires an ``opener`` producing text.
+        kwargs : **kwargs, optional
+            Additional keyword arguments for ``opener(**kwargs)``.
+        """
+
+        self.opener = opener
+        self.blocksize = blocksize
+        self.kwargs = kwargs
+
+    def __call__(self, stream):
+        # Dots aren't free.
+        opener = self.opener
+        kwargs = self.kwargs
+        blocksize = self.blocksize
+        for url in stream:
+            if isinstance(url, _index.LineRange):
+                for line in self._read_range(url):
+                    yield line
+            else:
+                with opener(url, **kwargs) as f:
+                    lines = f if blocksize is None else self._blocks(f)
+                    for line in lines:
+                        yield line
+
+    def _check_text(self, value):
+        # Python 2 byte strings are text
+        if not isinstance(value, _compat.string_types):
+            raise TypeError(
+                "'blocksize' requires an opener producing text, not "
+                "{}.".format(type(value).__name__))
+
+    def _blocks(self, f):
+        blocksize = self.blocksize
+        check = True
+        while True:
+            block = f.read(blocksize)
+            if not block:
+                return
+            if check:
+                self._check_text(block)
+                check = False
+            # Finish the last line
+            if not block.endswith('\n'):
+                block += f.readline()
+            yield block
+
+    def _read_range(self, line_range):
+        path, start, stop = line_range
+        index = _index.line_index(path)
+        with self.opener(path, **self.kwargs) as f:
+            index.seek(f, start)
+            count = None if stop is None else max(stop - start, 0)
+            lines = it.islice(f, count)
+            if self.blocksize is None:
+                for line in lines:
+                    yield line
+                return
+            # Lines are counted so blocks are assembled line by line
+            block = []
+            size = 0
+            for line in lines:
+                if not block:
+                    self._check_text(line)
+                block.append(line)
+                size += len(line)
+                if size >= self.blocksize:
+                    yield ''.join(block)
+                    block = []
+                    size = 0
+            if block:
+                yield ''.join(block)
+
+
+class tokenize(Operation):
+
+    """Split text into tokens with a regular expression and emit every
+    token.  Works on individual lines but is fastest on large blocks of
+    text, like those produced by ``cat(blocksize=...)``, since case folding
+    and matching happen once per block and no intermediate list is created
+    for every line.  A word count is then:
+
+        Pipeline() \
+            | ops.cat(blocksize=2 ** 20) \
+            | ops.tokenize(casefold=True) \
+            | ops.counter()
+
+    which is faster than, and for most text produces the same counts as:
+
+        Pipeline() \
+            | ops.cat() \
+            | ops.methodcaller('lower') \
+            | ops.methodcaller('split') \
+            | ops.filter() \
+            | ops.flatten() \
+            | ops.counter()
+
+    The differences are:
+
+        casefold: ``str.casefold()`` is more aggressive than
+            ``str.lower()``, so the German sharp s becomes 'ss' and
+            'Strasse' and its spelling with a sharp s are counted as one
+            word.  Use ``ops.methodcaller('lower')`` before ``tokenize()``
+            for the exact behavior of the chain.
+        pattern: A regular expression, like ``r'\\w+'``, splits on
+            punctuation as well as whitespace, so 'end.' produces 'end'
+            rather than 'end.'.  Without a pattern text is split with
+            ``str.split()`` like the chain.
+    """
+
+    __slots__ = ('batch', 'casefold', 'flags', 'pattern', 'regex', 'stopwords')
+
+    def __init__(
+            self, pattern=None, flags=0, casefold=False, stopwords=None,
+            batch=False):
+
+        """
+        Parameters
+        ----------
+        pattern : str or compiled regex or None, optional
+            Every match is a token.  If the pattern has a group only the
+            group is emitted.  By default text is split on whitespace with
+            ``str.split()``, which is faster than the equivalent ``\\S+``.
+        flags : int, optional
+            Flags for ``re.compile()``.
+        casefold : bool, optional
+            Fold text to lower case before matching.  Uses
+            ``str.casefold()`` where available.
+        stopwords : iter or None, optional
+            Discard these tokens.  Compared after case folding.
+        batch : bool, optional
+            Emit one list of tokens per input item rather than individual
+            tokens.
+        """
+
+        self.pattern = pattern
+        self.flags = flags
+        self.casefold = casefold
+        self.stopwords = None if stopwords is None else frozenset(stopwords)
+        self.batch = batch
+        self.regex = None if pattern is None else re.compile(pattern, flags)
+
+    def __call__(self, stream):
+
+        # Method callers rather than unbound methods so Python 2 byte
+        # strings work too.
+        if self.casefold:
+            fold = 'casefold' if hasattr(str, 'casefold') else 'lower'
+            stream = _compat.map(op.methodcaller(fold), stream)
+
+        if self.regex is None:
+            batches = _compat.map(op.methodcaller('split'), stream)
+        else:
+            batches = _compat.map(self.regex.findall, stream)
+        if self.stopwords is not None:
+            contains = self.stopwords.__contains__
+            batches = (
+                list(_compat.filterfalse(contains, b)) for b in batches)
+
+        if self.batch:
+            return batches
+        return it.chain.from_iterable(batches)
+
+
+def _parse_blocks(operation, blocks, func, kwargs):
+
+    """Parse blocks with ``func(block, **kwargs)``, which returns a list,
+    in the pool requested by ``operation``, keeping at most
+    ``operation.prefetch`` blocks in flight, and emit the parsed records in
+    order.
+    """
+
+    if operation.pool is None:
+        worker_pool = None
+    elif operation.pool == 'thread':
+        worker_pool = operation.pipeline.thread_pool
+    elif operation.pool == 'process':
+        worker_pool = operation.pipeline.process_pool
+    else:
+        raise ValueError("Invalid pool: {}".format(operation.pool))
+
+    if worker_pool is None:
+        for block in blocks:
+            for record in func(block, **kwargs):
+                yield record
+        return
+
+    futures = deque()
+    try:
+        for block in blocks:
+            futures.append(worker_pool.submit(func, block, **kwargs))
+            if len(futures) >= operation.prefetch:
+                for record in futures.popleft().result():
+                    yield record
+        while futures:
+            for record in futures.popleft().result():
+                yield record
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+class read_jsonl(Operation):
+
+    """Emit records from newline delimited JSON files.  Files are read in
+    large blocks of raw bytes and each block is parsed at once, optionally
+    in a pool.  Only the raw block is sent to a worker, and only the
+    projected records are sent back:
+
+        Pipeline() \
+            | ops.read_jsonl(
+                fields=['user', 'latency'], output='tuple', pool='process')
+
+    See ``tinyflow.source`` for a description of the output shapes.
+    """
+
+    __slots__ = (
+        'blocksize', 'encoding', 'fields', 'opener', 'output', 'pool',
+        'prefetch')
+
+    def __init__(
+            self, fields=None, output='dict', pool=None, blocksize=2 ** 20,
+            prefetch=8, encoding='utf-8', opener=open):
+
+        """
+        Parameters
+        ----------
+        fields : list or None, optional
+            Only keep these keys.  Required unless ``output`` is 'dict'.
+        output : str, optional
+            One of 'dict', 'tuple', or 'columns'.  With 'columns' one
+            dictionary of lists is emitted per block.
+        pool : str or None, optional
+            Use 'thread' for thread pool or 'process' for process pool.
+            The corresponding pool must be passed to ``Pipeline.__call__()``
+            at the time of computation.
+        blocksize : int, optional
+            Parse roughly this many bytes at a time.
+        prefetch : int, optional
+            Maximum number of blocks being parsed by the pool at once.
+        encoding : str, optional
+            Text encoding.
+        opener : func, optional
+            Function to use for opening each file in binary mode.
+        """
+
+        if output not in _source.OUTPUTS:
+            raise ValueError("Invalid output: {}".format(output))
+        elif fields is None and output != 'dict':
+            raise ValueError("'fields' is required for {!r}.".format(output))
+
+        self.fields = None if fields is None else list(fields)
+        self.output = output
+        self.pool = pool
+        self.blocksize = blocksize
+        self.prefetch = prefetch
+        self.encoding = encoding
+        self.opener = opener
+
+    @property
+    def checkpointable(self):
+        # Blocks in flight in a pool are not part of the state
+        return self.pool is None
+
+    def _blocks(self, stream):
+        for path in stream:
+            with self.opener(path, 'rb') as f:
+                for block in _source.read_blocks(f, self.blocksize):
+                    yield block
+
+    def __call__(self, stream):
+        return _parse_blocks(self, self._blocks(stream), _source.parse_jsonl, {
+            'fields': self.fields,
+            'output': self.output,
+            'encoding': self.encoding})
+
+
+class read_csv(Operation):
+
+    """Emit records from CSV files.  Parsed in blocks like
+    ``read_jsonl()``.  Only the requested columns are extracted, and values
+    are strings.
+    """
+
+    __slots__ = (
+        'blocksize', 'dialect', 'encoding', 'fields', 'header', 'opener',
+        'output', 'pool', 'prefetch')
+
+    def __init__(
+            self, fields=None, output='dict', header=True, pool=None,
+            blocksize=2 ** 20, prefetch=8, encoding='utf-8',
+            dialect='excel', opener=open):
+
+        """
+        Parameters
+        ----------
+        fields : list or None, optional
+            Names of the columns to keep, or column indexes if there is no
+            header.  Defaults to every column in the header.
+        output : str, optional
+            One of 'dict', 'tuple', or 'columns'.
+        header : bool, optional
+            The first row of every file contains column names.  Without a
+            header, ``fields`` is required and fields are named by their
+            index.
+        pool : str or None, optional
+            See ``read_jsonl()``.
+        blocksize : int, optional
+            Parse roughly this many bytes at a time.
+        prefetch : int, optional
+            Maximum number of blocks being parsed by the pool at once.
+        encoding : str, optional
+            Text encoding.
+        dialect : str or csv.Dialect, optional
+            See ``csv.reader()``.
+        opener : func, optional
+            Function to use for opening each file in binary mode.
+        """
+
+        if output not in _source.OUTPUTS:
+            raise ValueError("Invalid output: {}".format(output))
+        elif not header and fields is None:
+            raise ValueError("'fields' is required without a header.")
+
+        self.fields = None if fields is None else list(fields)
+        self.output = output
+        self.header = header
+        self.pool = pool
+        self.blocksize = blocksize
+        self.prefetch = prefetch
+        self.encoding = encoding
+        self.dialect = dialect
+        self.opener = opener
+
+    @property
+    def checkpointable(self):
+        # Blocks in flight in a pool are not part of the state
+        return self.pool is None
+
+    def _blocks(self, stream):
+
+        """Produce ``(block, fields, indexes)`` for every block."""
+
+        quote = _source.quotechar(self.dialect, self.encoding)
+        for path in stream:
+            with self.opener(path, 'rb') as f:
+                if self.header:
+                    names = _source.read_header(
+                        f, encoding=self.encoding, dialect=self.dialect)
+                    fields = names if self.fields is None else self.fields
+                    try:
+                        indexes = [names.index(n) for n in fields]
+                    except ValueError:
+                        raise ValueError(
+                            "{} is missing one of: {}".format(path, fields))
+                else:
+                    fields = indexes = self.fields
+                for block in _source.read_blocks(f, self.blocksize, quote):
+                    yield block, fields, indexes
+
+    def __call__(self, stream):
+        return _parse_blocks(self, self._blocks(stream), _parse_csv_block, {
+            'output': self.output,
+            'encoding': self.encoding,
+            'dialect': self.dialect})
+
+
+def _parse_csv_block(args, **kwargs):
+    block, fields, indexes = args
+    return _source.parse_csv(block, fields, indexes, **kwargs)
+
+
+class split_lines(Operation):
+
+    """Split every file in the stream into ``tinyflow.index.LineRange()``'s
+    containing roughly the same number of bytes, which can be read by
+    ``cat()``.  Useful for spreading large files across a pool:
+
+        Pipeline() \
+            | ops.split_lines(8) \
+            | ops.map(wordcount, pool='thread')
+
+    When file sizes are skewed, splitting every file into ranges of a fixed
+    ``size`` produces many small tasks, so a worker that is done picks up
+    the next pending range instead of waiting on a worker that is stuck
+    with a large file.  With ``largest_first`` the largest ranges are
+    submitted first so small ranges fill in the gaps at the end:
+
+        Pipeline() \
+            | ops.split_lines(size=2 ** 24, largest_first=True) \
+            | ops.map(wordcount, pool='thread')
+
+    Files are indexed with ``tinyflow.index.line_index()``.
+    """
+
+    __slots__ = ('count', 'largest_first', 'size', 'stride')
+
+    def __init__(self, count=None, stride=None, size=None,
+                 largest_first=False):
+
+        """
+        Parameters
+        ----------
+        count : int or None, optional
+            Split each file into this many ranges.  Small files may produce
+            fewer.
+        stride : int or None, optional
+            See ``tinyflow.index.line_index()``.
+        size : int or None, optional
+            Split each file into ranges of roughly this many bytes instead
+            of a fixed number of ranges.  Ranges cannot be smaller than
+            ``stride`` lines.
+        largest_first : bool, optional
+            Index every file in the stream before producing any ranges and
+            produce them in order of decreasing size.
+        """
+
+        if (count is None) == (size is None):
+            raise ValueError("Need exactly one of 'count' or 'size'.")
+
+        self.count = count
+        self.stride = stride
+        self.size = size
+        self.largest_first = largest_first
+
+    @property
+    def checkpointable(self):
+        # Ranges are held until every file has been indexed
+        return not self.largest_first
+
+    def __call__(self, stream):
+
+        if not self.largest_first:
+            for path in stream:
+                index = _index.line_index(path, stride=self.stride)
+                for line_range in index.split(self.count, self.size):
+                    yield line_range
+            return
+
+        ranges = []
+        for path in stream:
+            index = _index.line_index(path, stride=self.stride)
+            ranges.extend(
+                (index.nbytes(r), r)
+                for r in index.split(self.count, self.size))
+        ranges.sort(key=op.itemgetter(0), reverse=True)
+        for _, line_range in ranges:
+            yield line_range
+
+
+class throttle(Operation):
+
+    """Pass items downstream at a limited rate with a token bucket.  Useful
+    in front of an operation calling a service that slows down when
+    overloaded:
+
+        Pipeline() \
+            | ops.throttle(100, burst=0.1) \
+            | ops.map(fetch)
+
+    To limit a pooled ``map()`` use its ``rate_limit`` parameter instead, so
+    waiting does not block collecting results.
+    """
+
+    __slots__ = ('limit',)
+
+    def __init__(self, rate=None, byte_rate=None, burst=1.0, sizefunc=len):
+
+        """See ``tinyflow.concurrency.RateLimit()``."""
+
+        self.limit = _concurrency.RateLimit(
+            rate, byte_rate=byte_rate, burst=burst, sizefunc=sizefunc)
+
+    def __call__(self, stream):
+        acquire = self.limit.acquire
+        for item in stream:
+            acquire(item)
+            yield item
+
+
+class methodcaller(Operation):
+
+    """Maps ``operator.methodcaller()`` across the stream.  Analogous to:
+
+        tinyflow.ops.map(operator.methodcaller(<name>, *args, **kwargs))
+    """
+
+    __slots__ = ('args', 'kwargs', 'name')
+
+    def __init__(self, name, *args, **kwargs):
+
+        """See ``operator.methodcaller()``."""
+
+        self.name = name
+        self.args = args
+        self.kwargs = kwargs
+
+    def __call__(self, stream):
+        return _compat.map(
+            op.methodcaller(self.name, *self.args, **self.kwargs), stream)
+
+
+class itemgetter(Operation):
+
+    """Wraps ``operator.itemgetter()``.  Analogous to:
+
+        tinyflow.ops.map(operator.itemgetter(<item>))
+    """
+
+    __slots__ = ('item', 'items')
+
+    def __init__(self, item, *items):
+
+        """See ``operator.itemgetter()``."""
+
+        self.item = item
+        self.items = items
+
+    def __call__(self, stream):
+        return _compat.map(op.itemgetter(self.item, *self.items), stream)
+
+
+class cache(map):
+
+    """Like ``tinyflow.ops.map()`` but results are stored in an on-disk
+    cache and only computed for items that have not been seen before.
+    Intended for mapping expensive functions or ``tinyflow.MapPipeline()``'s
+    across inputs that rarely change:
+
+        Pipeline() \
+            | ops.cache(wordcount, '.tinyflow-cache', pool='thread') \
+            | ops.flatten()
+
+    Items are keyed by their value, a fingerprint of ``func``, and the
+    size and modification time of the item if it is a path to a file.
+    Results that are iterators are materialized into a list.  See
+    ``tinyflow.cache`` for more information.
+    """
+
+    __slots__ = ('store',)
+
+    def __init__(self, func, directory, max_bytes=None, max_entries=None,
+                 version=None, pool=None):
+
+        """
+        Parameters
+        ----------
+        func : callable
+            Function or pipeline taking a single argument.
+        directory : str
+            Store cached results in this directory.
+        max_bytes : int or None, optional
+            Evict least recently used results when the cache grows beyond
+            this size.
+        max_entries : int or None, optional
+            Evict least recently used results when the cache holds more than
+            this many entries.
+        version : str or None, optional
+            Change to invalidate all cached results for ``func``.
+        pool : str, optional
+            See ``tinyflow.ops.map()``.
+        """
+
+        self.store = _cache.DiskCache(
+            directory, max_bytes=max_bytes, max_entries=max_entries)
+        super(cache, self).__init__(
+            _cache.CachedCall(
+                func, self.store, version=version, report_hits=True,
+                evict=pool != 'process'),
+            pool=pool)
+
+    def __call__(self, stream):
+        return self._count(super(cache, self).__call__(stream))
+
+    def _count(self, results):
+
+        """Count hits and misses reported by workers, which may hold a copy
+        of the store, and enforce the store's limits after a run in a
+        process pool.
+        """
+
+        store = self.store
+        try:
+            for hit, value in results:
+                if hit:
+                    store.hits += 1
+                else:
+                    store.misses += 1
+                yield value
+        finally:
+            close = getattr(results, 'close', None)
+            if close is not None:
+                close()
+            if self.pool == 'process':
+                store.trim()
+
+
+class pack(Operation):
+
+    """Encode batches of records from the stream into frames of the compact
+    binary format described in ``tinyflow.binary``.  Emits one ``bytes``
+    object per batch, which is much cheaper to ship to another process than
+    individual records.  Reverse with ``unpack()``.
+    """
+
+    __slots__ = ('batchsize', 'compress', 'level')
+
+    checkpointable = False
+
+    def __init__(self, batchsize=4096, compress=False, level=6):
+
+        """
+        Parameters
+        ----------
+        batchsize : int, optional
+            Number of records per frame.
+        compress : bool, optional
+            Compress frames with ``zlib``.
+        level : int, optional
+            Compression level.
+        """
+
+        self.batchsize = batchsize
+        self.compress = compress
+        self.level = level
+
+    def __call__(self, stream):
+        for batch in tools.slicer(stream, self.batchsize):
+            yield _binary.dumps(
+                batch, compress=self.compress, level=self.level)
+
+
+class unpack(Operation):
+
+    """Decode frames produced by ``pack()`` and emit their records."""
+
+    __slots__ = ()
+
+    def __call__(self, stream):
+        return it.chain.from_iterable(_compat.map(_binary.loads, stream))
+
+
+class read_binary(Operation):
+
+    """Emit records from files written with ``tinyflow.binary.write()``."""
+
+    __slots__ = ('opener',)
+
+    def __init__(self, opener=open):
+
+        """
+        Parameters
+        ----------
+        opener : func, optional
+            Function to use for opening each file in binary mode.
+        """
+
+        self.opener = opener
+
+    def __call__(self, stream):
+        opener = self.opener
+        for path in stream:
+            with opener(path, 'rb') as f:
+                for record in _binary.read(f):
+                    yield record
+
+
+class write_lines(Operation):
+
+    """Write lines of text to one or more files and emit a
+    ``tinyflow.sink.Written()`` for every file.  Lines are buffered and
+    written in large blocks.  Keyword arguments control partitioning,
+    rotation, and background writes:
+
+        Pipeline() \
+            | ops.write_lines(
+                'out/{key}-{part}.txt', keyfunc=len, max_records=10000)
+    """
+
+    __slots__ = ('encoding', 'kwargs', 'newline', 'path')
+
+    checkpointable = False
+
+    def __init__(self, path, newline='\n', encoding='utf-8', **kwargs):
+
+        """
+        Parameters
+        ----------
+        path : str
+            Output file or template.  See ``tinyflow.sink.Writer()``.
+        newline : str, optional
+            Appended to every line.  Use ``''`` for lines that already end
+            with a newline, like those emitted by ``cat()``.
+        encoding : str, optional
+            Text encoding.
+        kwargs : **kwargs, optional
+            Additional keyword arguments for ``tinyflow.sink.Writer()``.
+        """
+
+        self.path = path
+        self.newline = newline
+        self.encoding = encoding
+        self.kwargs = kwargs
+
+    def __call__(self, stream):
+        encoder = _sink.LineEncoder(self.newline, self.encoding)
+        return _sink.Writer(self.path, encoder, **self.kwargs).write(stream)
+
+
+class write_csv(Operation):
+
+    """Write rows to one or more CSV files and emit a
+    ``tinyflow.sink.Written()`` for every file.  Rows are sequences, or
+    dictionaries when ``fieldnames`` is given.
+    """
+
+    __slots__ = ('dialect', 'encoding', 'fieldnames', 'kwargs', 'path')
+
+    checkpointable = False
+
+    def __init__(
+            self, path, fieldnames=None, encoding='utf-8', dialect='excel',
+            **kwargs):
+
+        """
+        Parameters
+        ----------
+        path : str
+            Output file or template.  See ``tinyflow.sink.Writer()``.
+        fieldnames : list or None, optional
+            Write a header row at the start of every file.
+        encoding : str, optional
+            Text encoding.
+        dialect : str or csv.Dialect, optional
+            See ``csv.writer()``.
+        kwargs : **kwargs, optional
+            Additional keyword arguments for ``tinyflow.sink.Writer()``.
+        """
+
+        self.path = path
+        self.fieldnames = fieldnames
+        self.encoding = encoding
+        self.dialect = dialect
+        self.kwargs = kwargs
+
+    def __call__(self, stream):
+        encoder = _sink.CSVEncoder(
+            self.fieldnames, encoding=self.encoding, dialect=self.dialect)
+        return _sink.Writer(self.path, encoder, **self.kwargs).write(stream)
+
+
+class write_jsonl(Operation):
+
+    """Write records to one or more newline delimited JSON files and emit a
+    ``tinyflow.sink.Written()`` for every file.
+    """
+
+    __slots__ = ('encoding', 'kwargs', 'path')
+
+    checkpointable = False
+
+    def __init__(self, path, encoding='utf-8', **kwargs):
+
+        """
+        Parameters
+        ----------
+        path : str
+            Output file or template.  See ``tinyflow.sink.Writer()``.
+        encoding : str, optional
+            Text encoding.
+        kwargs : **kwargs, optional
+            Additional keyword arguments for ``tinyflow.sink.Writer()``.
+        """
+
+        self.path = path
+        self.encoding = encoding
+        self.kwargs = kwargs
+
+    def __call__(self, stream):
+        encoder = _sink.JSONLinesEncoder(encoding=self.encoding)
+        return _sink.Writer(self.path, encoder, **self.kwargs).write(stream)
+
+
+class write_binary(Operation):
+
+    """Write records to one or more files in the format described in
+    ``tinyflow.binary`` and emit a ``tinyflow.sink.Written()`` for every
+    file.  Every batch is a single frame.  Read with ``read_binary()``.
+    """
+
+    __slots__ = ('compress', 'kwargs', 'level', 'path')
+
+    checkpointable = False
+
+    def __init__(self, path, compress=False, level=6, **kwargs):
+
+        """
+        Parameters
+        ----------
+        path : str
+            Output file or template.  See ``tinyflow.sink.Writer()``.
+        compress : bool, optional
+            Compress frames with ``zlib``.
+        level : int, optional
+            Compression level.
+        kwargs : **kwargs, optional
+            Additional keyword arguments for ``tinyflow.sink.Writer()``.
+        """
+
+        self.path = path
+        self.compress = compress
+        self.level = level
+        self.kwargs = kwargs
+
+    def __call__(self, stream):
+        encoder = _sink.BinaryEncoder(compress=self.compress, level=self.level)
+        return _sink.Writer(self.path, encoder, **self.kwargs).write(stream)
@@ -37,16 +37,63 @@ consuming a very small amount of memory:
     with ThreadPoolExecutor(4) as threads:
         for item in pipeline(infiles, thread_pool=threads):
             print(item)
+
+Pipelines can also own their pools, which are created when an operation
+first needs one and reused by every run until the pipeline is shut down:
+
+    with Pipeline(threads=4) as pipeline:
+        pipeline |= ops.map(wordcount, pool='thread')
+        for item in pipeline(infiles):
+            print(item)
 """
 
 
-from .exceptions import NoPool, NotAnOperation
+import copy
+import importlib
+import threading
+import types
+
+from . import _compat
+from .exceptions import NoPool, NotAnOperation, NotCheckpointable
 from .ops import Operation
+from .plan import Plan
 
 
 __all__ = ['MapPipeline', 'Pipeline']
 
 
+# Guards lazily creating pools
+_POOL_LOCK = threading.Lock()
+
+
+def _initialize_worker(imports, initializer, initargs):
+
+    """Runs once in every worker process of a pool owned by a pipeline."""
+
+    for name in imports:
+        importlib.import_module(name)
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def _noop():
+    pass
+
+
+def _uncheckpointable(operations):
+
+    """Find operations, including those in sub-pipelines, that cannot be
+    checkpointed.
+    """
+
+    for op in operations:
+        if isinstance(op, Pipeline):
+            for o in _uncheckpointable(op.operations):
+                yield o
+        elif not getattr(op, 'checkpointable', True):
+            yield op
+
+
 class Pipeline(object):
 
     """A ``tinyflow`` pipeline model.  Subclass to attach your own custom
@@ -82,21 +129,65 @@ class Pipeline(object):
     operations : tuple
         Instances of ``tinyflow.ops.Operation()`` that will be used to process
         data.
-    thread_pool : concurrent.futures.ThreadPoolExecutor or None
-        Will be ``None`` unless a thread pool was passed to
-        ``Pipeline.__call__()``.
-    process_pool : concurrent.futures.ProcessPoolExecutor or None
-        Will be ``None`` unless a process pool was passed to
-        ``Pipeline.__call__()``.
+    thread_pool : concurrent.futures.ThreadPoolExecutor
+        The thread pool passed to ``Pipeline.__call__()``, or the pool owned
+        by the pipeline.  Raises ``tinyflow.exceptions.NoPool`` if neither
+        exists.
+    process_pool : concurrent.futures.ProcessPoolExecutor
+        Like ``thread_pool`` but for processes.
     """
 
+    def __init__(
+            self, threads=None, processes=None, initializer=None,
+            initargs=(), imports=()):
+
+        """Pools are optional.  Without them, pools must be passed to
+        ``Pipeline.__call__()`` if an operation needs one.  Pools passed
+        to ``Pipeline.__call__()`` take precedence.
+
+        Owned pools are created the first time an operation needs one and
+        stay warm between runs.  Shut them down with ``shutdown()`` or by
+        using the pipeline as a context manager.
+
+        Parameters
+        ----------
+        threads : int or bool or None, optional
+            Own a thread pool with this many workers.  ``True`` uses the
+            ``concurrent.futures`` default.
+        processes : int or bool or None, optional
+            Own a process pool with this many workers.  ``True`` uses one
+            worker per CPU.
+        initializer : callable or None, optional
+            Called with ``initargs`` once in every worker process when it
+            starts, like to load a model.  Must be picklable.  Requires
+            Python 3.7 or newer.
+        initargs : tuple, optional
+            Arguments for ``initializer``.
+        imports : iter, optional
+            Names of modules to import in every worker process when it
+            starts, so the first item does not pay for the import.  Ignored
+            before Python 3.7.
+        """
+
+        if initializer is not None and not _compat.executor_initializer:
+            raise ValueError("'initializer' requires Python 3.7 or newer.")
+
+        self._threads = threads
+        self._processes = processes
+        self._initializer = initializer
+        self._initargs = tuple(initargs)
+        self._imports = tuple(imports)
+
     @property
     def operations(self):
-        return getattr(self, '_operations', tuple())
+        # Stored in a list so adding an operation is cheap, but exposed as
+        # a tuple so it cannot be modified.
+        return tuple(getattr(self, '_operations', ()))
 
     @property
     def thread_pool(self):
-        pool = getattr(self, '_thread_pool', None)
+        pool = getattr(self, '_thread_pool', None) \
+            or self._owned_pool('thread')
         if pool is None:
             raise NoPool(
                 "An operation requested a thread pool but {!r} did not "
@@ -105,15 +196,124 @@ class Pipeline(object):
 
     @property
     def process_pool(self):
-        pool = getattr(self, '_process_pool', None)
+        pool = getattr(self, '_process_pool', None) \
+            or self._owned_pool('process')
         if pool is None:
             raise NoPool(
                 "An operation requested a process pool but {!r} did not "
                 "receive one.".format(self))
         return pool
 
+    def _owned_workers(self, kind):
+
+        """Number of workers in the thread or process pool owned by this
+        pipeline.  ``None`` if the pipeline does not own one.
+        """
+
+        attr = '_threads' if kind == 'thread' else '_processes'
+        size = getattr(self, attr, None)
+        if size is None or size is False:
+            return None
+        elif size is True:
+            import multiprocessing
+            cpus = multiprocessing.cpu_count()
+            # Same as the 'concurrent.futures' default since Python 3.8
+            return min(32, cpus + 4) if kind == 'thread' else cpus
+        return size
+
+    def workers(self, kind):
+
+        """Number of workers in the pool an operation requesting ``kind``
+        receives, if known.  Pools passed to ``Pipeline.__call__()`` are not
+        inspected.
+
+        Parameters
+        ----------
+        kind : str
+            Either 'thread' or 'process'.
+
+        Returns
+        -------
+        int or None
+        """
+
+        if getattr(self, '_{}_pool'.format(kind), None) is not None:
+            return None
+        return self._owned_workers(kind)
+
+    def _owned_pool(self, kind):
+
+        """Get the thread or process pool owned by this pipeline, creating
+        it if necessary.  ``None`` if the pipeline does not own one.
+        """
+
+        workers = self._owned_workers(kind)
+        if workers is None:
+            return None
+
+        with _POOL_LOCK:
+            pools = self.__dict__.setdefault('_pools', {})
+            pool = pools.get(kind)
+            if pool is None:
+                from concurrent.futures import (
+                    ProcessPoolExecutor, ThreadPoolExecutor)
+                if kind == 'thread':
+                    pool = ThreadPoolExecutor(workers)
+                elif _compat.executor_initializer:
+                    pool = ProcessPoolExecutor(
+                        workers,
+                        initializer=_initialize_worker,
+                        initargs=(
+                            self._imports, self._initializer,
+                            self._initargs))
+                else:  # pragma: no cover
+                    pool = ProcessPoolExecutor(workers)
+                pools[kind] = pool
+        return pool
+
+    def warm(self):
+
+        """Create owned pools and start their workers now rather than when
+        the first item arrives.
+
+        Returns
+        -------
+        Pipeline
+            This pipeline.
+        """
+
+        for kind in ('thread', 'process'):
+            pool = self._owned_pool(kind)
+            if pool is not None:
+                futures = [
+                    pool.submit(_noop)
+                    for _ in range(self._owned_workers(kind))]
+                for future in futures:
+                    future.result()
+        return self
+
+    def shutdown(self, wait=True):
+
+        """Shut down pools owned by this pipeline.  They are recreated if
+        the pipeline runs again.
+
+        Parameters
+        ----------
+        wait : bool, optional
+            Wait for pending work to finish.
+        """
+
+        with _POOL_LOCK:
+            pools = self.__dict__.pop('_pools', {})
+        for pool in pools.values():
+            pool.shutdown(wait=wait)
+
     def close(self):
-        """Override if to teardown a pipeline in ``Pipeline.__exit__()``."""
+        """Override if to teardown a pipeline in ``Pipeline.__exit__()``.
+        Also called every time the pipeline's output stream stops, so it
+        should not release resources that are reused between runs, like
+        owned pools.
+        """
         pass
 
     def __enter__(self):
@@ -121,6 +321,15 @@ class Pipeline(object):
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.close()
+        self.shutdown()
+
+    def __getstate__(self):
+        # Pools cannot be pickled, which happens when a pipeline is sent
+        # to a process pool.
+        state = self.__dict__.copy()
+        for key in ('_pools', '_thread_pool', '_process_pool'):
+            state.pop(key, None)
+        return state
 
     def __or__(self, other):
 
@@ -131,14 +340,95 @@ class Pipeline(object):
                 "Expected an 'Operation()', not: {}".format(other))
         other.pipeline = self
 
-        # Enforce immutability when calling 'Pipeline.operations'
-        self._operations = tuple(list(self.operations) + [other])
+        operations = self.__dict__.get('_operations')
+        if not isinstance(operations, list):
+            operations = self._operations = list(operations or ())
+        operations.append(other)
 
         return self
 
     __ior__ = __or__
 
-    def __call__(self, data, process_pool=None, thread_pool=None):
+    def clone(self):
+
+        """Copy the pipeline and its operations, so the copy can run at the
+        same time as the original or be modified without affecting it.
+        Useful for building a template pipeline once and producing a copy
+        per request.  Functions are shared, but everything else held by
+        the operations, like caches, is copied.  Pools owned by the
+        pipeline are not copied.
+
+        Returns
+        -------
+        Pipeline
+        """
+
+        clone = copy.copy(self)
+        clone._operations = []
+        # Operations refer back to this pipeline, which must not be copied
+        memo = {id(self): clone}
+        for operation in self.operations:
+            clone |= copy.deepcopy(operation, memo)
+        return clone
+
+    def optimize(self):
+
+        """Rewrite the pipeline's operations into an equivalent sequence
+        that does less work.  See ``tinyflow.plan`` for the rules.  The
+        original pipeline is left untouched.
+
+        Returns
+        -------
+        Pipeline
+            Built from a ``clone()`` of this pipeline.
+        """
+
+        optimized = self.clone()
+        operations = Plan(optimized.operations).optimize().operations
+        optimized._operations = []
+        for op in operations:
+            optimized |= op
+        return optimized
+
+    def explain(self):
+
+        """Describe the pipeline's logical plan, the plan produced by
+        ``optimize()``, and the rewrites that were applied.
+
+        Returns
+        -------
+        str
+        """
+
+        return Plan(self.operations).explain()
+
+    def get_state(self):
+
+        """Get the state of every operation.  See
+        ``tinyflow.ops.Operation.get_state()``.
+
+        Returns
+        -------
+        list
+        """
+
+        return [op.get_state() for op in self.operations]
+
+    def set_state(self, states):
+
+        """Restore the state of every operation from ``get_state()``.
+
+        Parameters
+        ----------
+        states : list
+            One state per operation.
+        """
+
+        for op, state in zip(self.operations, states):
+            op.set_state(state)
+
+    def __call__(
+            self, data, process_pool=None, thread_pool=None, checkpoint=None):
 
         """Stream data through the pipeline.
 
@@ -151,19 +441,66 @@ class Pipeline(object):
             A process pool that individual operations can use if needed.
         thread_pool : None or concurrent.futures.ThreadPoolExecutor
             A thread pool that individual operations can use if needed.
+        checkpoint : None or tinyflow.checkpoint.Checkpoint
+            Periodically save progress and resume from the last save if the
+            checkpoint exists.
+
+        Raises
+        ------
+        tinyflow.exceptions.NotCheckpointable
+            If ``checkpoint`` is given but an operation holds items that
+            cannot be saved, like a pooled ``tinyflow.ops.map()``.
         """
 
-        data = iter(data)
-
         self._process_pool = process_pool
         self._thread_pool = thread_pool
+        source = data
+
+        if checkpoint is not None:
+            for op in _uncheckpointable(self.operations):
+                raise NotCheckpointable(
+                    "Cannot checkpoint {!r}.  Items it holds would be lost "
+                    "when resuming.".format(op))
+            data = checkpoint.resume(self, data)
 
+        stages = []
         for op in self.operations:
             # Ensure downstream nodes get an ambiguous iterator and not
-            # something like a list that they get hooked on abusing.
-            data = iter(op(data))
+            # something like a list that they get hooked on abusing, unless
+            # they explicitly know how to take advantage of one.
+            if not getattr(op, 'accepts_sequences', False):
+                data = iter(data)
+            data = op(data)
+            # An operation can hand back the caller's input, which is not
+            # ours to close.
+            if data is not source:
+                stages.append(data)
+        data = iter(data)
+
+        if checkpoint is not None:
+            data = checkpoint.complete(data)
+            stages.append(data)
+
+        return self._run(data, stages)
+
+    def _run(self, data, stages):
+
+        """Stream data out of the final stage.  When the stream is exhausted,
+        raises an exception, or is closed by the consumer, every stage is
+        closed from downstream to upstream, which cancels pending pool work
+        and closes open files, and then ``close()`` is called.
+        """
 
-        return data
+        try:
+            for item in data:
+                yield item
+        finally:
+            # Only generators are closed.  Some operations pass through
+            # objects owned by the caller, like an open file.
+            for stage in reversed(stages):
+                if isinstance(stage, types.GeneratorType):
+                    stage.close()
+            self.close()
 
 
 class MapPipeline(Pipeline):
@@ -0,0 +1,288 @@
+"""Logical plans and a rule based optimizer for pipelines.
+
+A pipeline's operations are treated as a logical plan that can be rewritten
+into an equivalent plan that does less work:
+
+    from tinyflow import ops, Pipeline
+
+
+    pipeline = Pipeline() \
+        | ops.map(expensive) \
+        | ops.filter(lambda x: x['id'] % 2, independent=True) \
+        | ops.itemgetter('id') \
+        | ops.take(10)
+
+    print(pipeline.explain())
+    for item in pipeline.optimize()(data):
+        pass
+
+An ``ops.map()`` with a ``timeout``, ``retries``, or a ``dead_letter`` can
+drop items, so it is not considered one-to-one.  The rewrite rules are:
+
+* ``ops.filter(independent=True)`` runs before a preceding one-to-one
+  ``ops.map()`` or ``ops.methodcaller()``.  An independent filter produces
+  the same answer for an item before and after it is mapped, so items that
+  would be discarded are never mapped.
+* ``ops.itemgetter()`` projections move upstream past ``ops.drop()`` and are
+  fused into a preceding one-to-one ``ops.map()`` or ``ops.methodcaller()``,
+  so only the projected value leaves the map, including when the map runs in
+  a process pool.
+* ``ops.take()`` limits are hoisted above one-to-one operations so upstream
+  stages stop producing items as early as possible, and consecutive limits
+  are merged.  Pooled ``ops.map()`` operations are unordered, so limits are
+  not hoisted above them.
+* Consecutive ``ops.drop()`` operations are merged.
+
+Plain ``tinyflow.Pipeline()`` instances used as operations are inlined.
+Other operations are treated as barriers that nothing moves across.
+"""
+
+
+import copy
+import operator as op
+import types
+
+from . import ops, tools
+
+
+__all__ = ['Plan']
+
+
+class _Compose(object):
+
+    """Call a series of functions, passing the output of one to the next.
+    Lives at the module level so fused functions can be pickled.
+    """
+
+    def __init__(self, *funcs):
+        self.funcs = funcs
+
+    def __call__(self, *args, **kwargs):
+        funcs = self.funcs
+        value = funcs[0](*args, **kwargs)
+        for func in funcs[1:]:
+            value = func(value)
+        return value
+
+    def __repr__(self):
+        return ' >> '.join(_format_value(f) for f in self.funcs)
+
+
+def _format_value(value):
+    if isinstance(value, (types.FunctionType, types.BuiltinFunctionType)):
+        return value.__name__
+    return repr(value)
+
+
+def _format(operation):
+
+    """Describe an operation for ``Plan.explain()``."""
+
+    description = getattr(operation, '_description', None)
+    if description is not None:
+        return description
+
+    from .pipeline import Pipeline
+    if isinstance(operation, Pipeline):
+        return '{}({} operations)'.format(
+            type(operation).__name__, len(operation.operations))
+
+    args = []
+    for key, value in sorted(tools.attributes(operation).items()):
+        if key.startswith('_') or key in ('queue', 'worker_pool'):
+            continue
+        args.append('{}={}'.format(key, _format_value(value)))
+    return '{}({})'.format(type(operation).__name__, ', '.join(args))
+
+
+def _is_one_to_one(operation):
+
+    """Determine if an operation produces exactly one output item per input
+    item without looking at any other items.
+    """
+
+    # Resilient maps can drop items into a dead letter queue or raise
+    if isinstance(operation, ops.map):
+        return not operation.flatten and not operation.resilient
+    return type(operation) in (ops.methodcaller, ops.itemgetter)
+
+
+def _is_transform(operation):
+
+    """Like ``_is_one_to_one()`` but only for operations that apply an
+    arbitrary function, which excludes projections.
+    """
+
+    # The function applied by 'cache()' also reports cache hits
+    return _is_one_to_one(operation) \
+        and not isinstance(operation, (ops.itemgetter, ops.cache))
+
+
+def _as_function(operation):
+
+    """Get the function applied by a transform."""
+
+    if isinstance(operation, ops.methodcaller):
+        return op.methodcaller(
+            operation.name, *operation.args, **operation.kwargs)
+    return operation.func
+
+
+def _push_filter(upstream, downstream):
+    if isinstance(downstream, ops.filter) \
+            and downstream.independent \
+            and _is_transform(upstream):
+        return (downstream, upstream), "{} moved before {}".format(
+            _format(downstream), _format(upstream))
+
+
+def _fuse_projection(upstream, downstream):
+
+    if not isinstance(downstream, ops.itemgetter):
+        return None
+
+    if isinstance(upstream, ops.drop):
+        return (downstream, upstream), "{} moved before {}".format(
+            _format(downstream), _format(upstream))
+
+    # Cached results are keyed on the unfused function
+    elif _is_transform(upstream) and getattr(upstream, 'memo', None) is None:
+        getter = op.itemgetter(downstream.item, *downstream.items)
+        func = _Compose(_as_function(upstream), getter)
+        if isinstance(upstream, ops.map):
+            # Keep every other option of the map
+            fused = copy.copy(upstream)
+            fused.func = func
+            if hasattr(fused, '_description'):
+                del fused._description
+        else:
+            fused = ops.map(func)
+        return (fused,), "{} fused into {}".format(
+            _format(downstream), _format(upstream))
+
+
+def _hoist_take(upstream, downstream):
+
+    if not isinstance(downstream, ops.take):
+        return None
+
+    if isinstance(upstream, ops.take):
+        merged = ops.take(min(upstream.count, downstream.count))
+        return (merged,), "{} merged with {}".format(
+            _format(downstream), _format(upstream))
+
+    # Pooled maps emit items in the order they finish, so which items
+    # are taken depends on where the limit is.
+    elif _is_one_to_one(upstream) \
+            and getattr(upstream, 'pool', None) is None:
+        return (downstream, upstream), "{} hoisted above {}".format(
+            _format(downstream), _format(upstream))
+
+
+def _merge_drop(upstream, downstream):
+    if isinstance(upstream, ops.drop) and isinstance(downstream, ops.drop):
+        merged = ops.drop(upstream.count + downstream.count)
+        return (merged,), "{} merged with {}".format(
+            _format(downstream), _format(upstream))
+
+
+# Every rule takes a pair of adjacent operations and either returns 'None'
+# or a tuple of replacement operations plus a message.  Rules only ever
+# move operations upstream or reduce the number of operations, so repeatedly
+# applying them terminates.
+_RULES = (_push_filter, _fuse_projection, _hoist_take, _merge_drop)
+
+
+def _inline(operations):
+
+    """Expand sub-pipelines that are plain sequential compositions."""
+
+    from .pipeline import Pipeline
+
+    for operation in operations:
+        if type(operation) is Pipeline:
+            for o in _inline(operation.operations):
+                yield o
+        else:
+            yield operation
+
+
+class Plan(object):
+
+    """A logical plan: an ordered sequence of operations.
+
+    Attributes
+    ----------
+    operations : tuple
+        Operations in execution order.
+    rewrites : tuple
+        Descriptions of the rewrites that produced this plan.
+    """
+
+    def __init__(self, operations, rewrites=()):
+
+        """
+        Parameters
+        ----------
+        operations : iter
+            Instances of ``tinyflow.ops.Operation()``.
+        rewrites : iter, optional
+            Rewrites that produced this plan.
+        """
+
+        self.operations = tuple(operations)
+        self.rewrites = tuple(rewrites)
+
+    def optimize(self):
+
+        """Apply the rewrite rules until none match.
+
+        Returns
+        -------
+        Plan
+        """
+
+        operations = list(_inline(self.operations))
+        rewrites = list(self.rewrites)
+
+        changed = True
+        while changed:
+            changed = False
+            for idx in range(1, len(operations)):
+                pair = operations[idx - 1], operations[idx]
+                for rule in _RULES:
+                    result = rule(*pair)
+                    if result is not None:
+                        replacement, message = result
+                        operations[idx - 1:idx + 1] = replacement
+                        rewrites.append(message)
+                        changed = True
+                        break
+                if changed:
+                    break
+
+        return Plan(operations, rewrites)
+
+    def explain(self):
+
+        """Describe the plan and its optimized form.
+
+        Returns
+        -------
+        str
+        """
+
+        optimized = self.optimize()
+
+        lines = ['Logical plan:']
+        lines.extend('  {}: {}'.format(idx, _format(o))
+                     for idx, o in enumerate(self.operations))
+        lines.append('Optimized plan:')
+        lines.extend('  {}: {}'.format(idx, _format(o))
+                     for idx, o in enumerate(optimized.operations))
+        lines.append('Rewrites:')
+        lines.extend('  {}'.format(r) for r in optimized.rewrites)
+        if not optimized.rewrites:
+            lines.append('  none')
+
+        return '\n'.join(lines)
@@ -0,0 +1,360 @@
+"""Buffered writers for the end of a pipeline.
+
+Records are grouped into batches, each batch is encoded into a single block
+of bytes, and blocks are written with one call per block.  Output can be
+split across multiple files by a key and rotated once a file holds enough
+records or bytes.  Blocks can also be handed to a background thread so
+encoding and writing overlap:
+
+    from tinyflow import ops, Pipeline
+
+
+    pipeline = Pipeline() \\
+        | ops.map(json.loads) \\
+        | ops.write_jsonl(
+            'out/{key}/{part:04d}.jsonl',
+            keyfunc=op.itemgetter('country'),
+            max_records=100000,
+            background=True)
+
+    for path, records, size in pipeline(data):
+        print("Wrote {} records to {}".format(records, path))
+
+Writers emit one ``Written()`` per file once the file has been closed.
+"""
+
+
+from collections import deque, namedtuple
+import functools
+import json
+import os
+import threading
+
+from . import _compat, binary
+
+
+__all__ = [
+    'BinaryEncoder', 'CSVEncoder', 'JSONLinesEncoder', 'LineEncoder',
+    'Writer', 'Written']
+
+
+class Written(namedtuple('Written', ['path', 'records', 'bytes'])):
+
+    """A closed output file along with the number of records and bytes
+    written to it.
+    """
+
+    # Assigning to '__doc__' instead does not work on Python 2
+    __slots__ = ()
+
+
+class LineEncoder(object):
+
+    """Encode strings as lines of text."""
+
+    header = b''
+
+    def __init__(self, newline='\n', encoding='utf-8'):
+        self.newline = newline
+        self.encoding = encoding
+
+    def __call__(self, records):
+        newline = self.newline
+        return (newline.join(records) + newline).encode(self.encoding)
+
+
+class CSVEncoder(object):
+
+    """Encode sequences, or dictionaries if ``fieldnames`` is given, as CSV
+    rows.  Every file starts with a header row when ``fieldnames`` is given.
+    """
+
+    def __init__(self, fieldnames=None, encoding='utf-8', dialect='excel'):
+        self.fieldnames = fieldnames
+        self.encoding = encoding
+        self.dialect = dialect
+        self.header = self._encode([fieldnames]) if fieldnames else b''
+
+    def _encode(self, rows):
+        return _compat.csv_dumps(
+            rows, encoding=self.encoding, dialect=self.dialect)
+
+    def __call__(self, records):
+        if self.fieldnames and isinstance(records[0], dict):
+            return _compat.csv_dumps(
+                records, self.fieldnames, encoding=self.encoding,
+                dialect=self.dialect)
+        return self._encode(records)
+
+
+class JSONLinesEncoder(object):
+
+    """Encode records as one JSON document per line."""
+
+    header = b''
+
+    def __init__(self, encoding='utf-8', **kwargs):
+        self.encoding = encoding
+        self.kwargs = kwargs
+
+    def __call__(self, records):
+        dumps = json.JSONEncoder(**self.kwargs).encode
+        lines = [dumps(r) for r in records]
+        lines.append('')
+        return '\n'.join(lines).encode(self.encoding)
+
+
+class BinaryEncoder(object):
+
+    """Encode records as ``tinyflow.binary`` frames.  Files can be read
+    with ``tinyflow.binary.read()`` or ``tinyflow.ops.read_binary()``.
+    """
+
+    header = b''
+
+    def __init__(self, compress=False, level=6):
+        self.compress = compress
+        self.level = level
+
+    def __call__(self, records):
+        return binary.dumps(records, compress=self.compress, level=self.level)
+
+
+class _Output(object):
+
+    """An output file and its pending records."""
+
+    def __init__(self, path, header):
+        self.path = path
+        self.header = header
+        self.f = None
+        self.buffer = []
+        self.records = 0
+        self.bytes = len(header)
+
+
+class _Direct(object):
+
+    """Perform I/O in the current thread."""
+
+    def submit(self, func, *args):
+        func(*args)
+
+    def cleanup(self, func, *args):
+        func(*args)
+
+    def join(self):
+        pass
+
+
+class _Background(object):
+
+    """Perform I/O in the order it was submitted in a separate thread.  The
+    queue is bounded so a slow disk eventually applies back pressure.  The
+    first error raised in the thread is raised again in the calling thread
+    by the next ``submit()`` or ``join()``.  Tasks submitted after an error
+    are skipped, except for those given to ``cleanup()``, like closing
+    files.
+    """
+
+    def __init__(self, maxsize=16):
+        self.queue = _compat.queue.Queue(maxsize)
+        self.error = None
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            task, always = item
+            if always or self.error is None:
+                try:
+                    task()
+                except Exception as e:
+                    if self.error is None:
+                        self.error = e
+
+    def _check(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def submit(self, func, *args):
+        self._check()
+        self.queue.put((functools.partial(func, *args), False))
+
+    def cleanup(self, func, *args):
+        self.queue.put((functools.partial(func, *args), True))
+
+    def join(self):
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+        self._check()
+
+
+class Writer(object):
+
+    """Write a stream of records to one or more files."""
+
+    def __init__(
+            self, path, encode, keyfunc=None, batchsize=4096,
+            max_records=None, max_bytes=None, background=False,
+            opener=open):
+
+        """
+        Parameters
+        ----------
+        path : str
+            Output file.  A template with ``{key}`` and ``{part}`` fields
+            when ``keyfunc`` or one of ``max_records`` and ``max_bytes`` are
+            given, like ``'out/{key}-{part:04d}.txt'``.  Parent directories
+            are created as needed.
+        encode : callable
+            Converts a list of records to ``bytes``.  An optional ``header``
+            attribute is written at the start of every file.  See
+            ``LineEncoder()``.
+        keyfunc : callable or None, optional
+            Write each record to the file for ``keyfunc(record)``.  Every
+            key has its own open file and buffer.
+        batchsize : int, optional
+            Number of records to encode and write at a time for each file.
+        max_records : int or None, optional
+            Start a new file once a file holds this many records.
+        max_bytes : int or None, optional
+            Start a new file once a file holds at least this many bytes.
+            Checked after every block, so files can exceed this limit by up
+            to one block.
+        background : bool, optional
+            Write blocks from a background thread.  Records are still
+            encoded in the current thread.
+        opener : callable, optional
+            Opens files for writing.  Called as ``opener(path, 'wb')``.
+        """
+
+        if keyfunc is not None and '{key' not in path:
+            raise ValueError(
+                "'path' must contain a '{key}' field when using 'keyfunc'.")
+        elif (max_records or max_bytes) and '{part' not in path:
+            raise ValueError(
+                "'path' must contain a '{part}' field when rotating files.")
+
+        self.path = path
+        self.encode = encode
+        self.keyfunc = keyfunc
+        self.batchsize = batchsize
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self.background = background
+        self.opener = opener
+
+    def _path(self, key, part):
+        if self.keyfunc is None and not (self.max_records or self.max_bytes):
+            return self.path
+        return self.path.format(key=key, part=part)
+
+    def _write_block(self, output, data):
+        if output.f is None:
+            dirname = os.path.dirname(output.path)
+            if dirname and not os.path.isdir(dirname):
+                try:
+                    os.makedirs(dirname)
+                except OSError:
+                    # Created by another writer in the meantime
+                    if not os.path.isdir(dirname):
+                        raise
+            output.f = self.opener(output.path, 'wb')
+            output.f.write(output.header)
+        output.f.write(data)
+
+    def _close(self, output, done):
+        if output.f is not None:
+            output.f.close()
+            done.append(Written(output.path, output.records, output.bytes))
+
+    def _flush(self, output, executor):
+        if output.buffer:
+            data = self.encode(output.buffer)
+            output.records += len(output.buffer)
+            output.bytes += len(data)
+            output.buffer = []
+            executor.submit(self._write_block, output, data)
+
+    def _is_full(self, output):
+        return (self.max_records and output.records >= self.max_records) \
+            or (self.max_bytes and output.bytes >= self.max_bytes)
+
+    def write(self, stream):
+
+        """Write records and emit a ``Written()`` as files are closed.  Any
+        open files are flushed and closed if this generator is closed early
+        or an error occurs.
+
+        Parameters
+        ----------
+        stream : iter
+            Records to write.
+
+        Yields
+        ------
+        Written
+        """
+
+        # Dots aren't free.
+        keyfunc = self.keyfunc
+        batchsize = self.batchsize
+        max_records = self.max_records
+        header = getattr(self.encode, 'header', b'')
+
+        executor = _Background() if self.background else _Direct()
+        outputs = {}
+        parts = {}
+        done = deque()
+
+        try:
+            for record in stream:
+                key = None if keyfunc is None else keyfunc(record)
+                output = outputs.get(key)
+                if output is None:
+                    part = parts.get(key, 0)
+                    parts[key] = part + 1
+                    output = outputs[key] = _Output(
+                        self._path(key, part), header)
+
+                buffer = output.buffer
+                buffer.append(record)
+                if len(buffer) >= batchsize or (
+                        max_records
+                        and output.records + len(buffer) >= max_records):
+                    self._flush(output, executor)
+                    if self._is_full(output):
+                        del outputs[key]
+                        executor.cleanup(self._close, output, done)
+
+                while done:
+                    yield done.popleft()
+
+            for key in list(outputs):
+                self._flush(outputs[key], executor)
+                executor.cleanup(self._close, outputs.pop(key), done)
+            executor.join()
+
+            while done:
+                yield done.popleft()
+
+        finally:
+            if outputs:
+                # Close every file before raising the first error
+                error = None
+                for output in outputs.values():
+                    try:
+                        self._flush(output, executor)
+                    except Exception as e:
+                        error = error or e
+                    executor.cleanup(self._close, output, done)
+                executor.join()
+                if error is not None:
+                    raise error
@@ -0,0 +1,478 @@
+"""Probabilistic data structures for summarizing streams that are too large
+to hold in memory.
+
+``BloomFilter()`` answers set membership with a bounded false positive
+rate, ``HyperLogLog()`` estimates the number of distinct items, and
+``KLL()`` estimates quantiles.  All use a bounded amount of memory and can
+be merged, so sketches built by different workers can be combined:
+
+    from tinyflow.sketch import HyperLogLog
+
+
+    sketch = HyperLogLog()
+    for word in words:
+        sketch.add(word)
+    print(sketch.count())
+
+Values are hashed with a stable 64 bit hash.  Strings and bytes are hashed
+directly and everything else is hashed by its ``repr()``, so sketches
+built in different processes agree.
+"""
+
+
+import bisect
+import hashlib
+import math
+import random
+import struct
+
+from . import _compat
+
+
+__all__ = ['BloomFilter', 'HyperLogLog', 'KLL', 'hash64']
+
+
+_UINT64 = struct.Struct('<Q')
+_MASK64 = 2 ** 64 - 1
+
+# Seeds sketches that were not given one.  A 'random.Random()' per sketch
+# costs a read from the OS and a few KB of state, which adds up when there
+# is one sketch per group.
+_SEEDS = random.Random()
+
+
+if hasattr(hashlib, 'blake2b'):  # pragma: no cover
+    def _digest(data):
+        return hashlib.blake2b(data, digest_size=8).digest()
+else:  # pragma: no cover
+    def _digest(data):
+        return hashlib.sha1(data).digest()[:8]
+
+
+def hash64(value):
+
+    """Stable 64 bit hash.
+
+    Parameters
+    ----------
+    value : object
+        Strings and bytes are hashed directly.  Other objects are hashed
+        by their ``repr()``.
+
+    Returns
+    -------
+    int
+    """
+
+    if isinstance(value, _compat.text_type):
+        value = value.encode('utf-8')
+    elif not isinstance(value, bytes):
+        value = repr(value).encode('utf-8')
+    return _UINT64.unpack(_digest(value))[0]
+
+
+class BloomFilter(object):
+
+    """A set that may report items that were never added as members but
+    never misses an item that was.
+
+    Attributes
+    ----------
+    capacity : int
+        Number of items the filter was sized for.
+    error_rate : float
+        Expected false positive rate once ``capacity`` items are added.
+    size : int
+        Number of bits.
+    hashes : int
+        Number of bits set per item.
+    count : int
+        Number of items added that were not already members.
+    """
+
+    def __init__(self, capacity, error_rate=0.01):
+
+        """
+        Parameters
+        ----------
+        capacity : int
+            Expected number of distinct items.
+        error_rate : float, optional
+            Acceptable false positive rate at capacity.
+        """
+
+        if capacity < 1:
+            raise ValueError("'capacity' must be at least 1.")
+        elif not 0 < error_rate < 1:
+            raise ValueError("'error_rate' must be between 0 and 1.")
+
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = int(math.ceil(
+            -capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, int(round(
+            self.size / float(capacity) * math.log(2))))
+        self.count = 0
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def __repr__(self):
+        return '{}(capacity={}, error_rate={})'.format(
+            type(self).__name__, self.capacity, self.error_rate)
+
+    def _positions(self, value):
+        # Double hashing produces 'hashes' positions from one 64 bit hash
+        h = hash64(value)
+        h1 = h & 0xffffffff
+        h2 = (h >> 32) | 1
+        size = self.size
+        return [(h1 + i * h2) % size for i in _compat.range(self.hashes)]
+
+    def add(self, value):
+
+        """Add a value.
+
+        Returns
+        -------
+        bool
+            ``True`` if the value was possibly already a member.
+        """
+
+        bits = self.bits
+        present = True
+        for position in self._positions(value):
+            byte, bit = divmod(position, 8)
+            mask = 1 << bit
+            if not bits[byte] & mask:
+                present = False
+                bits[byte] |= mask
+        if not present:
+            self.count += 1
+        return present
+
+    def __contains__(self, value):
+        bits = self.bits
+        return all(
+            bits[p >> 3] & (1 << (p & 7)) for p in self._positions(value))
+
+    def merge(self, other):
+
+        """Add every member of a filter with the same ``capacity`` and
+        ``error_rate`` to this filter.
+
+        Parameters
+        ----------
+        other : BloomFilter
+        """
+
+        if (other.size, other.hashes) != (self.size, self.hashes):
+            raise ValueError("Cannot merge filters with different sizes.")
+        bits = self.bits
+        for idx, byte in enumerate(other.bits):
+            bits[idx] |= byte
+        self.count += other.count
+
+
+class HyperLogLog(object):
+
+    """Estimate the number of distinct values in a stream.  The relative
+    standard error is about ``1.04 / sqrt(2 ** precision)``, which is 0.8%
+    for the default precision, using ``2 ** precision`` bytes.
+    """
+
+    def __init__(self, precision=14):
+
+        """
+        Parameters
+        ----------
+        precision : int, optional
+            Between 4 and 18.
+        """
+
+        if not 4 <= precision <= 18:
+            raise ValueError("'precision' must be between 4 and 18.")
+        self.precision = precision
+        self.registers = bytearray(2 ** precision)
+
+    def __repr__(self):
+        return '{}(precision={})'.format(type(self).__name__, self.precision)
+
+    def add(self, value):
+
+        """Add a value."""
+
+        h = hash64(value)
+        precision = self.precision
+        idx = h >> (64 - precision)
+        width = 64 - precision
+        rest = h & ((1 << width) - 1)
+        rank = width - rest.bit_length() + 1
+        registers = self.registers
+        if rank > registers[idx]:
+            registers[idx] = rank
+
+    def count(self):
+
+        """Estimated number of distinct values.
+
+        Returns
+        -------
+        float
+        """
+
+        registers = self.registers
+        m = len(registers)
+        if m == 16:
+            alpha = 0.673
+        elif m == 32:
+            alpha = 0.697
+        elif m == 64:
+            alpha = 0.709
+        else:
+            alpha = 0.7213 / (1 + 1.079 / m)
+
+        estimate = alpha * m * m / sum(2.0 ** -r for r in registers)
+
+        # Linear counting is more accurate for small cardinalities
+        zeros = registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / float(zeros))
+        return estimate
+
+    def __len__(self):
+        return int(round(self.count()))
+
+    def merge(self, other):
+
+        """Combine with a sketch of the same precision so this sketch
+        estimates the number of distinct values added to either.
+
+        Parameters
+        ----------
+        other : HyperLogLog
+        """
+
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge sketches with different precision.")
+        registers = self.registers
+        for idx, rank in enumerate(other.registers):
+            if rank > registers[idx]:
+                registers[idx] = rank
+
+
+class KLL(object):
+
+    """Estimate quantiles of a stream of comparable values with the KLL
+    sketch.  Ranks are accurate to within about ``1.7 / k`` of the number
+    of values, and the sketch holds roughly ``3 * k`` values regardless of
+    how many are added.  Values are compared but never hashed, so any
+    sortable type works.
+
+    The exact smallest and largest values are available as ``min`` and
+    ``max``.
+
+    Values are kept in a hierarchy of compactors.  A value at level ``h``
+    stands in for ``2 ** h`` of the original values.  When a level fills
+    up it is sorted and every other value, starting at a random offset, is
+    promoted to the next level.  The offsets come from a xorshift
+    generator whose state is a single integer, so sketches are cheap to
+    create in large numbers.
+    """
+
+    def __init__(self, k=200, seed=None):
+
+        """
+        Parameters
+        ----------
+        k : int, optional
+            Controls the accuracy and size of the sketch.
+        seed : object, optional
+            Makes the choice of which values are promoted reproducible.
+            Any value accepted by ``random.Random()``.
+        """
+
+        if k < 2:
+            raise ValueError("'k' must be at least 2.")
+
+        self.k = k
+        self.count = 0
+        self.min = None
+        self.max = None
+        self.compactors = [[]]
+        seeds = _SEEDS if seed is None else random.Random(seed)
+        # xorshift state must not be 0
+        self._bits = seeds.getrandbits(64) | 1
+        self._size = 0
+        self._max_size = self._capacity(0)
+
+    def __repr__(self):
+        return '{}(k={}, count={})'.format(
+            type(self).__name__, self.k, self.count)
+
+    def __len__(self):
+        return self.count
+
+    def _capacity(self, height):
+        depth = len(self.compactors) - height - 1
+        return int(math.ceil(self.k * (2.0 / 3) ** depth)) + 1
+
+    def _grow(self):
+        self.compactors.append([])
+        self._max_size = sum(
+            self._capacity(h) for h in _compat.range(len(self.compactors)))
+
+    def _compress(self):
+        compactors = self.compactors
+        for height in _compat.range(len(compactors)):
+            if len(compactors[height]) >= self._capacity(height):
+                if height + 1 >= len(compactors):
+                    self._grow()
+                values = compactors[height]
+                values.sort()
+                # An odd value out stays at this level
+                odd = len(values) % 2
+                offset = odd + self._coin()
+                compactors[height + 1].extend(values[offset::2])
+                compactors[height] = values[:odd]
+                self._size = sum(_compat.map(len, compactors))
+                if self._size < self._max_size:
+                    break
+
+    def _coin(self):
+
+        """Produce a pseudo-random bit with xorshift64."""
+
+        x = self._bits
+        x ^= (x << 13) & _MASK64
+        x ^= x >> 7
+        x ^= (x << 17) & _MASK64
+        self._bits = x
+        return x & 1
+
+    def add(self, value):
+
+        """Add a value."""
+
+        if not self.count:
+            self.min = self.max = value
+        elif value < self.min:
+            self.min = value
+        elif value > self.max:
+            self.max = value
+        self.compactors[0].append(value)
+        self.count += 1
+        self._size += 1
+        if self._size >= self._max_size:
+            self._compress()
+
+    def update(self, values):
+
+        """Add multiple values."""
+
+        for value in values:
+            self.add(value)
+
+    def merge(self, other):
+
+        """Combine with another sketch so this sketch describes the values
+        added to either.
+
+        Parameters
+        ----------
+        other : KLL
+        """
+
+        if not other.count:
+            return
+        elif not self.count:
+            self.min, self.max = other.min, other.max
+        else:
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+
+        while len(self.compactors) < len(other.compactors):
+            self._grow()
+        for height, values in enumerate(other.compactors):
+            self.compactors[height].extend(values)
+        self.count += other.count
+        self._size = sum(_compat.map(len, self.compactors))
+        while self._size >= self._max_size:
+            self._compress()
+
+    def _weighted(self):
+
+        """Sorted values and their cumulative weights."""
+
+        pairs = sorted(
+            (value, 2 ** height)
+            for height, values in enumerate(self.compactors)
+            for value in values)
+        values = [v for v, _ in pairs]
+        cumulative = list(_compat.accumulate(w for _, w in pairs))
+        return values, cumulative
+
+    def quantiles(self, qs):
+
+        """Estimate multiple quantiles.
+
+        Parameters
+        ----------
+        qs : iter
+            Quantiles between 0 and 1.
+
+        Returns
+        -------
+        list
+            Containing ``None`` for every quantile if the sketch is empty.
+        """
+
+        qs = list(qs)
+        if not self.count:
+            return [None] * len(qs)
+
+        values, cumulative = self._weighted()
+        total = cumulative[-1]
+        out = []
+        for q in qs:
+            if not 0 <= q <= 1:
+                raise ValueError("Quantiles must be between 0 and 1.")
+            idx = bisect.bisect_left(cumulative, q * total)
+            out.append(values[min(idx, len(values) - 1)])
+        return out
+
+    def quantile(self, q):
+
+        """Estimate a single quantile, like 0.5 for the median.
+
+        Returns
+        -------
+        object
+            ``None`` if the sketch is empty.
+        """
+
+        return self.quantiles([q])[0]
+
+    def cdf(self, splits):
+
+        """Estimate the fraction of values less than each split point.
+
+        Parameters
+        ----------
+        splits : iter
+            Sorted values.
+
+        Returns
+        -------
+        list
+        """
+
+        splits = list(splits)
+        if not self.count:
+            return [0.0] * len(splits)
+
+        values, cumulative = self._weighted()
+        total = float(cumulative[-1])
+        out = []
+        for split in splits:
+            idx = bisect.bisect_left(values, split)
+            out.append(cumulative[idx - 1] / total if idx else 0.0)
+        return out
@@ -0,0 +1,195 @@
+"""Block based parsing for line oriented formats.
+
+Files are read in large blocks of raw bytes that always end at a record
+boundary, and every block is parsed with a single function call.  Blocks
+are cheap to ship to another process, so parsing can happen in a pool
+while only the parsed, and optionally projected, records are sent back.
+``tinyflow.ops.read_jsonl()`` and ``tinyflow.ops.read_csv()`` are built on
+these functions.
+
+Records are produced in one of three shapes:
+
+    dict: One dictionary per record.
+    tuple: One tuple per record with values in ``fields`` order.
+    columns: One dictionary per block mapping every field to a list of
+        values, which is convenient for building arrays.
+"""
+
+
+import csv
+import json
+import operator as op
+
+from . import _compat
+
+
+__all__ = [
+    'parse_csv', 'parse_jsonl', 'quotechar', 'read_blocks', 'read_header']
+
+
+OUTPUTS = ('dict', 'tuple', 'columns')
+
+
+def read_blocks(f, blocksize=2 ** 20, quotechar=None):
+
+    """Read a binary file in blocks that end at the end of a line.
+
+    Parameters
+    ----------
+    f : file
+        Opened in binary mode.
+    blocksize : int, optional
+        Read roughly this many bytes at a time.
+    quotechar : bytes or None, optional
+        Keep reading lines until the block holds an even number of this
+        character, so quoted values containing newlines, like in CSV, are
+        not split across blocks.
+
+    Yields
+    ------
+    bytes
+    """
+
+    while True:
+        block = f.read(blocksize)
+        if not block:
+            return
+        if not block.endswith(b'\n'):
+            block += f.readline()
+        if quotechar is not None:
+            while block.count(quotechar) % 2:
+                line = f.readline()
+                if not line:
+                    break
+                block += line
+        yield block
+
+
+def _shape(records, fields, output):
+
+    """Convert a list of tuples of ``fields`` values to ``output``."""
+
+    if output == 'tuple':
+        return records
+    elif output == 'dict':
+        return [dict(zip(fields, r)) for r in records]
+    else:
+        columns = list(zip(*records)) if records else [()] * len(fields)
+        return [dict(zip(fields, _compat.map(list, columns)))]
+
+
+def parse_jsonl(block, fields=None, output='dict', encoding='utf-8'):
+
+    """Parse a block of newline delimited JSON objects.
+
+    Parameters
+    ----------
+    block : bytes
+        Complete lines.  Blank lines are skipped.
+    fields : list or None, optional
+        Only keep these keys.  Missing keys are ``None``.  Required unless
+        ``output`` is 'dict'.
+    output : str, optional
+        One of 'dict', 'tuple', or 'columns'.
+    encoding : str, optional
+        Text encoding.
+
+    Returns
+    -------
+    list
+    """
+
+    # 'str.splitlines()' also splits on characters like U+2028 that may
+    # appear unescaped inside JSON strings
+    loads = json.loads
+    objects = []
+    for line in block.decode(encoding).split('\n'):
+        if line.endswith('\r'):
+            line = line[:-1]
+        if line.strip():
+            objects.append(loads(line))
+
+    if fields is None:
+        if output != 'dict':
+            raise ValueError("'fields' is required for {!r}.".format(output))
+        return objects
+
+    records = [tuple(o.get(f) for f in fields) for o in objects]
+    return _shape(records, fields, output)
+
+
+def parse_csv(
+        block, fields, indexes=None, output='dict', encoding='utf-8',
+        dialect='excel'):
+
+    """Parse a block of CSV rows.
+
+    Parameters
+    ----------
+    block : bytes
+        Complete rows.
+    fields : list
+        Names of the fields to produce.
+    indexes : list or None, optional
+        Column index of every field.  Defaults to the first
+        ``len(fields)`` columns.
+    output : str, optional
+        One of 'dict', 'tuple', or 'columns'.
+    encoding : str, optional
+        Text encoding.
+    dialect : str or csv.Dialect, optional
+        See ``csv.reader()``.
+
+    Returns
+    -------
+    list
+    """
+
+    if indexes is None:
+        indexes = list(_compat.range(len(fields)))
+
+    rows = _compat.csv_reader(block, encoding=encoding, dialect=dialect)
+    if len(indexes) == 1:
+        idx, = indexes
+        records = [(r[idx],) for r in rows if r]
+    else:
+        getter = op.itemgetter(*indexes)
+        records = [getter(r) for r in rows if r]
+    return _shape(records, fields, output)
+
+
+def quotechar(dialect='excel', encoding='utf-8'):
+
+    """Get the encoded quote character for a CSV dialect.
+
+    Returns
+    -------
+    bytes or None
+    """
+
+    if isinstance(dialect, _compat.string_types):
+        dialect = csv.get_dialect(dialect)
+    if dialect.quotechar is None or dialect.quoting == csv.QUOTE_NONE:
+        return None
+    return dialect.quotechar.encode(encoding)
+
+
+def read_header(f, encoding='utf-8', dialect='excel'):
+
+    """Read and parse the header row of a CSV file opened in binary mode.
+
+    Returns
+    -------
+    list
+    """
+
+    quote = quotechar(dialect, encoding)
+    line = f.readline()
+    while quote is not None and line.count(quote) % 2:
+        more = f.readline()
+        if not more:
+            break
+        line += more
+    for row in _compat.csv_reader(line, encoding=encoding, dialect=dialect):
+        return row
+    return []
@@ -1,15 +1,52 @@
 """Assorted tools for working with streaming data."""
 
 
+from array import array
+import codecs
+from collections import deque
+import importlib
+import io
 import itertools as it
 
+from . import _compat
+
 
 class NULL(object):
 
     """A sentinel for when ``None`` is a valid value or default."""
 
 
-def slicer(iterable, chunksize):
+def closing(iterable, *closeables):
+
+    """Iterate over ``iterable`` and close it and every item in
+    ``closeables`` that has a ``close()`` method when iteration stops,
+    including when this generator is closed before it is exhausted.  Useful
+    for wrapping an iterator, like ``itertools.chain()``, in a way that
+    preserves the ability to close the underlying generators.
+
+    Parameters
+    ----------
+    iterable : iter
+        Input stream.
+    closeables : *objects
+        Additional objects to close.
+
+    Yields
+    ------
+    object
+    """
+
+    try:
+        for item in iterable:
+            yield item
+    finally:
+        for obj in (iterable,) + closeables:
+            close = getattr(obj, 'close', None)
+            if close is not None:
+                close()
+
+
+def slicer(iterable, chunksize, typecode=None, dtype=None):
 
     """
     Read an iterator in chunks.
@@ -27,15 +64,317 @@ def slicer(iterable, chunksize):
         Number of records to include in each chunk.  The last chunk will be
         incomplete unless the number of items in the stream is evenly
         divisible by `size`.
+    typecode : str or None, optional
+        Collect numeric items into an ``array.array()`` with this type code
+        and yield a read-only ``memoryview()`` of each chunk instead of a
+        tuple.  Items are copied into the buffer at C speed, there is no
+        per-item object overhead, and views can be handed directly to
+        anything that speaks the buffer protocol.  On Python 2 the arrays
+        themselves are yielded.
+    dtype : str or numpy.dtype or None, optional
+        Like ``typecode`` but yield read-only NumPy arrays.  Requires NumPy.
     Yields
     ------
-    tuple
+    tuple or memoryview or numpy.ndarray
     """
 
+    if typecode is not None and dtype is not None:
+        raise ValueError("Cannot use both 'typecode' and 'dtype'.")
+
     iterable = iter(iterable)
+
+    if typecode is not None:
+        return _array_slicer(iterable, chunksize, typecode)
+    elif dtype is not None:
+        return _numpy_slicer(iterable, chunksize, dtype)
+    return _tuple_slicer(iterable, chunksize)
+
+
+def _tuple_slicer(iterable, chunksize):
     while True:
         v = tuple(it.islice(iterable, chunksize))
         if v:
             yield v
         else:
-            raise StopIteration
+            return
+
+
+def _array_slicer(iterable, chunksize, typecode):
+
+    # Fail before consuming anything if the typecode is invalid
+    array(typecode)
+
+    while True:
+        # Every chunk gets its own buffer so views remain valid after the
+        # next chunk is produced.
+        buf = array(typecode)
+        buf.extend(it.islice(iterable, chunksize))
+        if buf:
+            yield _compat.array_view(buf)
+        else:
+            return
+
+
+def _numpy_slicer(iterable, chunksize, dtype):
+
+    import numpy as np
+    dtype = np.dtype(dtype)
+
+    while True:
+        buf = np.fromiter(it.islice(iterable, chunksize), dtype=dtype)
+        if buf.size:
+            buf.flags.writeable = False
+            yield buf
+        else:
+            return
+
+
+# Decoders for these encodings have no state at a line boundary and encode
+# newlines as a single b'\n', so counting bytes is equivalent to counting
+# decoded lines.
+_LINE_SEEKABLE_ENCODINGS = frozenset(
+    ('utf-8', 'ascii', 'latin-1', 'iso8859-1', 'cp1252'))
+
+
+def is_sequence(obj):
+
+    """Determine if an object supports ``len()`` and constant time integer
+    indexing, like a ``list()``, ``tuple()``, ``range()``,
+    ``array.array()``, or NumPy array.  Other objects that can be indexed,
+    like a ``collections.deque()`` where indexing is ``O(n)``, are
+    excluded so they are iterated instead.
+    """
+
+    return isinstance(
+        obj, (list, tuple, _compat.range, array, memoryview, SequenceView)) \
+        or hasattr(obj, '__array_interface__')
+
+
+def _slice(obj, item):
+    if isinstance(obj, _compat.range):
+        return _compat.slice_range(obj, item)
+    return obj[item]
+
+
+def _slices_in_constant_time(obj):
+    return isinstance(obj, (_compat.range, memoryview, SequenceView)) \
+        or hasattr(obj, '__array_interface__')
+
+
+def attributes(obj):
+
+    """Get an object's instance attributes, including those stored in
+    ``__slots__``, which ``vars()`` does not see.
+
+    Returns
+    -------
+    dict
+    """
+
+    out = dict(getattr(obj, '__dict__', {}))
+    for cls in type(obj).__mro__:
+        for name in cls.__dict__.get('__slots__', ()):
+            if name not in ('__dict__', '__weakref__') and hasattr(obj, name):
+                out[name] = getattr(obj, name)
+    return out
+
+
+class LazyModule(object):
+
+    """A stand-in for a module that is imported when one of its attributes
+    is first accessed.  Keeps modules that are only needed by some
+    operations from slowing down ``import tinyflow``, which matters for
+    short lived worker processes:
+
+        _sketch = LazyModule('tinyflow.sketch')
+    """
+
+    def __init__(self, name):
+
+        """
+        Parameters
+        ----------
+        name : str
+            Absolute name of the module.
+        """
+
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+
+    def __getattr__(self, attr):
+        module = self._module
+        if module is None:
+            module = self.__dict__['_module'] = importlib.import_module(
+                self._name)
+        return getattr(module, attr)
+
+    def __repr__(self):
+        return '{}({!r})'.format(type(self).__name__, self._name)
+
+
+class SequenceView(object):
+
+    """A read-only view of part of a sequence.  Slicing a view produces
+    another view rather than a copy, so repeatedly slicing a large list
+    costs ``O(1)``.
+
+        >>> view = SequenceView(list(range(10)))[2:][:3]
+        >>> list(view)
+        [2, 3, 4]
+    """
+
+    def __init__(self, sequence, indexes=None):
+
+        """
+        Parameters
+        ----------
+        sequence : sequence
+            Object supporting ``len()`` and integer indexing.
+        indexes : range or None, optional
+            Indexes of ``sequence`` included in the view.  Defaults to the
+            entire sequence.
+        """
+
+        self.sequence = sequence
+        if indexes is None:
+            indexes = _compat.range(len(sequence))
+        self.indexes = indexes
+
+    def __len__(self):
+        return len(self.indexes)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return SequenceView(self.sequence, _slice(self.indexes, item))
+        return self.sequence[self.indexes[item]]
+
+    def __iter__(self):
+        return _compat.map(self.sequence.__getitem__, self.indexes)
+
+    def __repr__(self):
+        return '{}({!r}, {!r})'.format(
+            type(self).__name__, self.sequence, self.indexes)
+
+
+def _is_line_seekable(f):
+
+    """Determine if lines can be skipped in a file object by seeking."""
+
+    try:
+        if not (f.seekable() and f.readable()):
+            return False
+    except (AttributeError, ValueError):
+        return False
+
+    if isinstance(f, io.TextIOBase):
+        encoding = getattr(f, 'encoding', None)
+        return hasattr(f, 'buffer') and encoding is not None \
+            and codecs.lookup(encoding).name in _LINE_SEEKABLE_ENCODINGS
+
+    return isinstance(f, (io.BufferedIOBase, io.RawIOBase))
+
+
+def skip_lines(f, count, blocksize=2 ** 20):
+
+    """Advance a seekable file past ``count`` lines by reading large blocks
+    and counting newlines rather than reading line by line.  Text files
+    must use an encoding where a newline is always ``b'\\n'``, like UTF-8,
+    and must not have been partially read with ``next()``.  Lines ending
+    with a lone ``'\\r'`` are not counted.
+
+    Parameters
+    ----------
+    f : file
+        Seekable file object opened for reading.
+    count : int
+        Number of lines to skip.
+    blocksize : int, optional
+        Read this many bytes at a time.
+
+    Returns
+    -------
+    int
+        Number of lines skipped.  Less than ``count`` if the file ended.
+    """
+
+    binary = getattr(f, 'buffer', f)
+    position = f.tell()
+    binary.seek(position)
+
+    remaining = count
+    while remaining:
+        block = binary.read(blocksize)
+        if not block:
+            break
+        newlines = block.count(b'\n')
+        if newlines < remaining:
+            remaining -= newlines
+            position += len(block)
+        else:
+            # Find the end of the last line to skip
+            end = -1
+            for _ in _compat.range(remaining):
+                end = block.index(b'\n', end + 1)
+            position += end + 1
+            remaining = 0
+
+    f.seek(position)
+    return count - remaining
+
+
+def skip(iterable, count):
+
+    """Skip the first ``count`` items of ``iterable`` as cheaply as
+    possible.  Sequences are sliced, which is ``O(1)`` for things like
+    ``range()`` and NumPy arrays and produces a ``SequenceView()`` for
+    others.  Seekable files are advanced with ``skip_lines()``.  Anything
+    else is consumed at C speed with ``itertools.islice()``.
+
+    Parameters
+    ----------
+    iterable : iter
+        Input stream.
+    count : int
+        Number of items to skip.
+
+    Returns
+    -------
+    iter
+        A sequence, file, or iterator positioned after the skipped items.
+    """
+
+    if _slices_in_constant_time(iterable):
+        return _slice(iterable, slice(count, None))
+    elif is_sequence(iterable):
+        return SequenceView(iterable)[count:]
+    elif _is_line_seekable(iterable):
+        skip_lines(iterable, count)
+        return iterable
+
+    iterable = iter(iterable)
+    deque(it.islice(iterable, count), maxlen=0)
+    return iterable
+
+
+def limit(iterable, count):
+
+    """Like ``itertools.islice(iterable, count)`` but sequences are sliced
+    like ``skip()``.
+
+    Parameters
+    ----------
+    iterable : iter
+        Input stream.
+    count : int
+        Maximum number of items.
+
+    Returns
+    -------
+    iter
+    """
+
+    if _slices_in_constant_time(iterable):
+        return _slice(iterable, slice(count))
+    elif is_sequence(iterable):
+        return SequenceView(iterable)[:count]
+    return it.islice(iterable, count)